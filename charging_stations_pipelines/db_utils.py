@@ -1,7 +1,9 @@
 """Module for database utilities."""
 import logging
+from typing import Any, Union
 
-from sqlalchemy import delete, text, update
+from sqlalchemy import Table, delete, func, select, text, update
+from sqlalchemy.engine.base import Connection
 from sqlalchemy.orm import Session
 
 from charging_stations_pipelines.models import address, charging, station
@@ -9,6 +11,56 @@ from charging_stations_pipelines.models import address, charging, station
 logger = logging.getLogger(__name__)
 
 
+def model_to_row(model, table: Table, **values) -> dict[str, Any]:
+    """Converts a (transient) model object to a row for a Core insert, leaving out the primary key.
+
+    Columns without value get their scalar default, like the ORM would do.
+
+    :param model: Station, Address, Charging or MergedStationSource object.
+    :param table: table of the model.
+    :param values: values overriding the ones of the model, e.g. foreign keys.
+    :return: dict of column name to value.
+    """
+    row = {}
+    for column in table.columns:
+        if column.primary_key and column.key not in values:
+            continue
+        value = values[column.key] if column.key in values else getattr(model, column.key)
+        if value is None and column.default is not None and column.default.is_scalar:
+            value = column.default.arg
+        row[column.key] = value
+    return row
+
+
+def allocate_station_ids(con: Union[Connection, Session], count: int) -> list[int]:
+    """Takes ``count`` ids from the id sequence of the stations table, e.g. to insert stations and their children in
+    multi-row statements."""
+    stations_table = station.Station.__table__
+    sequence_name = func.pg_get_serial_sequence(stations_table.fullname, stations_table.c.id.name)
+    allocate_ids = select([func.nextval(sequence_name)]).select_from(func.generate_series(1, count))
+    return [row[0] for row in con.execute(allocate_ids)]
+
+
+def delete_stations(session: Session, station_ids: list[int]):
+    """Deletes the given stations together with their address and charging, without committing."""
+    session.execute(delete(address.Address).where(address.Address.station_id.in_(station_ids)))
+    session.execute(delete(charging.Charging).where(charging.Charging.station_id.in_(station_ids)))
+    session.execute(delete(station.Station).where(station.Station.id.in_(station_ids)))
+
+
+def has_stations(session: Session, data_source: str, country_code: str) -> bool:
+    """Returns whether there are imported stations of a data source in a country."""
+    stations_table = station.Station.__table__
+    find_station = (
+        select([stations_table.c.id])
+        .where(stations_table.c.data_source == data_source)
+        .where(stations_table.c.country_code == country_code)
+        .where(stations_table.c.is_merged.is_(False))
+        .limit(1)
+    )
+    return session.execute(find_station).first() is not None
+
+
 def delete_all_data(session: Session):
     """Deletes all data from the database."""
     logger.info("Deleting all data from the database...")
@@ -35,3 +87,66 @@ def delete_all_merged_data(session: Session):
     session.execute(update(station.Station).values(merge_status=None))
     session.commit()
     session.close()
+
+
+def release_merged_stations_near_changes(session: Session, country_code: str, radius_m: float) -> int:
+    """Deletes the merged stations of a country whose cluster may change, so that the next merge re-clusters them.
+
+    Source stations which have not been merged yet, i.e. which were added or changed since the last merge, have no
+    merge status. A merged station is released if one of its source stations has no merge status, lies within
+    ``radius_m`` of such a station, or does not exist anymore. The merge status of the remaining source stations of
+    released merged stations is reset, all other merged stations stay untouched.
+
+    :param session: session to run the statements in, it is committed and closed afterwards.
+    :param country_code: country to release merged stations for.
+    :param radius_m: merge radius in meters.
+    :return: number of released merged stations.
+    """
+    stations_table = station.Station.__tablename__
+    sources_table = station.MergedStationSource.__tablename__
+    find_released_stations_sql = text(
+        f"""
+        SELECT mss.merged_station_id
+        FROM {sources_table} mss
+            JOIN {stations_table} src ON src.source_id = mss.duplicate_source_id
+        WHERE src.country_code = :country_code AND NOT src.is_merged AND src.merge_status IS NULL
+        UNION
+        SELECT mss.merged_station_id
+        FROM {sources_table} mss
+            JOIN {stations_table} src ON src.source_id = mss.duplicate_source_id
+            JOIN {stations_table} changed ON ST_DWithin(src.point, changed.point, :radius_m)
+        WHERE
+            src.country_code = :country_code AND NOT src.is_merged
+            AND changed.country_code = :country_code AND NOT changed.is_merged AND changed.merge_status IS NULL
+        UNION
+        SELECT mss.merged_station_id
+        FROM {sources_table} mss
+            JOIN {stations_table} merged ON merged.id = mss.merged_station_id
+        WHERE
+            merged.country_code = :country_code
+            AND NOT EXISTS (SELECT 1 FROM {stations_table} src WHERE src.source_id = mss.duplicate_source_id)
+        """
+    )
+    released_ids = [
+        row[0]
+        for row in session.execute(find_released_stations_sql, {"country_code": country_code, "radius_m": radius_m})
+    ]
+
+    if released_ids:
+        released_source_ids = select([station.MergedStationSource.duplicate_source_id]).where(
+            station.MergedStationSource.merged_station_id.in_(released_ids)
+        )
+        session.execute(
+            update(station.Station)
+            .where(station.Station.source_id.in_(released_source_ids))
+            .where(station.Station.is_merged.is_(False))
+            .values(merge_status=None)
+        )
+        session.execute(
+            delete(station.MergedStationSource).where(station.MergedStationSource.merged_station_id.in_(released_ids))
+        )
+        delete_stations(session, released_ids)
+    session.commit()
+    session.close()
+    logger.info(f"Released {len(released_ids)} merged stations of country {country_code} for re-merging")
+    return len(released_ids)
@@ -1,10 +1,110 @@
 import logging
 from difflib import SequenceMatcher
+from typing import Final, Optional, Sequence
 
+import numpy as np
 import pandas as pd
 
+from charging_stations_pipelines.deduplication.disjoint_set import DisjointSet
+
 logger = logging.getLogger(__name__)
 
+ADDRESS_MATCH_THRESHOLD: Final[float] = 0.7
+OPERATOR_MATCH_THRESHOLD: Final[float] = 0.7
+DISTANCE_MATCH_THRESHOLD: Final[float] = 0.3
+
+MISSING_ADDRESS: Final[str] = "None,None"
+"""Address string of a station without street and town."""
+
+
+def similarity_reaches_threshold(reference: str, values: Sequence[str], threshold: float) -> np.ndarray:
+    """Checks for a whole block of strings whether ``SequenceMatcher(None, reference, value).ratio() >= threshold``.
+
+    The ratio is only computed once per distinct value, and only for values which can reach the threshold at all:
+    ``2 * min(len(a), len(b)) / (len(a) + len(b))`` is an upper bound of the ratio, evaluated on all lengths at once,
+    and identical strings always have a ratio of 1. The result is the same as calling ``ratio()`` for every value.
+
+    :param reference: string to compare all values with.
+    :param values: strings to compare.
+    :param threshold: minimum ratio.
+    :return: boolean array aligned with ``values``.
+    """
+    distinct_values = list(dict.fromkeys(values))
+    if not distinct_values:
+        return np.zeros(0, dtype=bool)
+
+    reference_length = len(reference)
+    lengths = np.fromiter(map(len, distinct_values), dtype=int, count=len(distinct_values))
+    total_lengths = lengths + reference_length
+    with np.errstate(divide="ignore", invalid="ignore"):
+        upper_bounds = np.where(total_lengths > 0, 2.0 * np.minimum(lengths, reference_length) / total_lengths, 1.0)
+    matches = np.fromiter((value == reference for value in distinct_values), dtype=bool, count=len(distinct_values))
+
+    for pos in np.flatnonzero((upper_bounds >= threshold) & ~matches):
+        matcher = SequenceMatcher(None, reference, distinct_values[pos])
+        matches[pos] = matcher.quick_ratio() >= threshold and matcher.ratio() >= threshold
+
+    matching_values = {value for value, is_match in zip(distinct_values, matches) if is_match}
+    return np.fromiter((value in matching_values for value in values), dtype=bool, count=len(values))
+
+
+def attributes_match(
+    operator: Optional[str],
+    address: str,
+    operators: np.ndarray,
+    addresses: np.ndarray,
+    is_duplicate: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """Checks for a block of candidates at once whether their address or operator is similar enough to the given ones.
+
+    :param operator: operator to compare with, ``None`` never matches.
+    :param address: address to compare with, a missing address never matches.
+    :param operators: operators of the candidates.
+    :param addresses: addresses of the candidates.
+    :param is_duplicate: candidates already known to be duplicates, they are not compared again.
+    :return: boolean array aligned with the candidates, including the already known duplicates.
+    """
+    is_duplicate = np.zeros(len(operators), dtype=bool) if is_duplicate is None else is_duplicate.copy()
+
+    if address != MISSING_ADDRESS:
+        to_compare = ~is_duplicate & (addresses != MISSING_ADDRESS)
+        is_duplicate[to_compare] = similarity_reaches_threshold(address, addresses[to_compare], ADDRESS_MATCH_THRESHOLD)
+
+    if operator is not None:
+        to_compare = ~is_duplicate & np.fromiter((x is not None for x in operators), dtype=bool, count=len(operators))
+        is_duplicate[to_compare] = similarity_reaches_threshold(
+            operator, [str(x) for x in operators[to_compare]], OPERATOR_MATCH_THRESHOLD
+        )
+
+    return is_duplicate
+
+
+def score_duplicate_candidates(
+    current_station: pd.Series,
+    duplicate_candidates: pd.DataFrame,
+    max_distance: int = 100,
+) -> np.ndarray:
+    """Decides for a block of duplicate candidates at once whether they are duplicates of the current station.
+
+    A candidate is a duplicate if its address or operator is similar enough to the ones of the current station, or if
+    it is close enough to the initial central charging station. Similarities are only computed for candidates which
+    are not already decided by the distance or the address.
+
+    :param current_station: station to compare the candidates with, needs the columns operator and address.
+    :param duplicate_candidates: candidates with the columns operator, address and distance.
+    :param max_distance: search radius the distances are normalized with.
+    :return: boolean array aligned with ``duplicate_candidates``.
+    """
+    # this is always the distance to the initial central charging station
+    distance_match = 1 - duplicate_candidates["distance"].to_numpy(dtype=float) / max_distance
+    return attributes_match(
+        current_station.operator,
+        current_station["address"],
+        duplicate_candidates["operator"].to_numpy(dtype=object),
+        duplicate_candidates["address"].to_numpy(dtype=object),
+        is_duplicate=distance_match >= DISTANCE_MATCH_THRESHOLD,
+    )
+
 
 def attribute_match_thresholds_duplicates(
     current_station: pd.Series,
@@ -12,6 +112,20 @@ def attribute_match_thresholds_duplicates(
     station_id_name: str,
     max_distance: int = 100,
 ) -> pd.DataFrame:
+    """Marks all duplicate candidates which belong to the cluster of the current station as duplicates.
+
+    Candidates are linked to the current station by :func:`score_duplicate_candidates`, and to each other if their
+    address or operator match. For all duplicates found via OSM, which has most of the time no address info, this
+    e.g. allows a duplicate with address to be matched to other data sources via this attribute. The cluster of the
+    current station, kept in a :class:`DisjointSet`, grows outwards: every candidate joining it is compared, as the
+    reference of the similarity, with the candidates not in the cluster yet, as the similarity isn't symmetric.
+
+    :param current_station: central station of the search, needs the columns operator and address.
+    :param duplicate_candidates: candidates with the columns operator, address, distance and is_duplicate.
+    :param station_id_name: name of the station id column, only used for logging.
+    :param max_distance: search radius the distances are normalized with.
+    :return: the duplicate candidates with an updated is_duplicate column.
+    """
     pd.options.mode.chained_assignment = None
 
     remaining_duplicate_candidates = duplicate_candidates[~duplicate_candidates["is_duplicate"].astype(bool)]
@@ -25,33 +139,38 @@ def attribute_match_thresholds_duplicates(
     )
     logger.debug(f"{len(remaining_duplicate_candidates)} duplicate candidates")
 
-    remaining_duplicate_candidates["operator_match"] = remaining_duplicate_candidates.operator.apply(
-        lambda x: SequenceMatcher(None, current_station.operator, str(x)).ratio()
-        if (current_station.operator is not None) & (x is not None)
-        else 0.0
-    )
+    operators = remaining_duplicate_candidates["operator"].to_numpy(dtype=object)
+    addresses = remaining_duplicate_candidates["address"].to_numpy(dtype=object)
+    num_candidates = len(remaining_duplicate_candidates)
 
-    remaining_duplicate_candidates["address_match"] = remaining_duplicate_candidates.address.apply(
-        lambda x: SequenceMatcher(None, current_station["address"], x).ratio()
-        if (current_station["address"] != "None,None") & (x != "None,None")
-        else 0.0,
+    # element 0 is the current station, element i + 1 the i-th candidate
+    clusters = DisjointSet(num_candidates + 1)
+    to_expand = list(
+        np.flatnonzero(score_duplicate_candidates(current_station, remaining_duplicate_candidates, max_distance))
     )
+    for pos in to_expand:
+        clusters.union(0, pos + 1)
 
-    # this is always the distance to the initial central charging station
-    remaining_duplicate_candidates["distance_match"] = 1 - remaining_duplicate_candidates["distance"] / max_distance
-
-    def is_duplicate_by_score(duplicate_candidate):
-        if duplicate_candidate["address_match"] >= 0.7:
-            is_duplicate = True
-            logger.debug("duplicate according to address")
-        elif duplicate_candidate["operator_match"] >= 0.7:
-            is_duplicate = True
-            logger.debug("duplicate according to operator")
-        elif duplicate_candidate["distance_match"] >= 0.3:
-            is_duplicate = True
-            logger.debug("duplicate according to distance")
-        else:
-            is_duplicate = False
+    # TODO: think of changing distance threshold for matches between candidates
+    #  as coordinates of other sources are not as good as OSM coordinates
+    while to_expand:
+        pos = to_expand.pop()
+        others = np.array(
+            [other for other in range(num_candidates) if not clusters.connected(0, other + 1)],
+            dtype=int,
+        )
+        if len(others) == 0:
+            break
+        is_match = attributes_match(operators[pos], addresses[pos], operators[others], addresses[others])
+        for other in others[is_match]:
+            clusters.union(0, other + 1)
+            to_expand.append(other)
+
+    is_duplicate = np.fromiter(
+        (clusters.connected(0, pos + 1) for pos in range(num_candidates)), dtype=bool, count=num_candidates
+    )
+    if logger.isEnabledFor(logging.DEBUG):
+        for _, duplicate_candidate in remaining_duplicate_candidates[~is_duplicate].iterrows():
             logger.debug(
                 f"no duplicate: {duplicate_candidate.data_source}, "
                 f"source id: {duplicate_candidate.source_id}, "
@@ -60,27 +179,8 @@ def attribute_match_thresholds_duplicates(
                 f"row id: {duplicate_candidate.name}, "
                 f"distance: {duplicate_candidate.distance}"
             )
-        return is_duplicate
+    logger.debug(f"{is_duplicate.sum()} duplicates found for station_id {current_station.get(station_id_name)}")
 
-    remaining_duplicate_candidates["is_duplicate"] = remaining_duplicate_candidates.apply(is_duplicate_by_score, axis=1)
     # update original candidates
-    duplicate_candidates.update(remaining_duplicate_candidates)
-
-    # for all duplicates found via OSM, which has most of the time no address info,
-    # run the check again against all candidates
-    # so e.g. if we have a duplicate with address it can be matched to other data sources via this attribute
-    new_duplicates = remaining_duplicate_candidates[remaining_duplicate_candidates["is_duplicate"]]
-    for idx in range(new_duplicates.shape[0]):
-        current_station: pd.Series = new_duplicates.iloc[idx]
-
-        # recursive call to the current method,
-        # but with some candidates already marked as duplicate and new current station
-        # TODO: think of changing distance threshold in this 2nd call
-        #  as coordinates of other sources are not as good as OSM coordinates
-        duplicate_candidates = attribute_match_thresholds_duplicates(
-            current_station=current_station,
-            duplicate_candidates=duplicate_candidates,
-            station_id_name=station_id_name,
-        )
-
+    duplicate_candidates.loc[remaining_duplicate_candidates.index, "is_duplicate"] = is_duplicate
     return duplicate_candidates
@@ -0,0 +1,116 @@
+"""Candidate pairs of the duplicate search produced by a single PostGIS self-join, used by the merger instead of one
+radius query per station."""
+
+import logging
+from itertools import groupby
+from operator import itemgetter
+from typing import Final, Iterable, Iterator, Optional, Sequence
+
+import pandas as pd
+from geopandas import GeoDataFrame, GeoSeries
+from sqlalchemy import text
+from sqlalchemy.engine.base import Engine
+
+from charging_stations_pipelines import settings
+
+logger = logging.getLogger(__name__)
+
+NEARBY_STATION_COLUMNS: Final[list[str]] = [
+    "station_id",
+    "source_id",
+    "data_source",
+    "point",
+    "operator",
+    "capacity",
+    "street",
+    "town",
+    "distance",
+]
+"""Columns of the nearby stations, the same as the ones of the radius query of :meth:`StationMerger.find_duplicates`."""
+
+
+def group_by_center(rows: Iterable[Sequence]) -> Iterator[tuple[int, GeoDataFrame]]:
+    """Groups candidate pair rows ordered by center station id into the nearby stations of each center.
+
+    :param rows: rows of the center station id followed by the :data:`NEARBY_STATION_COLUMNS`, with the point as
+        hex encoded WKB.
+    :return: iterator of center station id and GeoDataFrame of its nearby stations, including the center itself.
+    """
+    for center_id, center_rows in groupby(rows, key=itemgetter(0)):
+        nearby_stations = pd.DataFrame.from_records([row[1:] for row in center_rows], columns=NEARBY_STATION_COLUMNS)
+        nearby_stations["point"] = GeoSeries.from_wkb(nearby_stations["point"])
+        yield center_id, GeoDataFrame(nearby_stations, geometry="point")
+
+
+class CandidatePairStream:
+    """All pairs of duplicate candidates of a country within the merge radius, streamed from one self-join of the
+    stations table through a server-side cursor.
+
+    The join on ``ST_DWithin`` can use the GiST index ``stations_point_geom_idx``. Rows are ordered by the center
+    station id, so the nearby stations have to be requested in increasing order of station ids.
+
+    :param db_engine: engine of the database to read from.
+    :param country_code: country to create the candidate pairs for.
+    :param radius_m: merge radius in meters.
+    :param fetch_size: number of rows fetched from the cursor at once.
+    """
+
+    def __init__(self, db_engine: Engine, country_code: str, radius_m: float, fetch_size: int = 10_000):
+        get_candidate_pairs_sql = f"""
+            SELECT
+                c.id as center_id,
+                s.id as station_id,
+                s.source_id as source_id,
+                s.data_source, s.point, s.operator,
+                ch.capacity,
+                a.street, a.town,
+                ST_DISTANCE(s.point, c.point) as distance
+            FROM {settings.db_table_prefix}stations c
+                JOIN {settings.db_table_prefix}stations s ON ST_DWithin(s.point, c.point, :radius_m)
+                LEFT JOIN {settings.db_table_prefix}charging ch ON s.id = ch.station_id
+                LEFT JOIN {settings.db_table_prefix}address a ON s.id = a.station_id
+            WHERE
+                c.point IS NOT NULL
+                AND NOT c.is_merged
+                AND (c.merge_status <> 'is_duplicate' OR c.merge_status is null)
+                AND c.country_code = :country_code
+                AND NOT s.is_merged
+                AND (s.merge_status <> 'is_duplicate' OR s.merge_status is null)
+                AND s.country_code = :country_code
+            ORDER BY c.id, s.id
+        """
+        self.fetch_size = fetch_size
+        self.connection = db_engine.connect()
+        self.result = self.connection.execution_options(stream_results=True).execute(
+            text(get_candidate_pairs_sql), country_code=country_code, radius_m=radius_m
+        )
+        self.groups = group_by_center(self._fetch_rows())
+        self.next_group: Optional[tuple[int, GeoDataFrame]] = next(self.groups, None)
+
+    def _fetch_rows(self) -> Iterator[Sequence]:
+        while True:
+            rows = self.result.fetchmany(self.fetch_size)
+            if not rows:
+                return
+            yield from rows
+
+    def nearby_stations(self, station_id: int) -> GeoDataFrame:
+        """Returns the stations within the merge radius of a station, or an empty GeoDataFrame if it is not a duplicate
+        candidate. Skips all stations with a smaller id.
+
+        :param station_id: id of the center station, larger than the one of the previous call.
+        :return: GeoDataFrame of the nearby stations with a ``distance`` column, ordered by station id.
+        """
+        while self.next_group is not None and self.next_group[0] < station_id:
+            self.next_group = next(self.groups, None)
+        if self.next_group is None or self.next_group[0] != station_id:
+            return GeoDataFrame()
+
+        _, nearby_stations = self.next_group
+        self.next_group = next(self.groups, None)
+        return nearby_stations
+
+    def close(self):
+        """Closes the cursor and returns the connection to the pool."""
+        self.result.close()
+        self.connection.close()
@@ -0,0 +1,47 @@
+"""Disjoint-set (union-find) structure used to build clusters of duplicate stations from pairwise matches."""
+
+from collections import defaultdict
+
+
+class DisjointSet:
+    """Disjoint-set over the elements ``0..size-1`` with path halving and union by size.
+
+    :param size: number of elements, every element starts in a set of its own.
+    """
+
+    def __init__(self, size: int):
+        self.parents: list[int] = list(range(size))
+        self.sizes: list[int] = [1] * size
+
+    def __len__(self):
+        return len(self.parents)
+
+    def find(self, element: int) -> int:
+        """Returns the representative of the set containing ``element``."""
+        parents = self.parents
+        while parents[element] != element:
+            parents[element] = parents[parents[element]]
+            element = parents[element]
+        return element
+
+    def union(self, element: int, other: int) -> int:
+        """Merges the sets containing ``element`` and ``other`` and returns the representative of the merged set."""
+        root, other_root = self.find(element), self.find(other)
+        if root == other_root:
+            return root
+        if self.sizes[root] < self.sizes[other_root]:
+            root, other_root = other_root, root
+        self.parents[other_root] = root
+        self.sizes[root] += self.sizes[other_root]
+        return root
+
+    def connected(self, element: int, other: int) -> bool:
+        """Checks whether ``element`` and ``other`` are in the same set."""
+        return self.find(element) == self.find(other)
+
+    def groups(self) -> list[list[int]]:
+        """Returns all sets as sorted lists, ordered by their smallest element."""
+        groups: dict[int, list[int]] = defaultdict(list)
+        for element in range(len(self.parents)):
+            groups[self.find(element)].append(element)
+        return sorted(groups.values(), key=lambda group: group[0])
@@ -0,0 +1,59 @@
+"""Timers and counters of the phases of a merge run, summarized per country."""
+
+import json
+import logging
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class MergeStatistics:
+    """Cumulative timers and counters of the phases of the merge of one country.
+
+    Timers are measured with :func:`time.perf_counter` and summed up per phase, e.g. over all radius queries of a run.
+    """
+
+    def __init__(self):
+        self.timers: dict[str, float] = defaultdict(float)
+        self.counters: dict[str, int] = defaultdict(int)
+
+    @contextmanager
+    def timer(self, phase: str) -> Iterator[None]:
+        """Adds the time spent in the ``with`` block to the timer of ``phase``."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timers[phase] += time.perf_counter() - start
+
+    def count(self, counter: str, value: int = 1):
+        """Increments ``counter`` by ``value``."""
+        self.counters[counter] += value
+
+    def summary(self, country_code: str) -> dict[str, Any]:
+        """Returns the timers in seconds, the counters and the average cluster size as a JSON serializable dict."""
+        clusters = self.counters.get("clusters", 0)
+        return {
+            "country_code": country_code,
+            "timers": {phase: round(seconds, 3) for phase, seconds in sorted(self.timers.items())},
+            "counters": dict(sorted(self.counters.items())),
+            "average_cluster_size": round(self.counters.get("clustered_stations", 0) / clusters, 3) if clusters else 0,
+        }
+
+    def log_summary(self, country_code: str, statistics_file: Optional[str] = None) -> dict[str, Any]:
+        """Logs the summary as one line of JSON and optionally appends it to ``statistics_file``.
+
+        :param country_code: country the statistics were collected for.
+        :param statistics_file: path of a JSON lines file to append the summary to, if given.
+        :return: the summary.
+        """
+        summary = self.summary(country_code)
+        summary_json = json.dumps(summary)
+        logger.info(f"Merge statistics: {summary_json}")
+        if statistics_file:
+            with open(statistics_file, "a", encoding="utf-8") as f:
+                f.write(summary_json + "\n")
+        return summary
@@ -0,0 +1,117 @@
+"""Batched writer for the merged stations created by the merger."""
+
+import logging
+from typing import Any, Optional
+
+from sqlalchemy import Table
+from sqlalchemy.engine.base import Connection, Engine
+
+from charging_stations_pipelines.db_utils import allocate_station_ids, model_to_row
+from charging_stations_pipelines.models.address import Address
+from charging_stations_pipelines.models.charging import Charging
+from charging_stations_pipelines.models.station import MergedStationSource, Station
+
+logger = logging.getLogger(__name__)
+
+
+class MergedStationWriter:
+    """Collects merged stations with their address, charging and source rows and writes them in large transactions.
+
+    Each batch is written with one multi-row insert per table and a single update setting the merge status of all
+    merged source stations to 'is_duplicate'. Station ids are taken from the id sequence up front, so the child rows
+    can reference them without a round trip per station. A batch which fails is written again station by station.
+
+    :param db_engine: engine of the database to write to.
+    :param batch_size: number of merged stations per transaction.
+    """
+
+    def __init__(self, db_engine: Engine, batch_size: int = 1000):
+        self.db_engine = db_engine
+        self.batch_size = max(1, batch_size)
+        self.pending: list[tuple[Station, list[int]]] = []
+        self.counts = {
+            "written": 0,
+            "error": 0,
+            "rows": 0,
+        }
+
+    def add(self, merged_station: Station, duplicate_station_ids: list[int]):
+        """Queues a merged station and the ids of the stations it was merged from, flushing full batches."""
+        self.pending.append((merged_station, duplicate_station_ids))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Writes all queued merged stations in one transaction. If that fails, they are written one by one, so that
+        only the merged stations which can't be written are lost."""
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, []
+        try:
+            self._write_transaction(batch)
+        except Exception as e:
+            if len(batch) == 1:
+                self._count_error(batch[0], e)
+                return
+            logger.warning(f"Writing {len(batch)} merged stations failed, retrying one by one. Error: {e}")
+            for merged_station in batch:
+                try:
+                    self._write_transaction([merged_station])
+                except Exception as e:
+                    self._count_error(merged_station, e)
+
+    def _write_transaction(self, batch: list[tuple[Station, list[int]]]):
+        with self.db_engine.begin() as con:
+            rows_written = self._write_batch(con, batch)
+        self.counts["written"] += len(batch)
+        self.counts["rows"] += rows_written
+
+    def _count_error(self, merged_station: tuple[Station, list[int]], error: Exception):
+        logger.error(f"Writing the merged station of stations {merged_station[1]} failed! Error: {error}")
+        self.counts["error"] += 1
+
+    def log_counts(self):
+        """Log the number of written and failed merged stations."""
+        logger.info(
+            f"merged stations written: {self.counts['written']}, "
+            f"rows written: {self.counts['rows']}, "
+            f"errors: {self.counts['error']}"
+        )
+
+    @staticmethod
+    def to_rows(batch: list[tuple[Station, list[int]]], station_ids: list[int]) -> dict[Table, list[dict[str, Any]]]:
+        """Converts merged stations to rows per table, using the given ids for the stations."""
+        rows: dict[Table, list[dict[str, Any]]] = {
+            Station.__table__: [],
+            Address.__table__: [],
+            Charging.__table__: [],
+            MergedStationSource.__table__: [],
+        }
+        for (merged_station, _), station_id in zip(batch, station_ids):
+            rows[Station.__table__].append(model_to_row(merged_station, Station.__table__, id=station_id))
+            address: Optional[Address] = merged_station.address
+            if address:
+                rows[Address.__table__].append(model_to_row(address, Address.__table__, station_id=station_id))
+            charging: Optional[Charging] = merged_station.charging
+            if charging:
+                rows[Charging.__table__].append(model_to_row(charging, Charging.__table__, station_id=station_id))
+            for source in merged_station.source_stations:
+                rows[MergedStationSource.__table__].append(
+                    model_to_row(source, MergedStationSource.__table__, merged_station_id=station_id)
+                )
+        return rows
+
+    def _write_batch(self, con: Connection, batch: list[tuple[Station, list[int]]]) -> int:
+        station_ids = allocate_station_ids(con, len(batch))
+        rows_written = 0
+        for table, table_rows in self.to_rows(batch, station_ids).items():
+            if table_rows:
+                con.execute(table.insert().values(table_rows))
+                rows_written += len(table_rows)
+
+        duplicate_station_ids = [station_id for _, station_ids in batch for station_id in station_ids]
+        stations = Station.__table__
+        result = con.execute(
+            stations.update().where(stations.c.id.in_(duplicate_station_ids)).values(merge_status="is_duplicate")
+        )
+        return rows_written + result.rowcount
@@ -1,28 +1,113 @@
 import configparser
 import logging
-from typing import Optional
+import math
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Final, Iterable, Iterator, Optional, Union
 
 import pandas as pd
 from geopandas import GeoDataFrame, GeoSeries, read_postgis
+from shapely import wkt
 from sqlalchemy.engine.base import Engine
 from sqlalchemy.orm import make_transient, sessionmaker
 from tqdm import tqdm
 
-from charging_stations_pipelines import settings
+from charging_stations_pipelines import db_utils, settings
 from charging_stations_pipelines.deduplication import (
     attribute_match_thresholds_strategy,
 )
+from charging_stations_pipelines.deduplication.candidate_pairs import CandidatePairStream
+from charging_stations_pipelines.deduplication.merge_statistics import MergeStatistics
+from charging_stations_pipelines.deduplication.merged_station_writer import MergedStationWriter
+from charging_stations_pipelines.deduplication.source_station_cache import SourceStationCache
+from charging_stations_pipelines.deduplication.station_index import (
+    StationIndex,
+    load_candidates,
+    partition_into_tiles,
+)
 from charging_stations_pipelines.models.station import MergedStationSource, Station
 
 logger = logging.getLogger(__name__)
 
+MERGE_MODES: Final[list[str]] = ["sql", "index", "pairs"]
+"""Ways to search for duplicate candidates: 'sql' runs one PostGIS radius query per station, 'index' loads the
+candidates of a country once into an in-memory :class:`StationIndex`, 'pairs' streams all candidate pairs of a country
+from a single self-join, see :class:`CandidatePairStream`. Both 'index' and 'pairs' also prefetch the source stations of
+a country with their address and charging, see :class:`SourceStationCache`."""
+
+MERGE_RADIUS_M: Final[int] = 100
+"""Radius in meters around a station within which its duplicates are searched."""
+
+TILE_GROUPS_PER_WORKER: Final[int] = 4
+"""Number of tasks per worker process the tiles of a country are grouped into by the parallel duplicate search."""
+
+
+def propose_clusters(
+    station_ids: list[int], candidates: GeoDataFrame, radius_m
+) -> dict[int, tuple[list[int], list[int], list[int]]]:
+    """Searches the duplicates of the stations of some tiles in a worker process, like :meth:`StationMerger.run` would
+    do if the tiles were the whole country.
+
+    :param station_ids: ids of the stations inside the tiles.
+    :param candidates: candidates of the tiles including their halo, see :func:`partition_into_tiles`.
+    :param radius_m: search radius in meters.
+    :return: dict of station id to the ids of all stations nearby, the ids of those already merged within the tile,
+        and the ids of the duplicates found. Stations merged within the tiles have no entry.
+    """
+    station_index = StationIndex(candidates)
+    duplicate_station_ids: set[int] = set()
+    proposals = {}
+    for station_id in sorted(station_ids):
+        if station_id in duplicate_station_ids:
+            continue
+        point = station_index.point(station_id)
+        nearby_stations = station_index.query(point, radius_m, include_removed=True)
+        nearby_station_ids = nearby_stations["station_id"].tolist()
+        merged_station_ids = [i for i in nearby_station_ids if i in duplicate_station_ids]
+        if merged_station_ids:
+            nearby_stations = nearby_stations[~nearby_stations["station_id"].isin(merged_station_ids)]
+
+        duplicates, _ = StationMerger.find_duplicates_in_nearby_stations(nearby_stations, station_id, point, radius_m)
+        duplicate_ids = duplicates["station_id_col"].astype(int).tolist() if not duplicates.empty else []
+        proposals[station_id] = (nearby_station_ids, merged_station_ids, duplicate_ids)
+
+        duplicate_station_ids.update([*duplicate_ids, station_id])
+        station_index.remove([*duplicate_ids, station_id])
+    return proposals
+
 
 class StationMerger:
-    def __init__(self, country_code: str, config: configparser, db_engine, is_test: bool = False):
+    def __init__(
+        self,
+        country_code: str,
+        config: configparser,
+        db_engine,
+        is_test: bool = False,
+        merge_mode: str = "sql",
+        write_batch_size: int = 1000,
+        workers: int = 1,
+        tile_size_m: float = 20_000,
+        incremental: bool = False,
+        statistics_file: Optional[str] = None,
+    ):
+        if merge_mode not in MERGE_MODES:
+            raise ValueError(f"Unknown merge mode '{merge_mode}', expected one of {MERGE_MODES}")
+
         self.country_code = country_code
         self.config = config
         self.db_engine: Engine = db_engine
         self.is_test = is_test
+        self.merge_mode = merge_mode
+        self.write_batch_size = write_batch_size
+        self.workers = max(1, workers)
+        self.tile_size_m = tile_size_m
+        self.incremental = incremental
+        self.statistics_file = statistics_file
+        self.statistics = MergeStatistics()
+        self.station_index: Optional[StationIndex] = None
+        self.candidate_pairs: Optional[CandidatePairStream] = None
+        self.source_stations: Optional[SourceStationCache] = None
+        # stations merged in the current run, their merge status is only written with the next batch
+        self.duplicate_station_ids: set[int] = set()
 
         if self.is_test:
             self.country_code = "DE"
@@ -150,6 +235,9 @@ class StationMerger:
         return merged_station
 
     def get_station_with_address_and_charging(self, session, station_id):
+        if self.source_stations is not None and station_id in self.source_stations:
+            return self.source_stations.get_station_with_address_and_charging(station_id)
+
         # get station from DB and create new object
         merged_station: Station = session.query(Station).filter(Station.id == station_id).first()
         address = merged_station.address
@@ -173,14 +261,10 @@ class StationMerger:
         address_or_charging.is_merged = True
         return address_or_charging
 
-    @staticmethod
-    def _write_session(session):
-        try:
-            session.commit()
-            session.flush()
-        except Exception as e:
-            logger.error(f"Writing merged stations failed! Error: {e}")
-            session.rollback()
+    def _mark_as_duplicates(self, station_ids: list[int]):
+        self.duplicate_station_ids.update(station_ids)
+        if self.station_index is not None:
+            self.station_index.remove(station_ids)
 
     def run(self):
         """
@@ -198,8 +282,24 @@ class StationMerger:
         'SRID=4326;POINT (11.5375666 48.1532363)'::geography);
 
         -- 2782 meters (correct)
+
+        :return: summary of the timers and counters of the run, see :meth:`MergeStatistics.summary`.
         """
-        # First get list of stations esp. their coordinates
+        self.statistics = MergeStatistics()
+        with self.statistics.timer("total"):
+            self._run()
+        return self.statistics.log_summary(self.country_code, self.statistics_file)
+
+    def _run(self):
+        if self.incremental:
+            # merged stations near added, changed or removed stations are merged again, all others are kept
+            with self.statistics.timer("release_merged_stations"):
+                released_count = db_utils.release_merged_stations_near_changes(
+                    sessionmaker(bind=self.db_engine)(), self.country_code, MERGE_RADIUS_M
+                )
+            self.statistics.count("released_merged_stations", released_count)
+
+        # First get list of stations esp. their coordinates, stations merged in a previous run are kept
         get_stations_list_sql = f"""
             SELECT id as station_id, point
             FROM {settings.db_table_prefix}stations
@@ -208,6 +308,7 @@ class StationMerger:
                 AND point IS NOT NULL
                 AND country_code='{self.country_code}'
                 AND NOT is_merged
+                AND (merge_status <> 'is_duplicate' OR merge_status is null)
         """
 
         if self.is_test:
@@ -220,39 +321,151 @@ class StationMerger:
                     AND NOT is_merged
             """
 
-        with self.db_engine.connect() as con:
+        with self.statistics.timer("load_stations"), self.db_engine.connect() as con:
             gdf: GeoDataFrame = read_postgis(get_stations_list_sql, con=con, geom_col="point")
+        self.statistics.count("stations", len(gdf))
 
         gdf.sort_values(by=["station_id"], inplace=True, ignore_index=True)
 
+        with self.statistics.timer("load_candidates"):
+            if self.merge_mode == "index" or self.workers > 1:
+                # the parallel duplicate search works on the in-memory candidates
+                self.station_index = StationIndex(load_candidates(self.db_engine, self.country_code))
+                self.statistics.count("candidates", len(self.station_index))
+                logger.info(f"Loaded {len(self.station_index)} duplicate candidates into the station index")
+            elif self.merge_mode == "pairs":
+                self.candidate_pairs = CandidatePairStream(self.db_engine, self.country_code, MERGE_RADIUS_M)
+
+        if self.merge_mode in ("index", "pairs"):
+            # the 'sql' mode keeps loading the stations to merge one by one, without holding all stations in memory
+            with self.statistics.timer("prefetch_source_stations"):
+                self.source_stations = SourceStationCache.load(self.db_engine, self.country_code)
+            logger.info(f"Prefetched {len(self.source_stations)} source stations")
+
         session = sessionmaker(bind=self.db_engine)()
+        writer = MergedStationWriter(self.db_engine, batch_size=self.write_batch_size)
 
         # For each station's coordinate find all surrounding stations within a certain radius (including itself)
-        radius_m = 100
-        for idx in tqdm(range(gdf.shape[0])):
-            current_station: GeoSeries = gdf.iloc[idx]
+        for stations_to_merge, station_ids in self._iter_clusters(gdf, MERGE_RADIUS_M):
+            # merge attributes of duplicates into one station
+            with self.statistics.timer("build_merged_stations"):
+                merged_station: Station = self._merge_duplicates(stations_to_merge, session)
+            with self.statistics.timer("write"):
+                writer.add(merged_station, station_ids)
+        with self.statistics.timer("write"):
+            writer.flush()
+        writer.log_counts()
+        self.statistics.count("merged_stations_written", writer.counts["written"])
+        self.statistics.count("rows_written", writer.counts["rows"])
+        self.statistics.count("write_errors", writer.counts["error"])
+        session.close()
+        if self.candidate_pairs is not None:
+            self.candidate_pairs.close()
+        self.station_index = None
+        self.candidate_pairs = None
+        self.source_stations = None
+        self.duplicate_station_ids = set()
+
+    def _iter_clusters(
+        self, stations: GeoDataFrame, radius_m
+    ) -> Iterator[tuple[Union[pd.Series, pd.DataFrame], list[int]]]:
+        """Finds the duplicates of the given stations in the order of the stations, marking every cluster found as
+        duplicates before the next station is processed.
+
+        With more than one worker the clusters are proposed in parallel per tile, see
+        :meth:`_propose_clusters_in_parallel`. A proposal is only used if exactly the stations nearby it expected to be
+        merged already have been merged, otherwise the duplicates are searched again, so the result is the same as
+        with one worker.
+
+        :param stations: stations to find duplicates for, with columns station_id and point.
+        :param radius_m: search radius in meters.
+        :return: iterator of the stations to merge and their station ids.
+        """
+        proposals = {}
+        if self.workers > 1:
+            with self.statistics.timer("propose_clusters"):
+                proposals = self._propose_clusters_in_parallel(stations["station_id"], radius_m)
+            # same columns as the stations found by find_duplicates, ordered by station id
+            candidates_by_id = self.station_index.candidates.assign(
+                station_id_col=self.station_index.candidates["station_id"]
+            ).set_index("station_id")
+
+        for idx in tqdm(range(stations.shape[0])):
+            current_station: GeoSeries = stations.iloc[idx]
+            current_station_id = current_station["station_id"].item()
+            if current_station_id in self.duplicate_station_ids:
+                logger.debug(f"##### Already merged, id {current_station_id} #####")
+                continue
 
             # find real duplicates to current station
-            duplicates, current_station_full = self.find_duplicates(
-                current_station["station_id"], current_station["point"], radius_m
-            )
+            proposal = proposals.pop(current_station_id, None)
+            if proposal is not None and self._is_valid_proposal(*proposal[:2]):
+                self.statistics.count("proposals_used")
+                duplicates = candidates_by_id.loc[proposal[2]]
+                current_station_full = candidates_by_id.loc[current_station_id]
+            else:
+                duplicates, current_station_full = self.find_duplicates(
+                    current_station_id, current_station["point"], radius_m
+                )
+
             if duplicates.empty:
                 logger.debug("Only current station, no duplicates")
                 stations_to_merge = current_station_full  # .to_frame()
-                station_ids = [current_station["station_id"].item()]
+                station_ids = [current_station_id]
             else:
                 stations_to_merge = pd.concat([duplicates, current_station_full.to_frame().T])
                 station_ids = stations_to_merge["station_id_col"].values.astype(int).tolist()
 
             if not stations_to_merge.empty:
-                # merge attributes of duplicates into one station
-                session.query(Station).filter(Station.id.in_(station_ids)).update(
-                    {Station.merge_status: "is_duplicate"}, synchronize_session="fetch"
-                )
-                merged_station: Station = self._merge_duplicates(stations_to_merge, session)
-                session.add(merged_station)
-                self._write_session(session)
-        session.close()
+                self.statistics.count("clusters")
+                self.statistics.count("clustered_stations", len(station_ids))
+                self._mark_as_duplicates(station_ids)
+                yield stations_to_merge, station_ids
+
+    def _propose_clusters_in_parallel(
+        self, station_ids: Iterable[int], radius_m
+    ) -> dict[int, tuple[list[int], list[int], list[int]]]:
+        """Searches the duplicates of all stations in a pool of worker processes, one tile of the country at a time.
+
+        Every tile carries a halo of the search radius, so the proposals only differ from the final clusters where
+        stations near the border of a tile are merged with stations of another tile.
+
+        :param station_ids: ids of the stations to propose clusters for.
+        :param radius_m: search radius in meters.
+        :return: proposals by station id, see :func:`propose_clusters`.
+        """
+        station_ids = set(station_ids)
+        tiles = []
+        for tile_station_ids, tile_candidates in partition_into_tiles(
+            self.station_index.candidates, radius_m, self.tile_size_m
+        ):
+            tile_station_ids = [station_id for station_id in tile_station_ids if station_id in station_ids]
+            if tile_station_ids:
+                tiles.append((tile_station_ids, tile_candidates))
+
+        # neighbouring tiles are grouped into one task, a few tasks per worker balance the load
+        group_size = max(1, math.ceil(len(tiles) / (self.workers * TILE_GROUPS_PER_WORKER)))
+        tasks = []
+        for start in range(0, len(tiles), group_size):
+            group = tiles[start : start + group_size]
+            group_station_ids = [station_id for tile_station_ids, _ in group for station_id in tile_station_ids]
+            group_candidates = pd.concat([tile_candidates for _, tile_candidates in group])
+            tasks.append((group_station_ids, group_candidates.drop_duplicates(subset="station_id")))
+        logger.info(f"Proposing clusters for {len(tiles)} tiles in {len(tasks)} tasks with {self.workers} workers")
+
+        proposals: dict[int, tuple[list[int], list[int], list[int]]] = {}
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            futures = [
+                executor.submit(propose_clusters, group_station_ids, group_candidates, radius_m)
+                for group_station_ids, group_candidates in tasks
+            ]
+            for future in tqdm(as_completed(futures), total=len(futures)):
+                proposals.update(future.result())
+        return proposals
+
+    def _is_valid_proposal(self, nearby_station_ids: list[int], merged_station_ids: list[int]) -> bool:
+        # the search result only depends on which of the stations nearby are merged already
+        return [i for i in nearby_station_ids if i in self.duplicate_station_ids] == merged_station_ids
 
     def find_duplicates(
         self,
@@ -261,27 +474,37 @@ class StationMerger:
         radius_m,
         filter_by_source_id: bool = False,
     ) -> tuple[GeoDataFrame, pd.Series]:
-        find_surrounding_stations_sql = f"""
-            SELECT
-                s.id as station_id,
-                s.source_id as source_id,
-                s.data_source, s.point, s.operator,
-                c.capacity,
-                a.street, a.town,
-                ST_DISTANCE(s.point, ST_PointFromText('{current_station_coordinates}', 4326)::geography) as distance
-            FROM {settings.db_table_prefix}stations s
-                LEFT JOIN {settings.db_table_prefix}charging c ON s.id = c.station_id
-                LEFT JOIN {settings.db_table_prefix}address a ON s.id = a.station_id
-            WHERE
-                ST_Dwithin(s.point, ST_PointFromText('{current_station_coordinates}', 4326)::geography, {radius_m})
-                AND NOT s.is_merged
-                AND (merge_status <> 'is_duplicate' OR merge_status is null)
-                AND country_code='{self.country_code}'
-        """
-
-        with self.db_engine.connect() as con:
-            nearby_stations: GeoDataFrame = read_postgis(find_surrounding_stations_sql, con=con, geom_col="point")
+        with self.statistics.timer("query"):
+            if self.station_index is not None:
+                point = (
+                    wkt.loads(current_station_coordinates)
+                    if isinstance(current_station_coordinates, str)
+                    else current_station_coordinates
+                )
+                nearby_stations: GeoDataFrame = self.station_index.query(point, radius_m)
+            else:
+                if self.candidate_pairs is not None:
+                    nearby_stations = self.candidate_pairs.nearby_stations(current_station_id)
+                else:
+                    nearby_stations = self._query_nearby_stations(current_station_coordinates, radius_m)
+                if not nearby_stations.empty and self.duplicate_station_ids:
+                    nearby_stations = nearby_stations[~nearby_stations["station_id"].isin(self.duplicate_station_ids)]
+        self.statistics.count("queries")
+        self.statistics.count("candidates_scored", max(len(nearby_stations) - 1, 0))
+
+        with self.statistics.timer("score"):
+            return self.find_duplicates_in_nearby_stations(
+                nearby_stations, current_station_id, current_station_coordinates, radius_m, filter_by_source_id
+            )
 
+    @staticmethod
+    def find_duplicates_in_nearby_stations(
+        nearby_stations: GeoDataFrame,
+        current_station_id,
+        current_station_coordinates,
+        radius_m,
+        filter_by_source_id: bool = False,
+    ) -> tuple[GeoDataFrame, pd.Series]:
         if nearby_stations.empty:
             logger.debug(f"##### Already merged, id {current_station_id} #####")
             return GeoDataFrame(), GeoSeries()
@@ -326,3 +549,26 @@ class StationMerger:
         )
         duplicates = duplicate_candidates[duplicate_candidates["is_duplicate"]]
         return duplicates, current_station_full
+
+    def _query_nearby_stations(self, current_station_coordinates, radius_m) -> GeoDataFrame:
+        find_surrounding_stations_sql = f"""
+            SELECT
+                s.id as station_id,
+                s.source_id as source_id,
+                s.data_source, s.point, s.operator,
+                c.capacity,
+                a.street, a.town,
+                ST_DISTANCE(s.point, ST_PointFromText('{current_station_coordinates}', 4326)::geography) as distance
+            FROM {settings.db_table_prefix}stations s
+                LEFT JOIN {settings.db_table_prefix}charging c ON s.id = c.station_id
+                LEFT JOIN {settings.db_table_prefix}address a ON s.id = a.station_id
+            WHERE
+                ST_Dwithin(s.point, ST_PointFromText('{current_station_coordinates}', 4326)::geography, {radius_m})
+                AND NOT s.is_merged
+                AND (merge_status <> 'is_duplicate' OR merge_status is null)
+                AND country_code='{self.country_code}'
+        """
+
+        with self.db_engine.connect() as con:
+            nearby_stations: GeoDataFrame = read_postgis(find_surrounding_stations_sql, con=con, geom_col="point")
+        return nearby_stations
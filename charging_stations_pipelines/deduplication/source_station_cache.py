@@ -0,0 +1,97 @@
+"""In-memory cache of the source stations of a country with their address and charging rows, used by the merger to
+build merged stations without querying every source station separately."""
+
+import logging
+from typing import Any, Optional
+
+from sqlalchemy import and_, not_, or_, select
+from sqlalchemy.engine.base import Engine
+
+from charging_stations_pipelines.models.address import Address
+from charging_stations_pipelines.models.charging import Charging
+from charging_stations_pipelines.models.station import Station
+
+logger = logging.getLogger(__name__)
+
+
+def _to_model(model_class, row: dict[str, Any], **values):
+    model = model_class()
+    for key, value in row.items():
+        setattr(model, key, values[key] if key in values else value)
+    return model
+
+
+class SourceStationCache:
+    """Rows of all not yet merged source stations of a country, together with their address and charging rows.
+
+    :param stations: station rows by station id.
+    :param addresses: address rows by station id.
+    :param chargings: charging rows by station id.
+    """
+
+    def __init__(
+        self,
+        stations: dict[int, dict[str, Any]],
+        addresses: dict[int, dict[str, Any]],
+        chargings: dict[int, dict[str, Any]],
+    ):
+        self.stations = stations
+        self.addresses = addresses
+        self.chargings = chargings
+
+    def __len__(self):
+        return len(self.stations)
+
+    def __contains__(self, station_id: int):
+        return station_id in self.stations
+
+    @classmethod
+    def load(cls, db_engine: Engine, country_code: str) -> "SourceStationCache":
+        """Loads all stations of a country which are neither merged stations nor merged into one, with one query per
+        table."""
+        stations, addresses, chargings = Station.__table__, Address.__table__, Charging.__table__
+        is_source_station = and_(
+            stations.c.country_code == country_code,
+            not_(stations.c.is_merged),
+            or_(stations.c.merge_status.is_(None), stations.c.merge_status != "is_duplicate"),
+        )
+
+        with db_engine.connect() as con:
+            station_rows = con.execute(select([stations]).where(is_source_station))
+            stations_by_id = {row[stations.c.id]: dict(row) for row in station_rows}
+
+            address_rows = con.execute(
+                select([addresses]).select_from(addresses.join(stations)).where(is_source_station)
+            )
+            addresses_by_station_id = {row[addresses.c.station_id]: dict(row) for row in address_rows}
+
+            charging_rows = con.execute(
+                select([chargings]).select_from(chargings.join(stations)).where(is_source_station)
+            )
+            chargings_by_station_id = {row[chargings.c.station_id]: dict(row) for row in charging_rows}
+
+        logger.debug(
+            f"Prefetched {len(stations_by_id)} stations, {len(addresses_by_station_id)} addresses "
+            f"and {len(chargings_by_station_id)} charging rows for country {country_code}"
+        )
+        return cls(stations_by_id, addresses_by_station_id, chargings_by_station_id)
+
+    def get_station_with_address_and_charging(
+        self, station_id: int
+    ) -> tuple[Station, Optional[Address], Optional[Charging]]:
+        """Creates new, transient copies of a source station and its address and charging, ready to be merged.
+
+        Like :meth:`StationMerger.get_station_with_address_and_charging` ids and the source id are removed, and
+        address and charging are marked as merged.
+        """
+        station: Station = _to_model(Station, self.stations[station_id], id=None, source_id=None)
+
+        address: Optional[Address] = None
+        if station_id in self.addresses:
+            address = _to_model(Address, self.addresses[station_id], id=None, station_id=None, is_merged=True)
+
+        charging: Optional[Charging] = None
+        if station_id in self.chargings:
+            charging = _to_model(Charging, self.chargings[station_id], id=None, station_id=None, is_merged=True)
+
+        return station, address, charging
@@ -0,0 +1,192 @@
+"""In-memory spatial index of the duplicate candidates of one country, used by the merger instead of one
+PostGIS radius query per station."""
+
+import logging
+import math
+from collections import defaultdict
+from typing import Iterable, Optional
+
+import numpy as np
+from geopandas import GeoDataFrame, read_postgis
+from pyproj import Geod
+from shapely.geometry import Point
+from sqlalchemy.engine.base import Engine
+
+from charging_stations_pipelines import settings
+
+logger = logging.getLogger(__name__)
+
+WGS84_GEOD = Geod(ellps="WGS84")
+"""Geodesic on the WGS84 spheroid, the same model PostGIS uses for distances on geography columns."""
+
+MIN_METERS_PER_DEGREE_LAT = 110_574.0
+"""Length of one degree of latitude at the equator, i.e. the shortest one on the WGS84 spheroid."""
+
+MIN_METERS_PER_DEGREE_LON_AT_EQUATOR = 111_319.0
+"""Lower bound for the length of one degree of longitude at the equator, scaled with cos(latitude) elsewhere."""
+
+
+def search_deltas(lats, radius_m: float):
+    """Returns the half height and half width in degrees of a box around the given latitudes which contains the
+    search circle of ``radius_m`` meters, with a small safety margin.
+
+    :param lats: latitude or numpy array of latitudes.
+    :param radius_m: search radius in meters.
+    :return: tuple of latitude and longitude deltas, the latter with the shape of ``lats``.
+    """
+    delta_lat = 1.01 * radius_m / MIN_METERS_PER_DEGREE_LAT
+    max_abs_lat = np.minimum(np.abs(lats) + delta_lat, 89.9)
+    delta_lon = 1.01 * radius_m / (MIN_METERS_PER_DEGREE_LON_AT_EQUATOR * np.cos(np.radians(max_abs_lat)))
+    return delta_lat, delta_lon
+
+
+def partition_into_tiles(
+    candidates: GeoDataFrame, radius_m: float, tile_size_m: float
+) -> list[tuple[list[int], GeoDataFrame]]:
+    """Cuts the candidates into square tiles with a halo of the search radius.
+
+    Every tile consists of the ids of the stations inside of it, and of all candidates any of these stations can find
+    within ``radius_m``, i.e. the stations inside the tile plus the ones in the halo around it. A radius search done
+    with the candidates of a tile therefore gives the same result as one done with all candidates.
+
+    :param candidates: candidates as loaded by :func:`load_candidates`.
+    :param radius_m: search radius in meters.
+    :param tile_size_m: height of a tile in meters, tiles are the same number of degrees wide.
+    :return: list of tuples of the station ids inside a tile and the candidates of the tile, ordered by tile.
+    """
+    tile_size_deg = tile_size_m / MIN_METERS_PER_DEGREE_LAT
+    lons = candidates["point"].x.to_numpy(dtype=float)
+    lats = candidates["point"].y.to_numpy(dtype=float)
+    delta_lat, delta_lon = search_deltas(lats, radius_m)
+
+    own_lat_tiles = np.floor(lats / tile_size_deg).astype(int)
+    own_lon_tiles = np.floor(lons / tile_size_deg).astype(int)
+    min_lat_tiles = np.floor((lats - delta_lat) / tile_size_deg).astype(int)
+    max_lat_tiles = np.floor((lats + delta_lat) / tile_size_deg).astype(int)
+    min_lon_tiles = np.floor((lons - delta_lon) / tile_size_deg).astype(int)
+    max_lon_tiles = np.floor((lons + delta_lon) / tile_size_deg).astype(int)
+
+    station_ids = candidates["station_id"].to_numpy()
+    own_ids: dict[tuple[int, int], list[int]] = defaultdict(list)
+    tile_positions: dict[tuple[int, int], list[int]] = defaultdict(list)
+    for pos in range(len(candidates)):
+        own_ids[(own_lat_tiles[pos], own_lon_tiles[pos])].append(int(station_ids[pos]))
+        for i in range(min_lat_tiles[pos], max_lat_tiles[pos] + 1):
+            for j in range(min_lon_tiles[pos], max_lon_tiles[pos] + 1):
+                tile_positions[(i, j)].append(pos)
+
+    return [(own_ids[tile], candidates.iloc[tile_positions[tile]]) for tile in sorted(own_ids)]
+
+
+def load_candidates(db_engine: Engine, country_code: str) -> GeoDataFrame:
+    """Loads the columns needed for the duplicate search for all not yet merged stations of a country.
+
+    The columns are the same as the ones returned by :meth:`StationMerger.find_duplicates`, apart from the distance,
+    which depends on the station the search is done for.
+    """
+    get_candidates_sql = f"""
+        SELECT
+            s.id as station_id,
+            s.source_id as source_id,
+            s.data_source, s.point, s.operator,
+            c.capacity,
+            a.street, a.town
+        FROM {settings.db_table_prefix}stations s
+            LEFT JOIN {settings.db_table_prefix}charging c ON s.id = c.station_id
+            LEFT JOIN {settings.db_table_prefix}address a ON s.id = a.station_id
+        WHERE
+            s.point IS NOT NULL
+            AND NOT s.is_merged
+            AND (merge_status <> 'is_duplicate' OR merge_status is null)
+            AND country_code='{country_code}'
+    """
+    with db_engine.connect() as con:
+        candidates: GeoDataFrame = read_postgis(get_candidates_sql, con=con, geom_col="point")
+    return candidates
+
+
+class StationIndex:
+    """Grid index over station coordinates for answering radius queries in-process.
+
+    Stations are bucketed into cells of ``cell_size_m`` meters of latitude, which are the same number of degrees wide
+    in longitude. A query collects the cells overlapping the bounding box of the search circle and filters the
+    stations in them by their geodesic distance, so results match ``ST_DWithin`` / ``ST_Distance`` on geography.
+    """
+
+    def __init__(self, candidates: GeoDataFrame, cell_size_m: float = 100):
+        self.candidates = candidates.sort_values(by=["station_id"], ignore_index=True)
+        self.cell_size_deg = cell_size_m / MIN_METERS_PER_DEGREE_LAT
+
+        self.lons = self.candidates["point"].x.to_numpy(dtype=float)
+        self.lats = self.candidates["point"].y.to_numpy(dtype=float)
+        self.station_ids = self.candidates["station_id"].to_numpy()
+        self.is_active = np.ones(len(self.candidates), dtype=bool)
+
+        cells: dict[tuple[int, int], list[int]] = defaultdict(list)
+        lat_cells = np.floor(self.lats / self.cell_size_deg).astype(int)
+        lon_cells = np.floor(self.lons / self.cell_size_deg).astype(int)
+        for pos, cell in enumerate(zip(lat_cells, lon_cells)):
+            cells[cell].append(pos)
+        self.cells = {cell: np.array(positions, dtype=int) for cell, positions in cells.items()}
+        self.position_by_id = {station_id: pos for pos, station_id in enumerate(self.station_ids)}
+
+        logger.debug(f"Indexed {len(self.candidates)} stations in {len(self.cells)} grid cells")
+
+    def __len__(self):
+        return len(self.candidates)
+
+    def query(self, point, radius_m: float, include_removed: bool = False) -> GeoDataFrame:
+        """Returns all active stations within ``radius_m`` meters of ``point`` with a ``distance`` column, like the
+        radius query of :meth:`StationMerger.find_duplicates`.
+
+        :param point: shapely point with lon/lat coordinates.
+        :param radius_m: search radius in meters.
+        :param include_removed: whether to also return the stations excluded by :meth:`remove`.
+        :return: GeoDataFrame of the stations found, ordered by station id.
+        """
+        positions = self._positions_in_bbox(point.x, point.y, radius_m)
+        if not include_removed:
+            positions = positions[self.is_active[positions]]
+        if len(positions) == 0:
+            return GeoDataFrame()
+
+        _, _, distances = WGS84_GEOD.inv(
+            np.full(len(positions), point.x),
+            np.full(len(positions), point.y),
+            self.lons[positions],
+            self.lats[positions],
+        )
+        within_radius = distances <= radius_m
+        positions = positions[within_radius]
+        if len(positions) == 0:
+            return GeoDataFrame()
+
+        order = np.argsort(positions)
+        nearby_stations = self.candidates.iloc[positions[order]].reset_index(drop=True)
+        nearby_stations["distance"] = distances[within_radius][order]
+        return nearby_stations
+
+    def point(self, station_id: int) -> Optional[Point]:
+        """Returns the coordinates of a station of the index, or None if it is not part of it."""
+        pos = self.position_by_id.get(station_id)
+        return Point(self.lons[pos], self.lats[pos]) if pos is not None else None
+
+    def remove(self, station_ids: Iterable[int]):
+        """Excludes the given stations from all further queries, e.g. after they have been merged."""
+        for station_id in station_ids:
+            pos = self.position_by_id.get(station_id)
+            if pos is not None:
+                self.is_active[pos] = False
+
+    def _positions_in_bbox(self, lon: float, lat: float, radius_m: float) -> np.ndarray:
+        # the exact filtering is done on the geodesic distance afterwards
+        delta_lat, delta_lon = search_deltas(lat, radius_m)
+
+        lat_range = range(
+            math.floor((lat - delta_lat) / self.cell_size_deg), math.floor((lat + delta_lat) / self.cell_size_deg) + 1
+        )
+        lon_range = range(
+            math.floor((lon - delta_lon) / self.cell_size_deg), math.floor((lon + delta_lon) / self.cell_size_deg) + 1
+        )
+        found = [self.cells[(i, j)] for i in lat_range for j in lon_range if (i, j) in self.cells]
+        return np.concatenate(found) if found else np.array([], dtype=int)
@@ -24,6 +24,7 @@ class Station(Base):
     date_created = Column(Date)
     date_updated = Column(Date)
     raw_data = Column(JSON)
+    content_hash = Column(String)
     country_code = Column(String)
     address = relationship("Address", back_populates="station", uselist=False)
     charging = relationship("Charging", back_populates="station", uselist=False)
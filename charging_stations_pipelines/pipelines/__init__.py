@@ -1,23 +1,39 @@
 """Module for data processing pipelines."""
 
 import configparser
-from typing import Optional, Union
+import logging
+from pathlib import Path
+from typing import Callable, Iterable, Optional, TypeVar, Union
 
 import pandas as pd
 from sqlalchemy.orm import Session
 
-from charging_stations_pipelines.shared import JSON
+from charging_stations_pipelines import db_utils
+from charging_stations_pipelines.models.station import Station
+from charging_stations_pipelines.pipelines.staging import is_staged, stage_stations, staged_path
+from charging_stations_pipelines.pipelines.station_table_updater import StationTableUpdater
+from charging_stations_pipelines.shared import JSON, is_file_imported, mark_file_imported
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
 
 
 class Pipeline:
     """Base class for data processing pipelines."""
 
-    def __init__(self, config: configparser, session: Optional[Session], online=False):
+    def __init__(
+        self, config: configparser, session: Optional[Session], online=False, incremental=False, workers: int = 1
+    ):
         self.config = config
         self.session = session
         self.online = online
+        self.incremental = incremental
+        self.workers = workers
 
         self.data: Optional[Union[pd.DataFrame, JSON]] = None
+        self.staged_file: Optional[Path] = None
+        self.not_parseable_count: Optional[int] = None
 
     def retrieve_data(self):
         """Retrieves the data from the data source."""
@@ -26,3 +42,57 @@ class Pipeline:
     def run(self):
         """Executes the pipeline and ingests the data."""
         raise NotImplementedError
+
+    def is_already_imported(self, file_path, data_source: str, country_code: str) -> bool:
+        """Returns whether the import of a source file can be skipped, because the file is unchanged since its last
+        complete import and the imported stations are still in the database, e.g. not deleted by ``--delete_data``.
+
+        :param file_path: path of the downloaded source file.
+        :param data_source: data source the stations of the file are imported as.
+        :param country_code: country the stations of the file are imported for.
+        """
+        if not is_file_imported(file_path) or not db_utils.has_stations(self.session, data_source, country_code):
+            return False
+        logger.info(f"{data_source} data for {country_code} is unchanged since its last import, skipping import")
+        return True
+
+    def mark_imported(self, file_path, station_updater: StationTableUpdater):
+        """Marks a source file as imported completely, so that later imports of the unchanged file are skipped, unless
+        some of its stations could not be written, which are retried by the next import then.
+
+        :param file_path: path of the imported source file.
+        :param station_updater: updater the stations of the file were written with.
+        """
+        if station_updater.failed_count:
+            logger.warning(
+                f"{station_updater.failed_count} stations of {file_path} could not be written, "
+                f"the file will be imported again by the next import"
+            )
+            return
+        mark_file_imported(file_path)
+
+    def stage(
+        self, source_file, parse_records: Callable[[], Iterable[tuple[str, T]]], map_record: Callable[[T], Station]
+    ):
+        """Stages the stations of a source file, unless its staged dataset is up to date, and keeps the path of the
+        staged dataset in :attr:`staged_file` and the number of records which could not be mapped in
+        :attr:`not_parseable_count`, which stays None if the file isn't parsed again.
+
+        :param source_file: path of the source file.
+        :param parse_records: function parsing the source file, returning tuples of the content hash and the record.
+            It is only called if the file needs to be staged.
+        :param map_record: module level function mapping a record to a station with address and charging.
+        """
+        if is_staged(source_file):
+            logger.info(f"Stations of {source_file} are staged already, skipping parsing")
+            self.staged_file = staged_path(source_file)
+            return
+        self.staged_file, self.not_parseable_count = stage_stations(
+            source_file, parse_records(), map_record, self.workers
+        )
+
+    def not_parseable_summary(self) -> str:
+        """Returns the number of records which could not be mapped, for the summary of a run."""
+        if self.not_parseable_count is None:
+            return "none parsed, the stations were staged by a previous run"
+        return str(self.not_parseable_count)
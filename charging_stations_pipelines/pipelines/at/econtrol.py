@@ -6,12 +6,15 @@ The data is structured into three main objects:
 """
 import collections
 import configparser
+import functools
 import logging
+from typing import Iterator
 
 import pandas as pd
 from sqlalchemy.orm import Session
 from tqdm import tqdm
 
+from charging_stations_pipelines.models.station import Station
 from charging_stations_pipelines.pipelines import Pipeline
 from charging_stations_pipelines.pipelines.at import DATA_SOURCE_KEY
 from charging_stations_pipelines.pipelines.at.econtrol_crawler import get_data
@@ -20,14 +23,23 @@ from charging_stations_pipelines.pipelines.at.econtrol_mapper import (
     map_charging,
     map_station,
 )
+from charging_stations_pipelines.pipelines.staging import iter_staged_stations
 from charging_stations_pipelines.pipelines.station_table_updater import (
     StationTableUpdater,
 )
-from charging_stations_pipelines.shared import country_import_data_path
+from charging_stations_pipelines.shared import content_hash, country_import_data_path
 
 logger = logging.getLogger(__name__)
 
 
+def map_econtrol_datapoint(datapoint: pd.Series, country_code: str) -> Station:
+    """Maps a data point of e-control.at to a station with address and charging."""
+    station = map_station(datapoint, country_code)
+    station.address = map_address(datapoint, country_code, None)
+    station.charging = map_charging(datapoint, None)
+    return station
+
+
 class EcontrolAtPipeline(Pipeline):
     """:class:`EcontrolAtPipeline` is a class that represents a pipeline for processing data
     from the e-control.at (aka ladestellen.at) - an official data source from the Austrian government.
@@ -41,20 +53,36 @@ class EcontrolAtPipeline(Pipeline):
     :ivar online: A boolean indicating whether the pipeline should retrieve data online.
     """
 
-    def __init__(self, config: configparser, session: Session, online: bool = False):
-        super().__init__(config, session, online)
+    def __init__(
+        self,
+        config: configparser,
+        session: Session,
+        online: bool = False,
+        incremental: bool = False,
+        workers: int = 1,
+    ):
+        super().__init__(config, session, online, incremental, workers)
 
         # Is always 'AT' for this pipeline
         self.country_code = "AT"
 
     def _retrieve_data(self):
-        tmp_data_path = country_import_data_path(self.country_code) / self.config[DATA_SOURCE_KEY]["filename"]
+        self.data_path = country_import_data_path(self.country_code) / self.config[DATA_SOURCE_KEY]["filename"]
         if self.online:
             logger.info("Retrieving Online Data")
-            get_data(tmp_data_path)
+            get_data(self.data_path)
+        if self.is_already_imported(self.data_path, DATA_SOURCE_KEY, self.country_code):
+            return
+        map_datapoint = functools.partial(map_econtrol_datapoint, country_code=self.country_code)
+        self.stage(self.data_path, self._parse_datapoints, map_datapoint)
+
+    def _parse_datapoints(self) -> Iterator[tuple[str, pd.Series]]:
         # NOTE, read data from json file in NDJSON (newline delimited JSON) format,
         #   i.e. one json object per line, thus `lines=True` is required
-        self.data = pd.read_json(tmp_data_path, lines=True)  # pd.DataFrame
+        self.data = pd.read_json(self.data_path, lines=True)  # pd.DataFrame
+        datapoint: pd.Series
+        for _, datapoint in tqdm(iterable=self.data.iterrows(), total=self.data.shape[0]):
+            yield content_hash(datapoint), datapoint
 
     def run(self):
         """Runs the pipeline for a data source.
@@ -64,45 +92,42 @@ class EcontrolAtPipeline(Pipeline):
         """
         logger.info(f"Running {DATA_SOURCE_KEY} Pipeline...")
         self._retrieve_data()
-        station_updater = StationTableUpdater(session=self.session, logger=logger)
+        if self.staged_file is None:
+            return
+        station_updater = StationTableUpdater(session=self.session, logger=logger, incremental=self.incremental)
 
         stats = collections.defaultdict(int)
-        datapoint: pd.Series
-        for _, datapoint in tqdm(iterable=self.data.iterrows(), total=self.data.shape[0]):
-            try:
-                station = map_station(datapoint, self.country_code)
-
-                # Address mapping
-                station.address = map_address(datapoint, self.country_code, None)
-
-                # Count stations that have some kind of country code mismatch
-                if (
-                    # Count stations which have an invalid country code in address
-                    (station.address and station.address.country and station.address.country != "AT")
-                    # Count stations which have a mismatching country code between Station and Address
-                    or (
-                        station.country_code is not None
-                        and station.address is not None
-                        and station.address.country is not None
-                        and station.country_code != station.address.country
-                    )
-                ):
-                    stats["count_country_mismatch_stations"] += 1
-
-                # Charging point
-                station.charging = map_charging(datapoint, None)
-
-                station_updater.update_station(station, DATA_SOURCE_KEY)
+
+        def skip_unchanged(record_hash: str) -> bool:
+            if station_updater.skip_unchanged(record_hash, DATA_SOURCE_KEY, self.country_code):
                 stats["count_valid_stations"] += 1
-            except Exception as e:
-                stats["count_parse_error"] += 1
-                logger.debug(
-                    f"{DATA_SOURCE_KEY} entry could not be parsed, error:\n{e}\n" f"Row:\n----\n{datapoint}\n----\n"
+                return True
+            return False
+
+        for station in iter_staged_stations(self.staged_file, skip_unchanged):
+            # Count stations that have some kind of country code mismatch
+            if (
+                # Count stations which have an invalid country code in address
+                (station.address and station.address.country and station.address.country != "AT")
+                # Count stations which have a mismatching country code between Station and Address
+                or (
+                    station.country_code is not None
+                    and station.address is not None
+                    and station.address.country is not None
+                    and station.country_code != station.address.country
                 )
+            ):
+                stats["count_country_mismatch_stations"] += 1
+
+            station_updater.update_station(station, DATA_SOURCE_KEY)
+            stats["count_valid_stations"] += 1
         logger.info(
             f"Finished {DATA_SOURCE_KEY} Pipeline:\n"
             f"1. Valid stations found: {stats['count_valid_stations']}\n"
-            f"2. Not parseable stations: {stats['count_parse_error']}\n"
+            f"2. Not parseable stations: {self.not_parseable_summary()}\n"
             f"3. Wrong country code stations: {stats['count_country_mismatch_stations']}."
         )
+        station_updater.flush()
+        station_updater.remove_missing_stations()
         station_updater.log_update_station_counts()
+        self.mark_imported(self.data_path, station_updater)
@@ -1,59 +1,166 @@
 """Module to download the e-control.at (ladestellen.at) data from a specified URL."""
 
+import itertools
 import json
 import logging
 import os
-from typing import Any, Final, Generator
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Final, Iterator, Optional
 
 import requests
 
+from charging_stations_pipelines import settings
 from charging_stations_pipelines.pipelines import at
+from charging_stations_pipelines.shared import record_download
 
 logger = logging.getLogger(__name__)
 
+PAGE_RETRIES: Final[int] = 3
+"""Number of times the download of a page is retried after a connection or server error."""
 
-def _get_paginated_stations(url: str, headers: dict[str, str] = None) -> Generator[dict[str, Any], None, None]:
-    session = requests.Session()
-    session.headers.update(headers)
+RETRY_BACKOFF_SECONDS: Final[float] = 2.0
+"""Delay before the first retry of a page, doubled with every further retry."""
+
+PAGES_IN_FLIGHT_PER_WORKER: Final[int] = 2
+"""Number of pages requested ahead per worker thread, bounding the pages held in memory."""
 
-    first_page = session.get(url).json()
-    if not first_page:
-        yield {}
 
+def _create_session(headers: Optional[dict[str, str]]) -> requests.Session:
+    session = requests.Session()
+    session.headers.update(headers or {})
+    return session
+
+
+def _get_page(session: requests.Session, url: str, params: Optional[dict[str, int]] = None) -> dict[str, Any]:
+    """Gets one page of stations, retrying with exponential backoff on connection and server errors."""
+    for attempt in range(PAGE_RETRIES + 1):
+        try:
+            response = session.get(url, params=params) if params else session.get(url)
+            response.raise_for_status()
+            return response.json()
+        except (requests.RequestException, ValueError) as e:
+            is_client_error = (
+                isinstance(e, requests.HTTPError) and e.response is not None and e.response.status_code < 500
+            )
+            if attempt == PAGE_RETRIES or (is_client_error and e.response.status_code != 429):
+                raise
+            delay = RETRY_BACKOFF_SECONDS * 2**attempt
+            logger.warning(f"Failed to download page {params or 'first'}: {e}, retrying in {delay} seconds")
+            time.sleep(delay)
+
+
+def _get_pages_concurrently(
+    url: str, headers: Optional[dict[str, str]], page_params: list[dict[str, int]], workers: int
+) -> Iterator[dict[str, Any]]:
+    """Gets the given pages in a pool of threads with a session each, and yields them in the order of the params."""
+    sessions = []
+    thread_local = threading.local()
+
+    def get_page(params: dict[str, int]) -> dict[str, Any]:
+        if not hasattr(thread_local, "session"):
+            thread_local.session = _create_session(headers)
+            sessions.append(thread_local.session)
+        return _get_page(thread_local.session, url, params)
+
+    in_flight: deque[Future] = deque()
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for params in page_params:
+                in_flight.append(executor.submit(get_page, params))
+                if len(in_flight) >= workers * PAGES_IN_FLIGHT_PER_WORKER:
+                    yield in_flight.popleft().result()
+            while in_flight:
+                yield in_flight.popleft().result()
+    finally:
+        for future in in_flight:
+            future.cancel()
+        for session in sessions:
+            session.close()
+
+
+def _get_paginated_stations(
+    url: str, headers: dict[str, str] = None, workers: int = 1, skip_stations: int = 0
+) -> Iterator[dict[str, Any]]:
+    """Gets all pages of stations in the order of their index.
+
+    The first page tells the total number of stations and the page size, the remaining pages are downloaded by
+    ``workers`` threads concurrently if more than one worker is given.
+
+    :param url: url of the stations search.
+    :param headers: HTTP headers of all requests, e.g. the authorization.
+    :param workers: number of pages downloaded at the same time.
+    :param skip_stations: number of stations which don't need to be downloaded again, only the pages after the last
+        complete page of them are yielded.
+    :return: iterator of the pages.
+    """
+    session = _create_session(headers)
+
+    first_page = _get_page(session, url)
     try:
         # Sample data from returned JSON chunk: "totalResults":9454,"fromIndex":0,"endIndex":999
         total_count = first_page["totalResults"]
-        logger.info(f"Total count of stations: {total_count}")
-        yield first_page
-
         idx_start = first_page["fromIndex"]
         idx_end = first_page["endIndex"]
     except KeyError as e:
         logging.fatal(f"Failed to parse response:\n{first_page}\n{e}")
         raise e
+    logger.info(f"Total count of stations: {total_count}")
 
     # Number of datapoints (=station) per page, e.g. 1000
-    page_size: Final[int] = idx_end - idx_start + 1
-
-    if total_count <= page_size:
-        # No pagination needed
-        yield
-
+    page_size: Final[int] = max(1, idx_end - idx_start + 1)
     num_pages = total_count // page_size + (1 if total_count % page_size else 0)
-    for page_num in range(2, num_pages + 1):
-        idx_start = page_size * (page_num - 1)
-        idx_end = min(page_size * page_num - 1, total_count - 1)
-
-        logger.debug(f"Downloading chunk: {idx_start}..{idx_end}")
-        next_page = session.get(url, params={"fromIndex": idx_start, "endIndex": idx_end}).json()
-        yield next_page
 
+    first_page_num = skip_stations // page_size + 1
+    if first_page_num == 1:
+        yield first_page
 
-def get_data(tmp_data_path):
+    page_params = [
+        {"fromIndex": page_size * (page_num - 1), "endIndex": min(page_size * page_num - 1, total_count - 1)}
+        for page_num in range(max(2, first_page_num), num_pages + 1)
+    ]
+    if workers > 1 and len(page_params) > 1:
+        logger.debug(f"Downloading {len(page_params)} pages with {workers} threads")
+        yield from _get_pages_concurrently(url, headers, page_params, workers)
+    else:
+        for params in page_params:
+            logger.debug(f"Downloading chunk: {params['fromIndex']}..{params['endIndex']}")
+            yield _get_page(session, url, params)
+    session.close()
+
+
+def _count_lines(file_path) -> int:
+    """Counts the complete, i.e. newline terminated, lines of a file."""
+    count = 0
+    with open(file_path, "rb") as f:
+        while chunk := f.read(1 << 20):
+            count += chunk.count(b"\n")
+    return count
+
+
+def _truncate_lines(file_path, num_lines: int):
+    """Truncates a file after its first ``num_lines`` lines."""
+    with open(file_path, "rb+") as f:
+        for _ in range(num_lines):
+            f.readline()
+        f.truncate(f.tell())
+
+
+def get_data(
+    tmp_data_path,
+    workers: int = settings.econtrol_at_fetch_workers,
+    resume: bool = settings.econtrol_at_resume_download,
+):
     """Downloads data from a specified URL and saves it to a file.
 
     :param tmp_data_path: The path to the file where the data will be saved.
     :type tmp_data_path: str
+    :param workers: The number of pages downloaded concurrently.
+    :type workers: int
+    :param resume: Whether to continue an interrupted download, keeping the complete pages already in the file.
+    :type resume: bool
     :return: None
     :rtype: None
     """
@@ -69,14 +176,25 @@ def get_data(tmp_data_path):
     }
     logger.debug(f"Using HTTP headers:\n{headers}")
 
+    stations_on_disk = _count_lines(tmp_data_path) if resume and os.path.isfile(tmp_data_path) else 0
+    pages = _get_paginated_stations(url, headers, workers=workers, skip_stations=stations_on_disk)
+    if stations_on_disk:
+        # drop the stations of the last, possibly incomplete page, which is downloaded again
+        first_page = next(pages, None)
+        if first_page:
+            _truncate_lines(tmp_data_path, first_page["fromIndex"])
+            pages = itertools.chain([first_page], pages)
+        logger.info(f"Resuming download of {at.DATA_SOURCE_KEY} data after {stations_on_disk} stations")
+
     logger.info(f"Downloading {at.DATA_SOURCE_KEY} data from {url}...")
-    with open(tmp_data_path, "w") as f:
-        for page in _get_paginated_stations(url, headers):
+    with open(tmp_data_path, "a" if stations_on_disk else "w") as f:
+        for page in pages:
             logger.debug(f"Getting data: {page['fromIndex']}..{page['endIndex']}")
 
             # Save as newline-delimited JSON (*.ndjson), i.e. one JSON object per line
             for station in page["stations"]:
                 json.dump(station, f, ensure_ascii=False)
                 f.write("\n")
+    record_download(tmp_data_path, url)
     logger.info(f"Downloaded {at.DATA_SOURCE_KEY} data to: {tmp_data_path}")
     logger.info(f"Downloaded file size: {os.path.getsize(tmp_data_path)} bytes")
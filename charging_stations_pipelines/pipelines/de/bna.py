@@ -2,6 +2,7 @@
 
 import configparser
 import logging
+from typing import Any, Iterator
 
 import pandas as pd
 from sqlalchemy.orm import Session
@@ -10,53 +11,80 @@ from tqdm import tqdm
 from . import DATA_SOURCE_KEY
 from .bna_crawler import get_bna_data
 from .bna_mapper import (
+    charging_from_columns_bna,
     map_address_bna,
-    map_charging_bna,
+    map_charging_columns_bna,
     map_station_bna,
 )
+from ...models.station import Station
 from ...pipelines import Pipeline
+from ...pipelines.staging import load_staged_stations
 from ...pipelines.station_table_updater import StationTableUpdater
-from ...shared import load_excel_file, country_import_data_path
+from ...shared import content_hash, load_excel_file, country_import_data_path
 
 logger = logging.getLogger(__name__)
 
 
+def map_bna_row(record: tuple[pd.Series, dict[str, Any]]) -> Station:
+    """Maps a row of the BNA Excel file to a station with address and charging.
+
+    :param record: tuple of the row and of its charging attributes mapped by :func:`map_charging_columns_bna`.
+    """
+    row, charging_row = record
+    mapped_station = map_station_bna(row)
+    mapped_station.address = map_address_bna(row, None)
+    mapped_station.charging = charging_from_columns_bna(charging_row, None)
+    return mapped_station
+
+
 class BnaPipeline(Pipeline):
-    def __init__(self, config: configparser, session: Session, online: bool = False):
-        super().__init__(config, session, online)
+    def __init__(
+        self,
+        config: configparser,
+        session: Session,
+        online: bool = False,
+        incremental: bool = False,
+        workers: int = 1,
+    ):
+        super().__init__(config, session, online, incremental, workers)
 
         # All BNA data is from Germany
         self.country_code = "DE"
 
     def retrieve_data(self):
-        tmp_data_path = country_import_data_path(self.country_code) / self.config[DATA_SOURCE_KEY]["filename"]
+        self.data_path = country_import_data_path(self.country_code) / self.config[DATA_SOURCE_KEY]["filename"]
 
         if self.online:
             logger.info("Retrieving Online Data")
-            get_bna_data(tmp_data_path)
+            get_bna_data(self.data_path)
+        if self.is_already_imported(self.data_path, DATA_SOURCE_KEY, self.country_code):
+            return
+        self.stage(self.data_path, self._parse_rows, map_bna_row)
+
+    def _parse_rows(self) -> Iterator[tuple[str, tuple[pd.Series, dict[str, Any]]]]:
+        logger.info(f"Loading data from file: {self.data_path}")
+        self.data: pd.DataFrame = load_excel_file(self.data_path)
+        logger.info(f"Finished loading data: {self.data.shape} rows!")
 
-            logger.info(f"Loading data from file: {tmp_data_path}")
-            self.data: pd.DataFrame = load_excel_file(tmp_data_path)
-            logger.info(f"Finished loading data: {self.data.shape} rows!")
+        # plain dicts, as building a Series per row of the list columns would add back the per row overhead
+        charging_records = map_charging_columns_bna(self.data).to_dict("records")
+        rows = zip(self.data.iterrows(), charging_records)
+        for (_, row), charging_row in tqdm(iterable=rows, total=self.data.shape[0]):
+            yield content_hash(row), (row, charging_row)
 
     def run(self):
         logger.info(f"Running {self.country_code}/{DATA_SOURCE_KEY} Pipeline...")
         self.retrieve_data()
+        if self.staged_file is None:
+            return
 
-        logger.info(f"Mapping {DATA_SOURCE_KEY} data...")
-        station_updater = StationTableUpdater(session=self.session, logger=logger)
-        row: pd.Series
-        for _, row in tqdm(iterable=self.data.iterrows(), total=self.data.shape[0]):
-            try:
-                mapped_station = map_station_bna(row)
-                mapped_station.address = map_address_bna(row, None)
-                mapped_station.charging = map_charging_bna(row, None)
-            except Exception as e:
-                logger.error(f"{DATA_SOURCE_KEY} entry could not be mapped! Error: {e}")
-                continue
+        logger.info(f"Loading staged {DATA_SOURCE_KEY} data...")
+        station_updater = StationTableUpdater(session=self.session, logger=logger, incremental=self.incremental)
+        load_staged_stations(self.staged_file, station_updater, DATA_SOURCE_KEY, self.country_code)
 
-            station_updater.update_station(mapped_station, DATA_SOURCE_KEY)
+        station_updater.flush()
+        station_updater.remove_missing_stations()
 
         station_updater.log_update_station_counts()
-        logger.info("Finished mapping!")
+        self.mark_imported(self.data_path, station_updater)
         logger.info(f"Finished {self.country_code}/{DATA_SOURCE_KEY} Pipeline!")
@@ -1,10 +1,9 @@
 """Mapper for the BNA data source."""
 import hashlib
 import logging
-from numbers import Number
-from typing import Optional, Union
+from typing import Any, Union
 
-import math
+import numpy as np
 import pandas as pd
 from geoalchemy2.shape import from_shape
 from shapely.geometry import Point
@@ -64,78 +63,91 @@ def map_address_bna(row: pd.Series, station_id) -> Address:
     return address
 
 
-def map_charging_bna(row: pd.Series, station_id):
-    """Maps the data from the given pandas Series (row) to create a Charging object for storage in the DB."""
-    total_kw: Optional[Union[str, float]] = row["Nennleistung Ladeeinrichtung [kW]"]
-    station_raw = dict(row)
-
-    if isinstance(total_kw, str):
-        try:
-            total_kw = float(total_kw.replace(",", "."))
-            logger.debug(f"Converting total_kw from string {total_kw} to int!")
-        except Exception as conversionErr:
-            logger.warning(f"Failed to convert string {total_kw} to Number! Will set total_kw to None! {conversionErr}")
-            total_kw = None
-
-    if isinstance(total_kw, Number) and math.isnan(total_kw):
-        total_kw = None
-
-    if not isinstance(total_kw, Number):
-        logger.warning(f"Cannot process total_kw {total_kw} with type {type(total_kw)}! Will set total_kw to None!")
-        total_kw = None
-
-    # kw_list
-    kw_list: list[float] = []
-    for k, v in station_raw.items():
-        if not (("P" in k) & ("[kW]" in k)):
-            continue
-        if pd.isna(v):
-            continue
-        if isinstance(v, str):
-            if "," in v:
-                v: str = v.replace(",", ".")
-                logger.debug("Replaced coma with point for string to float conversion of kw!")
-            try:
-                float_kw: float = float(v)
-                kw_list += [float_kw]
-            except Exception:
-                logger.warning(f"Failed to convert kw string {v} to float! Will not add this kw entry to list!")
-        if isinstance(v, Number):
-            kw_list += [v]
-
-    capacity: Optional[int] = row["Anzahl Ladepunkte"]
-    if len(kw_list) != row["Anzahl Ladepunkte"]:
-        logger.warning(f"kw_list {kw_list} length does not equal capacity {capacity}!")
-
-    # Stations with only Schuko-Steckern are no charging stations for cars.
-    # if kw_list and max(kw_list) < MIN_KW:
-    #    raise ValueError("Max electrical power smaller than %d kW" % MIN_KW)
-    # ampere_list not available
-    # volt_list not available
-    # socket_type_list
-    socket_types_infos: list[str] = [
-        v for k, v in station_raw.items() if ("Steckertypen" in k) & (isinstance(v, str)) & (not pd.isnull(v))
-    ]
-    socket_type_list: list[str] = []
-    dc_support: bool = False
-    for socket_types_info in socket_types_infos:
-        tmp_socket_info: list[str] = socket_types_info.split(",")
-        if (not dc_support) & (any(["DC" in s for s in tmp_socket_info])):  # TODO: find more reliable way!
-            dc_support = True
-        socket_type_list += socket_types_info.split(",")
-    kw_list_len: int = len(kw_list)
-    if len(kw_list) != capacity:
-        logger.warning(f"Difference between length of kw_list {kw_list_len} and capacity {capacity}!")
-
+def _is_kw_column(column_name) -> bool:
+    return isinstance(column_name, str) and "P" in column_name and "[kW]" in column_name
+
+
+def _is_socket_types_column(column_name) -> bool:
+    return isinstance(column_name, str) and "Steckertypen" in column_name
+
+
+def parse_decimal_column(column: pd.Series) -> pd.Series:
+    """Parses a column of numbers and of strings with decimal commas or points to floats, missing or invalid values
+    become NaN."""
+    as_strings = column.astype(object).where(column.notna()).astype(str)
+    return pd.to_numeric(as_strings.str.replace(",", ".", regex=False), errors="coerce").astype(float)
+
+
+def map_charging_columns_bna(data: pd.DataFrame) -> pd.DataFrame:
+    """Maps the charging attributes of all rows of the BNA data at once, column by column.
+
+    The kW and socket type columns are looked up once, their values are parsed for the whole column, and the
+    attributes per row are derived from the resulting arrays.
+
+    :param data: BNA data as loaded from the Excel file.
+    :return: data frame with the index of ``data`` and the columns capacity, total_kw, kw_list, max_kw,
+        socket_type_list and dc_support.
+    """
+    kw_columns = [column for column in data.columns if _is_kw_column(column)]
+    socket_types_columns = [column for column in data.columns if _is_socket_types_column(column)]
+
+    total_kw = parse_decimal_column(data["Nennleistung Ladeeinrichtung [kW]"])
+    num_invalid_total_kw = int((data["Nennleistung Ladeeinrichtung [kW]"].notna() & total_kw.isna()).sum())
+    if num_invalid_total_kw:
+        logger.warning(f"Failed to convert total_kw of {num_invalid_total_kw} rows to Number! Will set it to None!")
+
+    kw = np.empty((len(data), len(kw_columns)))
+    for i, column in enumerate(kw_columns):
+        kw[:, i] = parse_decimal_column(data[column]).to_numpy()
+    has_kw = ~np.isnan(kw)
+    kw_lists = [row_kw[row_has_kw].tolist() for row_kw, row_has_kw in zip(kw, has_kw)]
+    max_kw = np.where(has_kw, kw, -np.inf).max(axis=1, initial=-np.inf)
+
+    socket_types = [data[column].astype(object).str.split(",") for column in socket_types_columns]
+    socket_type_lists = [
+        [socket_type for types in row_types if isinstance(types, list) for socket_type in types]
+        for row_types in zip(*socket_types)
+    ] or [[] for _ in range(len(data))]
+    dc_support = np.zeros(len(data), dtype=bool)
+    for column in socket_types_columns:
+        dc_support |= data[column].astype(object).str.contains("DC", regex=False).fillna(False).to_numpy(dtype=bool)
+
+    capacity = data["Anzahl Ladepunkte"]
+    num_capacity_mismatches = int((np.array([len(kw_list) for kw_list in kw_lists]) != capacity.to_numpy()).sum())
+    if num_capacity_mismatches:
+        logger.warning(f"Length of kw_list does not equal capacity for {num_capacity_mismatches} rows!")
+
+    return pd.DataFrame(
+        {
+            "capacity": capacity,
+            "total_kw": total_kw.astype(object).where(total_kw.notna(), None),
+            "kw_list": kw_lists,
+            "max_kw": pd.Series(
+                [kw if kw != -np.inf else None for kw in max_kw.tolist()], index=data.index, dtype=object
+            ),
+            "socket_type_list": socket_type_lists,
+            "dc_support": dc_support,
+        },
+        index=data.index,
+    )
+
+
+def charging_from_columns_bna(charging_row: Union[pd.Series, dict[str, Any]], station_id) -> Charging:
+    """Creates a Charging object from a row of the attributes mapped by :func:`map_charging_columns_bna`."""
     charging = Charging()
     charging.station_id = station_id
-    charging.capacity = capacity
-    charging.kw_list = kw_list
+    charging.capacity = charging_row["capacity"]
+    charging.kw_list = charging_row["kw_list"]
     charging.ampere_list = None
     charging.volt_list = None
-    charging.socket_type_list = socket_type_list
-    charging.dc_support = dc_support
-    charging.total_kw = total_kw
-    charging.max_kw = max(kw_list) if kw_list else None
-
+    charging.socket_type_list = charging_row["socket_type_list"]
+    charging.dc_support = bool(charging_row["dc_support"])
+    charging.total_kw = charging_row["total_kw"]
+    charging.max_kw = charging_row["max_kw"]
     return charging
+
+
+def map_charging_bna(row: pd.Series, station_id):
+    """Maps the data from the given pandas Series (row) to create a Charging object for storage in the DB."""
+    charging_row = map_charging_columns_bna(row.to_frame().T).iloc[0]
+    return charging_from_columns_bna(charging_row, station_id)
@@ -1,47 +1,87 @@
 """Pipeline for retrieving data from the French government website."""
 
 import logging
+from typing import Final, Iterator
 
 import pandas as pd
 import requests as requests
 from bs4 import BeautifulSoup
 from tqdm import tqdm
 
+from charging_stations_pipelines.models.station import Station
 from charging_stations_pipelines.pipelines import Pipeline
 from charging_stations_pipelines.pipelines.fr.france_mapper import (
     map_address_fra,
     map_charging_fra,
+    map_columns_fra,
     map_station_fra,
 )
+from charging_stations_pipelines.pipelines.staging import load_staged_stations
 from charging_stations_pipelines.pipelines.station_table_updater import (
     StationTableUpdater,
 )
-from charging_stations_pipelines.shared import download_file, reject_if, country_import_data_path
+from charging_stations_pipelines.shared import (
+    content_hash,
+    country_import_data_path,
+    download_file,
+    reject_if,
+)
 
 logger = logging.getLogger(__name__)
 
 
+CSV_CHUNK_SIZE: Final[int] = 20_000
+"""Number of rows of the csv file of the French government data read and mapped at once."""
+
+STATION_ID_COLUMN: Final[str] = "id_station_itinerance"
+"""Column of the id of a station, the csv file has a row per charge point with the same station id."""
+
+
+def map_fra_row(record: tuple[pd.Series, pd.Series]) -> Station:
+    """Maps a row of the French government data to a station with address and charging.
+
+    :param record: tuple of the row and of its converted values, see :func:`map_columns_fra`.
+    """
+    row, converted_row = record
+    mapped_station = map_station_fra(row, converted_row)
+    mapped_station.address = map_address_fra(row)
+    mapped_station.charging = map_charging_fra(converted_row)
+    return mapped_station
+
+
 class FraPipeline(Pipeline):
     def _retrieve_data(self):
-        tmp_data_path = country_import_data_path("FR") / self.config["FRGOV"]["filename"]
+        self.data_path = country_import_data_path("FR") / self.config["FRGOV"]["filename"]
         if self.online:
             logger.info("Retrieving Online Data")
-            self.download_france_gov_file(tmp_data_path)
-        self.data = self.load_csv_file(tmp_data_path)
+            self.download_france_gov_file(self.data_path)
+        if self.is_already_imported(self.data_path, "FRGOV", "FR"):
+            return
+        self.stage(self.data_path, self._parse_rows, map_fra_row)
+
+    def _parse_rows(self) -> Iterator[tuple[str, tuple[pd.Series, pd.Series]]]:
+        self.data = self.iter_csv_chunks(self.data_path)
+        seen_station_ids: set[str] = set()
+        for chunk in tqdm(self.data, unit=" chunks"):
+            chunk = chunk.drop_duplicates(subset=[STATION_ID_COLUMN])
+            chunk = chunk[~chunk[STATION_ID_COLUMN].isin(seen_station_ids)]
+            seen_station_ids.update(chunk[STATION_ID_COLUMN])
+
+            converted_chunk = map_columns_fra(chunk)
+            for (_, row), (_, converted_row) in zip(chunk.iterrows(), converted_chunk.iterrows()):
+                yield content_hash(row), (row, converted_row)
 
     def run(self):
         logger.info("Running FR GOV Pipeline...")
         self._retrieve_data()
-        self.data.drop_duplicates(subset=["id_station_itinerance"], inplace=True)
-        station_updater = StationTableUpdater(session=self.session, logger=logger)
-        for _, row in tqdm(self.data.iterrows(), total=self.data.shape[0]):
-            mapped_address = map_address_fra(row)
-            mapped_charging = map_charging_fra(row)
-            mapped_station = map_station_fra(row)
-            mapped_station.address = mapped_address
-            mapped_station.charging = mapped_charging
-            station_updater.update_station(station=mapped_station, data_source_key="FRGOV")
+        if self.staged_file is None:
+            return
+        station_updater = StationTableUpdater(session=self.session, logger=logger, incremental=self.incremental)
+        load_staged_stations(self.staged_file, station_updater, "FRGOV", "FR")
+        station_updater.flush()
+        station_updater.remove_missing_stations()
         station_updater.log_update_station_counts()
+        self.mark_imported(self.data_path, station_updater)
 
     @staticmethod
     def download_france_gov_file(target_file):
@@ -66,7 +106,22 @@ class FraPipeline(Pipeline):
         download_file(link_to_dataset[0]["href"], target_file)
 
     @staticmethod
-    def load_csv_file(target_file):
+    def iter_csv_chunks(target_file) -> Iterator[pd.DataFrame]:
+        """Reads the csv file in chunks of :data:`CSV_CHUNK_SIZE` rows, with all columns as strings, so that the types
+        don't depend on the values of a chunk. Values are converted column by column by :func:`map_columns_fra`."""
+        with pd.read_csv(
+            target_file,
+            delimiter=",",
+            encoding="utf-8",
+            encoding_errors="replace",
+            dtype=str,
+            chunksize=CSV_CHUNK_SIZE,
+        ) as reader:
+            yield from reader
+
+    @staticmethod
+    def load_csv_file(target_file) -> pd.DataFrame:
+        """Reads the whole csv file with the inferred column types, e.g. to check the schema of a download."""
         return pd.read_csv(
             target_file,
             delimiter=",",
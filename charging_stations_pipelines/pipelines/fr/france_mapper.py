@@ -1,7 +1,6 @@
 """Mapper for the French charging stations data."""
 
 import logging
-from datetime import datetime
 
 import pandas as pd
 from geoalchemy2.shape import from_shape
@@ -10,7 +9,7 @@ from shapely.geometry import Point
 from charging_stations_pipelines.models.address import Address
 from charging_stations_pipelines.models.charging import Charging
 from charging_stations_pipelines.models.station import Station
-from charging_stations_pipelines.shared import check_coordinates
+from charging_stations_pipelines.shared import check_coordinates_column
 
 logger = logging.getLogger(__name__)
 
@@ -27,33 +26,61 @@ def map_address_fra(row: pd.Series) -> Address:
     return address
 
 
-def map_station_fra(row: pd.Series) -> Station:
-    """Map the station."""
+def _parse_date_column(dates: pd.Series) -> pd.Series:
+    parsed = pd.to_datetime(dates, format="%Y-%m-%d", errors="coerce")
+    return pd.Series(parsed.dt.to_pydatetime(), index=dates.index, dtype=object).where(parsed.notna(), None)
+
+
+def map_columns_fra(data: pd.DataFrame) -> pd.DataFrame:
+    """Converts the coordinates, dates and numbers of charging points of all rows at once, column by column.
+
+    :param data: chunk of the rows of the French government data, read as strings.
+    :return: data frame with the index of ``data`` and the columns longitude, latitude, date_created, date_updated
+        and capacity.
+    """
+    capacity = pd.to_numeric(data["nbre_pdc"], errors="coerce")
+    return pd.DataFrame(
+        {
+            "longitude": check_coordinates_column(data["consolidated_longitude"]),
+            "latitude": check_coordinates_column(data["consolidated_latitude"]),
+            "date_created": _parse_date_column(data["date_mise_en_service"]),
+            "date_updated": _parse_date_column(data["date_maj"]),
+            "capacity": pd.Series(
+                [int(value) if value.is_integer() else None for value in capacity.astype(float).tolist()],
+                index=data.index,
+                dtype=object,
+            ),
+        },
+        index=data.index,
+    )
+
+
+def map_station_fra(row: pd.Series, converted_row: pd.Series) -> Station:
+    """Map the station.
+
+    :param row: row of the French government data.
+    :param converted_row: converted values of the row, see :func:`map_columns_fra`.
+    """
+    if pd.isna(converted_row["longitude"]) or pd.isna(converted_row["latitude"]):
+        raise ValueError("Coordinates could not be read properly!")
+
     station = Station()
 
     station.country_code = "FR"
     station.source_id = row.get("id_station_itinerance")
     station.operator = row.get("nom_operateur")
     station.data_source = "FRGOV"
-    station.point = from_shape(
-        Point(
-            float(check_coordinates(row.get("consolidated_longitude"))),
-            float(check_coordinates(row.get("consolidated_latitude"))),
-        )
-    )
-
-    if not pd.isna(row.get("date_mise_en_service")):
-        station.date_created = datetime.strptime(row.get("date_mise_en_service"), "%Y-%m-%d")
-    if not pd.isna(row.get("date_maj")):
-        station.date_updated = datetime.strptime(row.get("date_maj"), "%Y-%m-%d")
+    station.point = from_shape(Point(converted_row["longitude"], converted_row["latitude"]))
+    station.date_created = converted_row["date_created"]
+    station.date_updated = converted_row["date_updated"]
 
     return station
 
 
-def map_charging_fra(row) -> Station:
+def map_charging_fra(converted_row: pd.Series) -> Charging:
     """Map the charging."""
     charging = Charging()
 
-    charging.capacity = row.get("nbre_pdc")
+    charging.capacity = converted_row["capacity"]
 
     return charging
@@ -3,10 +3,11 @@
 import configparser
 import json
 import logging
-from typing import Optional
+from typing import Iterator, Optional
 
 from sqlalchemy.orm import Session
 
+from charging_stations_pipelines.models.station import Station
 from charging_stations_pipelines.pipelines import Pipeline
 from charging_stations_pipelines.pipelines.gb.gb_mapper import (
     map_address_gb,
@@ -14,41 +15,62 @@ from charging_stations_pipelines.pipelines.gb.gb_mapper import (
     map_station_gb,
 )
 from charging_stations_pipelines.pipelines.gb.gb_receiver import get_gb_data
+from charging_stations_pipelines.pipelines.staging import load_staged_stations
 from charging_stations_pipelines.pipelines.station_table_updater import (
     StationTableUpdater,
 )
-from charging_stations_pipelines.shared import JSON, country_import_data_path
+from charging_stations_pipelines.shared import JSON, content_hash, country_import_data_path
 
 logger = logging.getLogger(__name__)
 
 
+def map_gb_entry(entry: JSON) -> Station:
+    """Maps a charge device of the GB government data to a station with address and charging."""
+    mapped_station = map_station_gb(entry)
+    mapped_station.address = map_address_gb(entry, None)
+    mapped_station.charging = map_charging_gb(entry)
+    return mapped_station
+
+
 class GbPipeline(Pipeline):
-    def __init__(self, config: configparser, session: Session, online: bool = False):
-        super().__init__(config, session, online)
+    def __init__(
+        self,
+        config: configparser,
+        session: Session,
+        online: bool = False,
+        incremental: bool = False,
+        workers: int = 1,
+    ):
+        super().__init__(config, session, online, incremental, workers)
 
         self.data: Optional[JSON] = None
 
     def _retrieve_data(self):
-        tmp_file_path = country_import_data_path("GB") / self.config["GBGOV"]["filename"]
+        self.data_path = country_import_data_path("GB") / self.config["GBGOV"]["filename"]
         if self.online:
             logger.info("Retrieving Online Data")
-            get_gb_data(tmp_file_path)
-        with open(tmp_file_path) as f:
+            get_gb_data(self.data_path)
+        if self.is_already_imported(self.data_path, "GBGOV", "GB"):
+            return
+        self.stage(self.data_path, self._parse_entries, map_gb_entry)
+
+    def _parse_entries(self) -> Iterator[tuple[str, JSON]]:
+        with open(self.data_path) as f:
             self.data = json.load(f)
+        entry: JSON
+        for entry in self.data.get("ChargeDevice", []):
+            yield content_hash(entry), entry
 
     def run(self):
         logger.info("Running GB GOV Pipeline...")
 
         self._retrieve_data()
+        if self.staged_file is None:
+            return
 
-        station_updater = StationTableUpdater(session=self.session, logger=logger)
-
-        entry: JSON
-        for entry in self.data.get("ChargeDevice", []):
-            mapped_address = map_address_gb(entry, None)
-            mapped_charging = map_charging_gb(entry)
-            mapped_station = map_station_gb(entry)
-            mapped_station.address = mapped_address
-            mapped_station.charging = mapped_charging
-            station_updater.update_station(station=mapped_station, data_source_key="GBGOV")
+        station_updater = StationTableUpdater(session=self.session, logger=logger, incremental=self.incremental)
+        load_staged_stations(self.staged_file, station_updater, "GBGOV", "GB")
+        station_updater.flush()
+        station_updater.remove_missing_stations()
         station_updater.log_update_station_counts()
+        self.mark_imported(self.data_path, station_updater)
@@ -14,7 +14,13 @@ from charging_stations_pipelines.models.address import Address
 from charging_stations_pipelines.models.charging import Charging
 from charging_stations_pipelines.models.station import Station
 from charging_stations_pipelines.pipelines import Pipeline
-from charging_stations_pipelines.shared import download_file, load_json_file, reject_if, country_import_data_path
+from charging_stations_pipelines.pipelines.station_table_updater import StationTableUpdater
+from charging_stations_pipelines.shared import (
+    country_import_data_path,
+    download_file,
+    load_json_file,
+    reject_if,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -154,8 +160,9 @@ class NobilPipeline(Pipeline):
         session: Session,
         country_code: str,
         online: bool = False,
+        incremental: bool = False,
     ):
-        super().__init__(config, session, online)
+        super().__init__(config, session, online, incremental)
 
         accepted_country_codes = ["NO", "SE"]
         reject_if(country_code.upper() not in accepted_country_codes, "Invalid country code ")
@@ -168,10 +175,13 @@ class NobilPipeline(Pipeline):
         if self.online:
             logger.info("Retrieving Online Data")
             _load_datadump_and_write_to_target(path_to_target, self.country_code)
+        if self.is_already_imported(path_to_target, "NOBIL", self.country_code):
+            return
 
         nobil_stations_as_json = load_json_file(path_to_target)
         all_nobil_stations = _parse_json_data(nobil_stations_as_json)
 
+        station_updater = StationTableUpdater(session=self.session, logger=logger, incremental=self.incremental)
         for nobil_station in tqdm(iterable=all_nobil_stations, total=len(all_nobil_stations)):
             station: Station = _map_station_to_domain(nobil_station, self.country_code)
             address: Address = _map_address_to_domain(nobil_station)
@@ -180,10 +190,10 @@ class NobilPipeline(Pipeline):
             station.address = address
             station.charging = charging
 
-            # check if station already exists in db and add
-            existing_station = self.session.query(Station).filter_by(source_id=station.source_id).first()
-            if existing_station is None:
-                self.session.add(station)
+            # stations which exist already are skipped by the insert of the batch
+            station_updater.update_station(station, "NOBIL")
 
-        self.session.flush()
-        self.session.commit()
+        station_updater.flush()
+        station_updater.remove_missing_stations()
+        station_updater.log_update_station_counts()
+        self.mark_imported(path_to_target, station_updater)
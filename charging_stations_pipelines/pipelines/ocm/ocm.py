@@ -1,27 +1,38 @@
 """This module contains the OCM Pipeline."""
 
 import configparser
-import json
+import functools
 import logging
+from typing import Iterator, Optional
 
 from sqlalchemy.orm import Session
 from tqdm import tqdm
 
+from charging_stations_pipelines.models.station import Station
 from charging_stations_pipelines.pipelines import Pipeline
-from charging_stations_pipelines.pipelines.ocm.ocm_extractor import ocm_extractor
+from charging_stations_pipelines.pipelines.ocm.ocm_extractor import iter_ocm_records, ocm_extractor
 from charging_stations_pipelines.pipelines.ocm.ocm_mapper import (
     map_address_ocm,
     map_charging_ocm,
     map_station_ocm,
 )
+from charging_stations_pipelines.pipelines.parallel_mapper import map_records
 from charging_stations_pipelines.pipelines.station_table_updater import (
     StationTableUpdater,
 )
-from charging_stations_pipelines.shared import JSON, country_import_data_path
+from charging_stations_pipelines.shared import JSON, content_hash
 
 logger = logging.getLogger(__name__)
 
 
+def map_ocm_entry(entry: JSON, country_code: str) -> Station:
+    """Maps an OCM station joined with its reference data to a station with address and charging."""
+    mapped_station = map_station_ocm(entry, country_code)
+    mapped_station.address = map_address_ocm(entry, None)
+    mapped_station.charging = map_charging_ocm(entry, None)
+    return mapped_station
+
+
 class OcmPipeline(Pipeline):
     def __init__(
         self,
@@ -29,31 +40,42 @@ class OcmPipeline(Pipeline):
         config: configparser,
         session: Session,
         online: bool = False,
+        incremental: bool = False,
+        workers: int = 1,
     ):
-        super().__init__(config, session, online)
+        super().__init__(config, session, online, incremental, workers)
 
         self.country_code = country_code
-        self.data: JSON = None
+        self.data: Optional[Iterator[JSON]] = None
 
     def _retrieve_data(self):
-        tmp_file_path = country_import_data_path(self.country_code) / self.config["OCM"]["filename"]
         if self.online:
             logger.info("Retrieving Online Data")
-            ocm_extractor(tmp_file_path, self.country_code)
-        with open(tmp_file_path) as f:
-            self.data = json.load(f)
+            ocm_extractor(self.country_code)
+        self.data = iter_ocm_records(self.country_code)
 
     def run(self):
         logger.info(f"Running {self.country_code} OCM Pipeline...")
         self._retrieve_data()
-        station_updater = StationTableUpdater(session=self.session, logger=logger)
-
-        entry: JSON
-        for _, entry in tqdm(iterable=iter(self.data.items()), total=len(self.data)):
-            mapped_address = map_address_ocm(entry, None)
-            mapped_charging = map_charging_ocm(entry, None)
-            mapped_station = map_station_ocm(entry, self.country_code)
-            mapped_station.address = mapped_address
-            mapped_station.charging = mapped_charging
+        station_updater = StationTableUpdater(session=self.session, logger=logger, incremental=self.incremental)
+
+        def changed_entries() -> Iterator[tuple[str, JSON]]:
+            entry: JSON
+            for entry in tqdm(iterable=self.data, unit=" stations"):
+                record_hash = content_hash(entry)
+                if not station_updater.skip_unchanged(record_hash, "OCM", self.country_code):
+                    yield record_hash, entry
+
+        count_parse_error = 0
+        map_entry = functools.partial(map_ocm_entry, country_code=self.country_code)
+        for record_hash, mapped_station, error in map_records(changed_entries(), map_entry, self.workers):
+            if mapped_station is None:
+                count_parse_error += 1
+                logger.error(f"OCM entry could not be mapped! Error: {error}")
+                continue
+            mapped_station.content_hash = record_hash
             station_updater.update_station(station=mapped_station, data_source_key="OCM")
+        logger.info(f"Finished {self.country_code} OCM Pipeline, not parseable stations: {count_parse_error}")
+        station_updater.flush()
+        station_updater.remove_missing_stations()
         station_updater.log_update_station_counts()
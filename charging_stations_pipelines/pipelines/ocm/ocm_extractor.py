@@ -5,65 +5,123 @@ from pathlib import Path
 import re
 import shutil
 import subprocess
-from typing import Dict, List
+from typing import Dict, Iterator, Optional
 
-import pandas as pd
 from packaging import version
 
 from charging_stations_pipelines import PROJ_DATA_DIR
+from charging_stations_pipelines.shared import JSON
 
 logger = logging.getLogger(__name__)
 
 
-def reference_data_to_frame(data: List[Dict]) -> pd.DataFrame:
-    frame: pd.DataFrame = pd.DataFrame(data)
-    frame.set_index("ID", inplace=True)
-    frame.sort_index(inplace=True)
-    return frame
+REFERENCE_DATA_KEYS = ["ConnectionTypes", "Countries", "Operators"]
+"""Reference data joined to the stations, each is looked up by the ID of its entries."""
 
+ReferenceData = Dict[str, Dict[int, JSON]]
 
-def merge_connection_types(connection: pd.DataFrame, reference_data: pd.DataFrame) -> pd.DataFrame:
-    connection_ids: pd.Series = connection["ConnectionTypeID"].dropna().drop_duplicates()
-    return connection.merge(
-        reference_data.loc[connection_ids],
-        how="left",
-        left_on="ConnectionTypeID",
-        right_index=True,
-    )
 
+def flatten_record(record: Dict[str, JSON], prefix: str = "") -> Dict[str, JSON]:
+    """Flattens nested objects of a record into keys joined with a dot, like ``pd.json_normalize`` does."""
+    flat_record = {}
+    for key, value in record.items():
+        if isinstance(value, dict):
+            flat_record.update(flatten_record(value, f"{prefix}{key}."))
+        else:
+            flat_record[f"{prefix}{key}"] = value
+    return flat_record
 
-def merge_address_infos(address_info: pd.Series, reference_data: pd.DataFrame) -> pd.DataFrame:
-    return pd.concat([address_info, reference_data.loc[address_info["CountryID"]]])
 
+def load_reference_data(reference_data_path: Path) -> ReferenceData:
+    """Loads the connection types, countries and operators of the OCM export into lookup dicts by ID."""
+    with open(reference_data_path) as f:
+        data_ref: Dict = json.load(f)
+    return {key: {entry["ID"]: entry for entry in data_ref.get(key) or []} for key in REFERENCE_DATA_KEYS}
+
+
+def _join(flat_record: Dict[str, JSON], reference: Optional[Dict[str, JSON]], id_key: str, title_key: str):
+    flat_record[title_key] = None
+    if reference is None:
+        return
+    for key, value in flatten_record(reference).items():
+        if key == "ID":
+            flat_record[id_key] = value
+        elif key == "Title":
+            flat_record[title_key] = value
+        else:
+            flat_record.setdefault(key, value)
+
+
+def join_reference_data(record: Dict[str, JSON], reference_data: ReferenceData) -> Dict[str, JSON]:
+    """Flattens a station of the OCM export and joins its country, operator and connection types.
+
+    The keys are the same as the ones of the data frame merges the extractor used before: the title of the country is
+    ``Title_x``, the one of the operator ``Title_y``. ``ConnectionsEnriched`` holds the connections together with
+    their connection type.
+    """
+    flat_record = flatten_record(record)
+    country = reference_data["Countries"].get(flat_record.get("AddressInfo.CountryID"))
+    _join(flat_record, country, "CountryID", "Title_x")
+    operator = reference_data["Operators"].get(flat_record.get("OperatorID"))
+    _join(flat_record, operator, "OperatorIDREF", "Title_y")
+    flat_record["ConnectionsEnriched"] = [
+        {**reference_data["ConnectionTypes"].get(connection.get("ConnectionTypeID"), {}), **connection}
+        for connection in record.get("Connections") or []
+    ]
+    return flat_record
+
+
+def ocm_checkout_dir(country_code: str) -> Path:
+    """Returns the directory of the sparse checkout of the OCM export of a country.
+
+    Every country has a checkout of its own, so that updating the data of one country doesn't remove or change the
+    data of another one, which may be read at the same time.
+    """
+    return PROJ_DATA_DIR / f"ocm-export-{country_code}"
+
+
+def ocm_data_dir(country_code: str) -> Path:
+    """Returns the directory of the station files of a country in the local checkout of the OCM export."""
+    return ocm_checkout_dir(country_code) / "data" / country_code
 
-def merge_with_reference_data(
-    row: pd.Series,
-    connection_types: pd.DataFrame,
-    address_info: pd.DataFrame,
-    operators: pd.DataFrame,
-):
-    row["Connections"] = merge_connection_types(
-        connection=pd.json_normalize(row["Connections"]),
-        reference_data=connection_types,
-    )
-    row["AddressInfo"] = merge_address_infos(address_info=pd.Series(row["AddressInfo"]), reference_data=address_info)
-    row["OperatorID"] = operators.loc[row["OperatorID"]]
-    return row
 
+def _has_station_files(data_dir: Path) -> bool:
+    return data_dir.is_dir() and any(data_dir.iterdir())
 
-def merge_connections(row, connection_types):
-    frame = pd.DataFrame(row)
-    if "ConnectionTypeID" not in frame.columns:
-        return frame
-    return pd.merge(frame, connection_types, how="left", left_on="ConnectionTypeID", right_on="ID")
 
+def iter_ocm_records(country_code: str) -> Iterator[Dict[str, JSON]]:
+    """Reads the station files of a country from the local checkout of the OCM export one by one.
 
-def ocm_extractor(extracted_data_file_path: str, country_code: str):
-    """This method extracts Open Charge Map (OCM) data for a given country and saves it to a specified file."""
+    Only the reference data and the current station are kept in memory.
+
+    :param country_code: country to read the stations of.
+    :return: iterator of the stations joined with their reference data, see :func:`join_reference_data`.
+    :raise FileNotFoundError: if there is no checkout with station files for the country, e.g. because it was never
+        imported online.
+    """
+    data_dir = ocm_data_dir(country_code)
+    if not _has_station_files(data_dir):
+        raise FileNotFoundError(f"No OCM data for {country_code} in {data_dir}, import the country online first")
+    reference_data = load_reference_data(data_dir / ".." / "referencedata.json")
+    return _iter_station_files(data_dir, reference_data)
+
+
+def _iter_station_files(data_dir: Path, reference_data: ReferenceData) -> Iterator[Dict[str, JSON]]:
+    for subdir, dirs, files in os.walk(data_dir):
+        dirs.sort()
+        for file in sorted(files):
+            with open(os.path.join(subdir, file)) as f:
+                record = json.load(f)
+            yield join_reference_data(record, reference_data)
+
+
+def ocm_extractor(country_code: str):
+    """This method checks out or updates the Open Charge Map (OCM) export for a given country, to be read with
+    :func:`iter_ocm_records`. Only the files of the country are fetched into its checkout."""
 
     project_data_dir: Path = PROJ_DATA_DIR
-    ocm_source_dir: Path = project_data_dir / "ocm-export"
-    data_dir: Path = ocm_source_dir / "data" / country_code
+    ocm_source_dir: Path = ocm_checkout_dir(country_code)
+    data_dir: Path = ocm_data_dir(country_code)
 
     try:
         git_version_raw: str = subprocess.check_output(["git", "--version"]).decode()
@@ -82,16 +140,18 @@ def ocm_extractor(extracted_data_file_path: str, country_code: str):
             )
             raise RuntimeError("Git version must be >= 2.25.0!")
 
-    if (not os.path.isdir(data_dir)) or len(os.listdir(data_dir)) == 0:
+    if not _has_station_files(data_dir):
         shutil.rmtree(ocm_source_dir, ignore_errors=True)
         subprocess.call(
             [
                 "git",
                 "clone",
                 "https://github.com/openchargemap/ocm-export",
+                ocm_source_dir.name,
                 "--no-checkout",
                 "--depth",
                 "1",
+                "--filter=blob:none",
             ],
             cwd=project_data_dir,
             stdout=subprocess.PIPE,
@@ -109,54 +169,3 @@ def ocm_extractor(extracted_data_file_path: str, country_code: str):
         subprocess.call(["git", "checkout"], cwd=ocm_source_dir, stdout=subprocess.PIPE)
     else:
         subprocess.call(["git", "pull"], cwd=ocm_source_dir, stdout=subprocess.PIPE)
-
-    records: List = []
-    for subdir, dirs, files in os.walk(os.path.join(data_dir)):
-        for file in files:
-            with open(os.path.join(subdir, file)) as f:
-                records += [(json.load(f))]
-    data: pd.DataFrame = pd.json_normalize(records)
-
-    with open(os.path.join(data_dir, "..", "referencedata.json"), "r+") as f:
-        data_ref: Dict = json.load(f)
-
-    connection_types: pd.DataFrame = pd.json_normalize(data_ref["ConnectionTypes"])
-    connection_frame = pd.json_normalize(records, record_path=["Connections"], meta=["UUID"])
-    connection_frame = pd.merge(
-        connection_frame,
-        connection_types,
-        how="left",
-        left_on="ConnectionTypeID",
-        right_on="ID",
-    )
-    connection_frame_grouped = connection_frame.groupby("UUID").agg(list)
-    connection_frame_grouped.reset_index(inplace=True)
-    connection_frame_grouped["ConnectionsEnriched"] = connection_frame_grouped.apply(lambda x: x.to_frame(), axis=1)
-    data = pd.merge(
-        data,
-        connection_frame_grouped[["ConnectionsEnriched", "UUID"]],
-        how="left",
-        on="UUID",
-    )
-
-    address_info: pd.DataFrame = pd.json_normalize(data_ref["Countries"])
-    address_info = address_info.rename(columns={"ID": "CountryID"})
-    pd_merged_with_countries = pd.merge(
-        data,
-        address_info,
-        left_on="AddressInfo.CountryID",
-        right_on="CountryID",
-        how="left",
-    )
-
-    operators: pd.DataFrame = pd.json_normalize(data_ref["Operators"])
-    operators = operators.rename(columns={"ID": "OperatorIDREF"})
-    pd_merged_with_operators = pd.merge(
-        pd_merged_with_countries,
-        operators,
-        left_on="OperatorID",
-        right_on="OperatorIDREF",
-        how="left",
-    )
-
-    pd_merged_with_operators.reset_index(drop=True).to_json(extracted_data_file_path, orient="index")
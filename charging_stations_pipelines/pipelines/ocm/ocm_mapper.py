@@ -34,15 +34,15 @@ def map_station_ocm(row, country_code: str):
 
 
 def map_address_ocm(row, station_id):
-    postcode_raw: Optional[str] = row["AddressInfo.Postcode"]
+    postcode_raw: Optional[str] = row.get("AddressInfo.Postcode")
     postcode: Optional[str] = postcode_raw
 
-    town_raw: Optional[str] = row["AddressInfo.Town"]
+    town_raw: Optional[str] = row.get("AddressInfo.Town")
     town: Optional[str] = town_raw if isinstance(town_raw, str) else None
 
     country: Optional[str] = row["Title_x"]
 
-    street_raw: Optional[str] = row["AddressInfo.AddressLine1"]
+    street_raw: Optional[str] = row.get("AddressInfo.AddressLine1")
     street: Optional[str] = street_raw if isinstance(street_raw, str) else None
 
     address = Address()
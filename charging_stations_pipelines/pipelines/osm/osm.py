@@ -1,27 +1,43 @@
 """This module contains the OSM Pipeline."""
 import collections
 import configparser
-import json
+import functools
 import logging
+from typing import Iterator
 
 from sqlalchemy.orm import Session
 from tqdm import tqdm
 
 from charging_stations_pipelines import OSM_COUNTRY_CODES
+from charging_stations_pipelines.models.station import Station
 from charging_stations_pipelines.pipelines import Pipeline
 from charging_stations_pipelines.pipelines.osm import (
     DATA_SOURCE_KEY,
     osm_mapper,
 )
 from charging_stations_pipelines.pipelines.osm.osm_receiver import get_osm_data
+from charging_stations_pipelines.pipelines.staging import iter_staged_stations
 from charging_stations_pipelines.pipelines.station_table_updater import (
     StationTableUpdater,
 )
-from charging_stations_pipelines.shared import JSON, country_import_data_path
+from charging_stations_pipelines.shared import (
+    JSON,
+    content_hash,
+    country_import_data_path,
+    iter_json_array,
+)
 
 logger = logging.getLogger(__name__)
 
 
+def map_osm_entry(entry: JSON, country_code: str) -> Station:
+    """Maps an OSM element to a station with address and charging."""
+    station = osm_mapper.map_station_osm(entry, country_code)
+    station.address = osm_mapper.map_address_osm(entry, None)
+    station.charging = osm_mapper.map_charging_osm(entry, None)
+    return station
+
+
 class OsmPipeline(Pipeline):
     """Pipeline for the OSM data source."""
 
@@ -31,62 +47,71 @@ class OsmPipeline(Pipeline):
         config: configparser,
         session: Session,
         online: bool = False,
+        incremental: bool = False,
+        workers: int = 1,
     ):
-        super().__init__(config, session, online)
+        super().__init__(config, session, online, incremental, workers)
 
         self.country_code = country_code
 
     def retrieve_data(self):
-        tmp_file_path = country_import_data_path(self.country_code) / self.config[DATA_SOURCE_KEY]["filename"]
+        self.data_path = country_import_data_path(self.country_code) / self.config[DATA_SOURCE_KEY]["filename"]
         if self.online:
             logger.info("Retrieving Online Data")
-            get_osm_data(self.country_code, tmp_file_path)
-        with open(tmp_file_path) as f:
-            self.data = json.load(f)
+            get_osm_data(self.country_code, self.data_path)
+        if self.is_already_imported(self.data_path, DATA_SOURCE_KEY, self.country_code):
+            return
+        map_entry = functools.partial(map_osm_entry, country_code=self.country_code)
+        self.stage(self.data_path, self._parse_entries, map_entry)
+
+    def _parse_entries(self) -> Iterator[tuple[str, JSON]]:
+        self.data = iter_json_array(self.data_path, "elements")
+        entry: JSON
+        for entry in tqdm(iterable=self.data, unit=" elements"):
+            yield content_hash(entry), entry
 
     def run(self):
         logger.info(f"Running {self.country_code} {DATA_SOURCE_KEY} Pipeline...")
         self.retrieve_data()
-        station_updater = StationTableUpdater(session=self.session, logger=logger)
+        if self.staged_file is None:
+            return
+        station_updater = StationTableUpdater(session=self.session, logger=logger, incremental=self.incremental)
 
         stats = collections.defaultdict(int)
-        data_elements: JSON = self.data.get("elements", [])
-        entry: JSON
-        for entry in tqdm(iterable=iter(data_elements), total=len(data_elements)):
-            try:
-                station = osm_mapper.map_station_osm(entry, self.country_code)
-
-                # Address mapping
-                station.address = osm_mapper.map_address_osm(entry, None)
-
-                # Count stations that have some kind of country code mismatch
-                if (
-                    # Count stations which have an invalid country code in address
-                    (station.address and station.address.country and station.address.country not in OSM_COUNTRY_CODES)
-                    # Count stations which have a mismatching country code between Station and Address
-                    or (
-                        station.country_code is not None
-                        and station.address is not None
-                        and station.address.country is not None
-                        and station.country_code != station.address.country
-                    )
-                ):
-                    stats["count_country_mismatch_stations"] += 1
-
-                # Charging point
-                station.charging = osm_mapper.map_charging_osm(entry, None)
-
-                station_updater.update_station(station, DATA_SOURCE_KEY)
+
+        def skip_unchanged(record_hash: str) -> bool:
+            if station_updater.skip_unchanged(record_hash, DATA_SOURCE_KEY, self.country_code):
                 stats["count_valid_stations"] += 1
-            except Exception as ex:
-                stats["count_parse_error"] += 1
-                logger.debug(f"{DATA_SOURCE_KEY} entry could not be parsed, error: {ex}. Row: {entry}")
+                return True
+            return False
+
+        for station in iter_staged_stations(self.staged_file, skip_unchanged):
+            # Count stations that have some kind of country code mismatch
+            if (
+                # Count stations which have an invalid country code in address
+                (station.address and station.address.country and station.address.country not in OSM_COUNTRY_CODES)
+                # Count stations which have a mismatching country code between Station and Address
+                or (
+                    station.country_code is not None
+                    and station.address is not None
+                    and station.address.country is not None
+                    and station.country_code != station.address.country
+                )
+            ):
+                stats["count_country_mismatch_stations"] += 1
+
+            station_updater.update_station(station, DATA_SOURCE_KEY)
+            stats["count_valid_stations"] += 1
 
         logger.info(
             f"Finished {DATA_SOURCE_KEY} Pipeline:\n"
             f"1. Valid stations found: {stats['count_valid_stations']}\n"
-            f"2. Not parseable stations: {stats['count_parse_error']}\n"
+            f"2. Not parseable stations: {self.not_parseable_summary()}\n"
             f"3. Wrong country code stations: {stats['count_country_mismatch_stations']}."
         )
 
+        station_updater.flush()
+        station_updater.remove_missing_stations()
+
         station_updater.log_update_station_counts()
+        self.mark_imported(self.data_path, station_updater)
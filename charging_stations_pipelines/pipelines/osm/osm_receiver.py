@@ -1,6 +1,6 @@
 """Module to retrieve OpenStreetMap (OSM) data for a specific country"""
 
-import json
+import os
 
 import requests
 from requests import Response
@@ -8,6 +8,7 @@ from requests import Response
 from charging_stations_pipelines.pipelines.osm import (
     DATA_SOURCE_KEY,
 )
+from charging_stations_pipelines.shared import DOWNLOAD_CHUNK_SIZE, PARTIAL_DOWNLOAD_SUFFIX, record_download
 
 
 def get_osm_data(country_code: str, tmp_data_path):
@@ -17,7 +18,8 @@ def get_osm_data(country_code: str, tmp_data_path):
     The `country_code` parameter is a string representing the ISO3166-1 alpha-2 country code.
 
     The `tmp_data_path parameter` is a string representing the path to save the downloaded OSM data. The OSM data will
-    be saved in JSON format.
+    be saved in JSON format, streamed to a temporary file as received, which replaces the previous data once the
+    response is complete.
 
     This method uses the Overpass API to retrieve the OSM data. It sends a query to the Overpass API specifying
     the desired country and the amenity `charging_station` to retrieve information about charging stations within
@@ -51,9 +53,18 @@ def get_osm_data(country_code: str, tmp_data_path):
         """
     }
 
-    response: Response = requests.get("https://overpass-api.de/api/interpreter", query_params)
-    status_code: int = response.status_code
-    if status_code != 200:
-        raise RuntimeError(f"Failed to get {DATA_SOURCE_KEY} data! Status code: {status_code}")
-    with open(tmp_data_path, "w") as f:
-        json.dump(response.json(), f, ensure_ascii=False, indent=4, sort_keys=True)
+    response: Response
+    with requests.get("https://overpass-api.de/api/interpreter", query_params, stream=True) as response:
+        status_code: int = response.status_code
+        if status_code != 200:
+            raise RuntimeError(f"Failed to get {DATA_SOURCE_KEY} data! Status code: {status_code}")
+        part_file = f"{tmp_data_path}{PARTIAL_DOWNLOAD_SUFFIX}"
+        try:
+            with open(part_file, "wb") as f:
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+        except requests.RequestException:
+            os.remove(part_file)
+            raise
+        os.replace(part_file, tmp_data_path)
+        record_download(tmp_data_path, response.url, response.headers)
@@ -0,0 +1,108 @@
+"""Parallel mapping stage of the import pipelines, mapping raw source records to stations in a pool of worker
+processes while a single writer in the main process stores them."""
+
+import logging
+import multiprocessing
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import islice
+from typing import Any, Callable, Final, Iterable, Iterator, Optional, TypeVar
+
+from geoalchemy2.elements import WKBElement
+
+from charging_stations_pipelines.db_utils import model_to_row
+from charging_stations_pipelines.models.address import Address
+from charging_stations_pipelines.models.charging import Charging
+from charging_stations_pipelines.models.station import Station
+
+logger = logging.getLogger(__name__)
+
+K = TypeVar("K")
+T = TypeVar("T")
+
+MAP_CHUNK_SIZE: Final[int] = 500
+"""Number of records sent to a worker process at once."""
+
+CHUNKS_IN_FLIGHT_PER_WORKER: Final[int] = 2
+"""Number of chunks queued per worker process, bounding the records held in memory."""
+
+StationRows = tuple[dict[str, Any], Optional[dict[str, Any]], Optional[dict[str, Any]]]
+"""Plain rows of a station, its address and its charging, which can be sent between processes."""
+
+
+def station_to_rows(station: Station) -> StationRows:
+    """Converts a mapped station with its address and charging to plain rows."""
+    station_row = model_to_row(station, Station.__table__)
+    point = station_row["point"]
+    if isinstance(point, WKBElement):
+        # the WKB of shapely points is a memoryview, which can't be pickled
+        station_row["point"] = WKBElement(bytes(point.data), srid=point.srid, extended=point.extended)
+    address_row = model_to_row(station.address, Address.__table__) if station.address else None
+    charging_row = model_to_row(station.charging, Charging.__table__) if station.charging else None
+    return station_row, address_row, charging_row
+
+
+def rows_to_station(rows: StationRows) -> Station:
+    """Creates a station with its address and charging from the rows created by :func:`station_to_rows`."""
+    station_row, address_row, charging_row = rows
+    station = Station(**station_row)
+    station.address = Address(**address_row) if address_row else None
+    station.charging = Charging(**charging_row) if charging_row else None
+    return station
+
+
+def _map_chunk(map_record: Callable[[T], Station], records: list[T]) -> list[tuple[Optional[StationRows], str]]:
+    results = []
+    for record in records:
+        try:
+            results.append((station_to_rows(map_record(record)), ""))
+        except Exception as e:
+            results.append((None, str(e) or type(e).__name__))
+    return results
+
+
+def _collect_chunk(keys: list[K], future: Future) -> Iterator[tuple[K, Optional[Station], str]]:
+    for key, (rows, error) in zip(keys, future.result()):
+        yield key, rows_to_station(rows) if rows else None, error
+
+
+def map_records(
+    records: Iterable[tuple[K, T]],
+    map_record: Callable[[T], Station],
+    workers: int = 1,
+    chunk_size: int = MAP_CHUNK_SIZE,
+) -> Iterator[tuple[K, Optional[Station], str]]:
+    """Maps source records to stations, in parallel if more than one worker is given.
+
+    The records are sent to the worker processes in chunks, the mapped stations come back as plain rows and are
+    yielded in the order of the records. Only a few chunks per worker are in flight, so records can be streamed.
+    The worker processes are spawned instead of forked, as several pipelines may run in threads of the same process,
+    and a forked child could inherit a lock held by another thread, e.g. of logging or the connection pool.
+
+    :param records: tuples of a key, e.g. the content hash of the record, and the record. Only the record is sent to
+        the workers.
+    :param map_record: module level function mapping a record to a station with address and charging, e.g. a
+        ``functools.partial`` of one.
+    :param workers: number of worker processes, 1 maps all records in the calling process.
+    :param chunk_size: number of records per chunk.
+    :return: iterator of tuples of the key, the mapped station or None, and the error message if mapping failed.
+    """
+    if workers <= 1:
+        for key, record in records:
+            try:
+                yield key, map_record(record), ""
+            except Exception as e:
+                yield key, None, str(e) or type(e).__name__
+        return
+
+    logger.debug(f"Mapping records with {workers} worker processes")
+    records = iter(records)
+    in_flight: deque[tuple[list[K], Future]] = deque()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        while chunk := list(islice(records, chunk_size)):
+            keys = [key for key, _ in chunk]
+            in_flight.append((keys, executor.submit(_map_chunk, map_record, [record for _, record in chunk])))
+            if len(in_flight) >= workers * CHUNKS_IN_FLIGHT_PER_WORKER:
+                yield from _collect_chunk(*in_flight.popleft())
+        while in_flight:
+            yield from _collect_chunk(*in_flight.popleft())
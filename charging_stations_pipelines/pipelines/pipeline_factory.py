@@ -22,15 +22,15 @@ class EmptyPipeline(Pipeline):
         pass
 
 
-def pipeline_factory(db_session: Session, country="DE", online=True) -> Pipeline:
+def pipeline_factory(db_session: Session, country="DE", online=True, incremental=False, workers=1) -> Pipeline:
     """Creates a pipeline based on the country code."""
     pipelines = {
-        "AT": EcontrolAtPipeline(config, db_session, online),
-        "DE": BnaPipeline(config, db_session, online),
-        "FR": FraPipeline(config, db_session, online),
-        "GB": GbPipeline(config, db_session, online),
-        "NO": NobilPipeline(config, db_session, "NO", online),
-        "SE": NobilPipeline(config, db_session, "SE", online),
+        "AT": EcontrolAtPipeline(config, db_session, online, incremental, workers),
+        "DE": BnaPipeline(config, db_session, online, incremental, workers),
+        "FR": FraPipeline(config, db_session, online, incremental, workers),
+        "GB": GbPipeline(config, db_session, online, incremental, workers),
+        "NO": NobilPipeline(config, db_session, "NO", online, incremental),
+        "SE": NobilPipeline(config, db_session, "SE", online, incremental),
     }
 
     return pipelines[country] if country in pipelines else EmptyPipeline()
@@ -0,0 +1,378 @@
+"""Staging of the mapped stations of a source file as a typed Parquet dataset next to the source file, from which the
+stations are loaded into the database.
+
+Parsing and mapping a source file is done once per version of the file. Loading it again, e.g. after
+``--delete_data`` or a changed database schema, only reads the staged dataset. When a source file changes, only its
+new or changed records are mapped, the stations of the other records are copied from the previous staged dataset.
+"""
+
+import json
+import logging
+import math
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Callable, Final, Iterable, Iterator, Optional, TypeVar
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from geoalchemy2 import Geography
+from geoalchemy2.elements import WKBElement
+from sqlalchemy import ARRAY, JSON, Boolean, Column, Date, Float, Integer, String, Table
+from sqlalchemy.types import TypeEngine
+
+from charging_stations_pipelines.models.address import Address
+from charging_stations_pipelines.models.charging import Charging
+from charging_stations_pipelines.models.station import Station
+from charging_stations_pipelines.pipelines.parallel_mapper import map_records, rows_to_station, station_to_rows
+from charging_stations_pipelines.pipelines.station_table_updater import StationTableUpdater
+from charging_stations_pipelines.shared import CONTENT_HASH_VERSION, file_checksum, parse_date
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+STAGED_FILE_SUFFIX: Final[str] = ".staged.parquet"
+"""Suffix of the staged dataset next to a source file."""
+
+STAGING_VERSION: Final[int] = 1
+"""Version of the staged datasets, to be increased when their schema or a mapper changes, which discards them."""
+
+STAGING_BATCH_SIZE: Final[int] = 10_000
+"""Number of stations written to or read from a staged dataset at once."""
+
+_STAGING_METADATA_KEY = b"echarm_staging"
+
+_STAGED_TABLES: Final[dict[str, Table]] = {
+    "station": Station.__table__,
+    "address": Address.__table__,
+    "charging": Charging.__table__,
+}
+"""Prefixes of the staged columns per table."""
+
+_NOT_STAGED_COLUMNS: Final[set[str]] = {"id", "station_id"}
+"""Columns which are set when the stations are written to the database."""
+
+
+def staged_path(source_file) -> Path:
+    """Returns the path of the staged dataset of a source file."""
+    return Path(f"{source_file}{STAGED_FILE_SUFFIX}")
+
+
+def _arrow_type(column_type: TypeEngine) -> pa.DataType:
+    if isinstance(column_type, Geography):
+        return pa.binary()
+    if isinstance(column_type, ARRAY):
+        return pa.list_(_arrow_type(column_type.item_type))
+    if isinstance(column_type, JSON):
+        return pa.string()
+    if isinstance(column_type, Boolean):
+        return pa.bool_()
+    if isinstance(column_type, Integer):
+        return pa.int64()
+    if isinstance(column_type, Float):
+        return pa.float64()
+    if isinstance(column_type, Date):
+        return pa.date32()
+    if isinstance(column_type, String):
+        return pa.string()
+    raise TypeError(f"Column type {column_type} can't be staged")
+
+
+def _staged_columns() -> list[tuple[str, str, Column]]:
+    return [
+        (f"{prefix}.{column.key}", prefix, column)
+        for prefix, table in _STAGED_TABLES.items()
+        for column in table.columns
+        if column.key not in _NOT_STAGED_COLUMNS
+    ]
+
+
+def staging_schema(metadata: Optional[dict[str, Any]] = None) -> pa.Schema:
+    """Returns the schema of the staged datasets, derived from the columns of the station, address and charging
+    tables, with a flag per station whether it has an address and a charging.
+
+    :param metadata: metadata of the dataset, e.g. the checksum of the source file, stored as JSON.
+    """
+    fields = [pa.field(name, _arrow_type(column.type)) for name, _, column in _staged_columns()]
+    fields += [
+        pa.field("has_address", pa.bool_(), nullable=False),
+        pa.field("has_charging", pa.bool_(), nullable=False),
+    ]
+    return pa.schema(fields, metadata={_STAGING_METADATA_KEY: json.dumps(metadata or {})})
+
+
+def _is_missing(value) -> bool:
+    return value is None or value is pd.NaT or value is pd.NA
+
+
+def _to_staged_value(column_type: TypeEngine, value):
+    """Converts a value of a model attribute to the type of its staged column, like the database would do."""
+    if _is_missing(value):
+        return None
+    if isinstance(column_type, Float):
+        return float(value)
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if isinstance(column_type, Geography):
+        if not isinstance(value, WKBElement):
+            raise TypeError(f"Expected a WKB element as point, got {type(value).__name__}")
+        return bytes(value.data)
+    if isinstance(column_type, ARRAY):
+        return [_to_staged_value(column_type.item_type, item) for item in value]
+    if isinstance(column_type, JSON):
+        return json.dumps(value, ensure_ascii=False, default=str)
+    if isinstance(column_type, Boolean):
+        return bool(value)
+    if isinstance(column_type, Integer):
+        return int(value)
+    if isinstance(column_type, Date):
+        if isinstance(value, str):
+            value = parse_date(value)
+        if isinstance(value, datetime):
+            return value.date()
+        if isinstance(value, date):
+            return value
+        raise ValueError(f"Expected a date, got {value!r}")
+    return value if isinstance(value, str) else str(value)
+
+
+def _from_staged_value(column_type: TypeEngine, value):
+    if value is None:
+        return None
+    if isinstance(column_type, Geography):
+        # like the points created by geoalchemy2.shape.from_shape
+        return WKBElement(value)
+    if isinstance(column_type, JSON):
+        return json.loads(value)
+    return value
+
+
+def station_to_staged_row(station: Station) -> dict[str, Any]:
+    """Converts a mapped station with its address and charging to a row of a staged dataset.
+
+    :raise ValueError: if an attribute can't be converted to the type of its column.
+    """
+    rows = dict(zip(_STAGED_TABLES, station_to_rows(station)))
+    staged_row = {"has_address": rows["address"] is not None, "has_charging": rows["charging"] is not None}
+    for name, prefix, column in _staged_columns():
+        row = rows[prefix]
+        try:
+            staged_row[name] = _to_staged_value(column.type, row[column.key]) if row else None
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Invalid {name}: {e}") from e
+    return staged_row
+
+
+def staged_row_to_station(staged_row: dict[str, Any]) -> Station:
+    """Creates a station with its address and charging from a row of a staged dataset."""
+    rows: dict[str, dict[str, Any]] = {prefix: {} for prefix in _STAGED_TABLES}
+    for name, prefix, column in _staged_columns():
+        rows[prefix][column.key] = _from_staged_value(column.type, staged_row[name])
+    address_row = rows["address"] if staged_row["has_address"] else None
+    charging_row = rows["charging"] if staged_row["has_charging"] else None
+    return rows_to_station((rows["station"], address_row, charging_row))
+
+
+def _read_metadata(staged_file: Path) -> Optional[dict[str, Any]]:
+    try:
+        metadata = json.loads(pq.read_schema(staged_file, memory_map=True).metadata[_STAGING_METADATA_KEY])
+    except (OSError, KeyError, TypeError, ValueError, pa.ArrowException):
+        return None
+    if metadata.get("version") != [STAGING_VERSION, CONTENT_HASH_VERSION]:
+        return None
+    return metadata
+
+
+def is_staged(source_file) -> bool:
+    """Returns whether the staged dataset of a source file is complete and up to date with the file."""
+    metadata = _read_metadata(staged_path(source_file))
+    return metadata is not None and metadata["source_sha256"] == file_checksum(source_file)
+
+
+class StagedStationsWriter:
+    """Writes the stations of a source file to its staged dataset, which replaces the previous one on :meth:`close`.
+
+    Records whose content hash is part of the previous staged dataset are not passed on by :meth:`unstaged`, their
+    rows are copied instead. The order of the records is kept, so that of several stations with the same source id
+    the first one is imported, as when the stations are mapped and written directly.
+
+    :param source_file: path of the source file.
+    :param batch_size: number of stations per row group.
+    """
+
+    def __init__(self, source_file, batch_size: int = STAGING_BATCH_SIZE):
+        self.staged_file = staged_path(source_file)
+        self.batch_size = batch_size
+        self.mapping_errors = 0
+        self.copied_count = 0
+        self.metadata = {
+            "version": [STAGING_VERSION, CONTENT_HASH_VERSION],
+            "source_sha256": file_checksum(source_file),
+        }
+        self.previous_table: Optional[pa.Table] = None
+        self.previous_rows: dict[str, int] = {}
+        if _read_metadata(self.staged_file) is not None:
+            self.previous_table = pq.read_table(self.staged_file, memory_map=True)
+            hashes = self.previous_table.column("station.content_hash").to_pylist()
+            self.previous_rows = {record_hash: i for i, record_hash in enumerate(hashes) if record_hash is not None}
+
+        self.new_rows: list[dict[str, Any]] = []
+        self.order: list[tuple[bool, int]] = []
+        self.copied_positions: list[int] = []
+        # unchanged records after the last record passed on, copied on close, as mapped stations may still follow
+        self.trailing_positions: list[int] = []
+        self.tmp_file = self.staged_file.with_name(f"{self.staged_file.name}.tmp")
+        self.writer = pq.ParquetWriter(self.tmp_file, staging_schema(self.metadata))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.writer.close()
+            self.tmp_file.unlink(missing_ok=True)
+
+    def unstaged(self, records: Iterable[tuple[str, T]]) -> Iterator[tuple[tuple[str, list[int]], T]]:
+        """Passes on the records which are not part of the previous staged dataset, for :func:`map_records`.
+
+        :param records: tuples of the content hash and the record.
+        :return: iterator of tuples of a key to pass to :meth:`add` and the record.
+        """
+        preceding_positions: list[int] = []
+        for record_hash, record in records:
+            position = self.previous_rows.get(record_hash)
+            if position is not None:
+                preceding_positions.append(position)
+                continue
+            yield (record_hash, preceding_positions), record
+            preceding_positions = []
+        self.trailing_positions = preceding_positions
+
+    def add(self, key: tuple[str, list[int]], station: Optional[Station]):
+        """Adds a mapped station, with the content hash of its record, after the copied stations preceding it.
+
+        :param key: key of the record as passed on by :meth:`unstaged`.
+        :param station: mapped station, or None if mapping the record failed.
+        """
+        record_hash, preceding_positions = key
+        self._copy(preceding_positions)
+        if station is None:
+            self.mapping_errors += 1
+            return
+        station.content_hash = record_hash
+        try:
+            staged_row = station_to_staged_row(station)
+        except ValueError as e:
+            logger.debug(f"Station {station.source_id} can't be staged, error: {e}")
+            self.mapping_errors += 1
+            return
+        self.order.append((False, len(self.new_rows)))
+        self.new_rows.append(staged_row)
+        self._write_if_full()
+
+    def _copy(self, positions: list[int]):
+        for position in positions:
+            self.order.append((True, len(self.copied_positions)))
+            self.copied_positions.append(position)
+            self._write_if_full()
+        self.copied_count += len(positions)
+
+    def _write_if_full(self):
+        if len(self.order) >= self.batch_size:
+            self._write_batch()
+
+    def _write_batch(self):
+        if not self.order:
+            return
+        new_table = pa.Table.from_pylist(self.new_rows, schema=self.writer.schema)
+        tables = [new_table]
+        if self.copied_positions:
+            tables.append(self.previous_table.take(self.copied_positions))
+        combined = pa.concat_tables(tables)
+        positions = [position + (len(new_table) if is_copied else 0) for is_copied, position in self.order]
+        self.writer.write_table(combined.take(positions))
+        self.new_rows, self.order, self.copied_positions = [], [], []
+
+    def close(self):
+        """Writes the remaining stations and replaces the previous staged dataset."""
+        self._copy(self.trailing_positions)
+        self.trailing_positions = []
+        self._write_batch()
+        self.writer.close()
+        self.previous_table = None
+        self.tmp_file.replace(self.staged_file)
+
+
+def stage_stations(
+    source_file,
+    records: Iterable[tuple[str, T]],
+    map_record: Callable[[T], Station],
+    workers: int = 1,
+    batch_size: int = STAGING_BATCH_SIZE,
+) -> tuple[Path, int]:
+    """Maps the records of a source file to stations and writes them to the staged dataset of the file.
+
+    :param source_file: path of the source file.
+    :param records: tuples of the content hash and the record, in the order of the source file.
+    :param map_record: module level function mapping a record to a station with address and charging.
+    :param workers: number of worker processes mapping the records, see :func:`map_records`.
+    :param batch_size: number of stations per row group of the staged dataset.
+    :return: path of the staged dataset and the number of records which could not be mapped.
+    """
+    logger.info(f"Staging stations of {source_file}")
+    with StagedStationsWriter(source_file, batch_size) as writer:
+        for key, station, error in map_records(writer.unstaged(records), map_record, workers):
+            if station is None:
+                logger.debug(f"Entry could not be mapped! Error: {error}")
+            writer.add(key, station)
+    logger.info(
+        f"Staged stations of {source_file}: {writer.copied_count} unchanged records, "
+        f"{writer.mapping_errors} records could not be mapped"
+    )
+    return writer.staged_file, writer.mapping_errors
+
+
+def iter_staged_stations(
+    staged_file,
+    skip_unchanged: Optional[Callable[[str], bool]] = None,
+    batch_size: int = STAGING_BATCH_SIZE,
+) -> Iterator[Station]:
+    """Reads the stations of a staged dataset batch by batch.
+
+    :param staged_file: path of the staged dataset.
+    :param skip_unchanged: function returning whether a station can be skipped by its content hash, e.g.
+        :meth:`StationTableUpdater.skip_unchanged`. Skipped stations are not created.
+    :param batch_size: number of rows read at once.
+    """
+    parquet_file = pq.ParquetFile(staged_file, memory_map=True)
+    for batch in parquet_file.iter_batches(batch_size=batch_size):
+        hashes = batch.column("station.content_hash").to_pylist()
+        if skip_unchanged:
+            batch = batch.take(
+                [i for i, record_hash in enumerate(hashes) if record_hash is None or not skip_unchanged(record_hash)]
+            )
+        for staged_row in batch.to_pylist():
+            yield staged_row_to_station(staged_row)
+
+
+def load_staged_stations(staged_file, station_updater: StationTableUpdater, data_source: str, country_code: str) -> int:
+    """Writes the stations of a staged dataset which changed since their last import.
+
+    :param staged_file: path of the staged dataset.
+    :param station_updater: updater to skip the unchanged stations and to write the others with.
+    :param data_source: data source of the stations.
+    :param country_code: country of the stations.
+    :return: number of stations passed to the station updater.
+    """
+
+    def skip_unchanged(record_hash: str) -> bool:
+        return station_updater.skip_unchanged(record_hash, data_source, country_code)
+
+    count = 0
+    for station in iter_staged_stations(staged_file, skip_unchanged):
+        station_updater.update_station(station, data_source)
+        count += 1
+    return count
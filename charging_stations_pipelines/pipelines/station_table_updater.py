@@ -1,27 +1,181 @@
 """Module for updating the Stations table."""
 
 from logging import Logger
+from typing import Any, Final, Optional
 
+from geoalchemy2 import Geography
+from sqlalchemy import JSON, Column, Table, cast, delete, func, or_, select, update
+from sqlalchemy.dialects.postgresql import JSONB, insert
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from sqlalchemy.sql.elements import ColumnElement
 
+from charging_stations_pipelines import settings
+from charging_stations_pipelines.db_utils import allocate_station_ids, delete_stations, model_to_row
+from charging_stations_pipelines.models.address import Address
+from charging_stations_pipelines.models.charging import Charging
 from charging_stations_pipelines.models.station import Station
 
+NOT_UPDATED_COLUMNS: Final[set[str]] = {"id", "station_id", "is_merged", "merge_status"}
+"""Columns which are neither compared nor overwritten when upserting stations, addresses and charging rows."""
+
 
 class StationTableUpdater:
-    """Class for updating the Stations table."""
+    """Class for updating the Stations table.
+
+    With a batch size larger than 1 stations are collected and written together with their address and charging in
+    one transaction per batch, using multi-row inserts. Stations whose source id exists already are skipped by the
+    database and counted as errors, like in the row by row mode. If a batch fails for any other reason, its stations
+    are written row by row, so that only the bad rows are lost.
+    Call :meth:`flush` after the last station.
+
+    Source records whose content hash is stored already are skipped by :meth:`skip_unchanged` before being mapped.
 
-    def __init__(self, session: Session, logger: Logger):
+    In incremental mode stations whose source id exists already are upserted instead: stations, addresses and
+    charging rows are only written if their content changed, and the merge status of changed stations is reset, so
+    that an incremental merge picks them up. Later stations with the source id of a station written or skipped before
+    in the same import are counted as errors, like in the non-incremental mode. Afterwards
+    :meth:`remove_missing_stations` deletes the stations that are not part of the data source anymore.
+
+    :param session: session to write the stations with.
+    :param logger: logger of the pipeline.
+    :param batch_size: number of stations per transaction, 1 commits every station on its own.
+    :param incremental: whether to update existing stations instead of skipping them.
+    """
+
+    def __init__(
+        self,
+        session: Session,
+        logger: Logger,
+        batch_size: int = settings.import_batch_size,
+        incremental: bool = False,
+    ):
         self.session = session
         self.logger = logger
+        self.batch_size = max(1, batch_size)
+        self.incremental = incremental
+        self.pending: list[tuple[Station, str]] = []
+        self.imported_source_ids: set[str] = set()
+        self.imported_sources: set[tuple[str, str]] = set()
+        self.stored_content_hashes: dict[tuple[str, str], dict[str, str]] = {}
+        self.failed_count = 0
+        """Number of stations which could not be written, not counting the ones skipped for an existing source id."""
         self.counts = {
             "new": 0,
-            "updated": 0,  # no update mechanism yet
+            "updated": 0,
+            "unchanged": 0,
+            "removed": 0,
             "error": 0,
         }
 
+    def skip_unchanged(self, record_hash: str, data_source: str, country_code: str) -> bool:
+        """Checks whether a source record has been imported before without changes, by its content hash.
+
+        Unchanged records are counted and, in incremental mode, kept from being removed, so they don't need to be
+        mapped and passed to :meth:`update_station`.
+
+        :param record_hash: content hash of the source record, also set as content hash of the mapped station.
+        :param data_source: data source of the stations of the record.
+        :param country_code: country of the stations of the record.
+        :return: True if the record can be skipped.
+        """
+        source = (data_source, country_code)
+        if source not in self.stored_content_hashes:
+            self.stored_content_hashes[source] = self._load_content_hashes(data_source, country_code)
+        source_id = self.stored_content_hashes[source].get(record_hash)
+        if source_id is None:
+            return False
+
+        self.counts["unchanged"] += 1
+        if self.incremental:
+            self.imported_source_ids.add(source_id)
+            self.imported_sources.add(source)
+        return True
+
+    def _load_content_hashes(self, data_source: str, country_code: str) -> dict[str, str]:
+        stations = Station.__table__
+        stored_hashes = self.session.execute(
+            select([stations.c.content_hash, stations.c.source_id])
+            .where(stations.c.data_source == data_source)
+            .where(stations.c.country_code == country_code)
+            .where(stations.c.is_merged.is_(False))
+            .where(stations.c.content_hash.isnot(None))
+        )
+        return dict(stored_hashes.fetchall())
+
     def update_station(self, station: Station, data_source_key: str):
         """Updates the Stations table with the given station."""
+        if self.incremental:
+            if station.source_id is not None and station.source_id in self.imported_source_ids:
+                # like the insert of the non-incremental mode keep the first station of a source id, also across
+                # batches, otherwise stations sharing a source id would overwrite each other on every import
+                self.logger.debug(f"{data_source_key}-Entry {station.source_id} exists already in this import")
+                self.counts["error"] += 1
+                return
+            self.imported_source_ids.add(station.source_id)
+            self.imported_sources.add((station.data_source, station.country_code))
+        if self.batch_size == 1 and not self.incremental:
+            self._update_station_row(station, data_source_key)
+            return
+
+        self.pending.append((station, data_source_key))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Writes all collected stations."""
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, []
+        try:
+            self._add_batch_counts(self._upsert_batch(batch) if self.incremental else self._write_batch(batch), batch)
+        except Exception as e:
+            self.logger.warning(f"Writing a batch of {len(batch)} stations failed, retrying row by row. Error: {e}")
+            self.session.rollback()
+            for station, data_source_key in batch:
+                if self.incremental:
+                    self._upsert_station_row(station, data_source_key)
+                else:
+                    self._update_station_row(station, data_source_key)
+
+    def remove_missing_stations(self):
+        """In incremental mode, deletes the stations of the imported data sources and countries which were not
+        imported again, together with their address and charging. Merged stations are left to the next merge."""
+        if not self.incremental:
+            return
+        self.flush()
+        stations = Station.__table__
+        for data_source, country_code in self.imported_sources:
+            stored_stations = self.session.execute(
+                select([stations.c.id, stations.c.source_id])
+                .where(stations.c.data_source == data_source)
+                .where(stations.c.country_code == country_code)
+                .where(stations.c.is_merged.is_(False))
+            )
+            missing_ids = [
+                station_id for station_id, source_id in stored_stations if source_id not in self.imported_source_ids
+            ]
+            if missing_ids:
+                delete_stations(self.session, missing_ids)
+                self.logger.debug(f"Removing {len(missing_ids)} stations of {data_source} in {country_code}")
+            self.counts["removed"] += len(missing_ids)
+        self.session.commit()
+
+    def _add_batch_counts(self, batch_counts: dict[str, int], batch: list[tuple[Station, str]]):
+        for key, count in batch_counts.items():
+            self.counts[key] += count
+        self.counts["error"] += len(batch) - sum(batch_counts.values())
+
+    def _upsert_station_row(self, station: Station, data_source_key: str):
+        try:
+            self._add_batch_counts(self._upsert_batch([(station, data_source_key)]), [(station, data_source_key)])
+        except Exception as e:
+            self.logger.error(f"{data_source_key}-Entry -- Unexpected Error: {e}")
+            self.session.rollback()
+            self.counts["error"] += 1
+            self.failed_count += 1
+
+    def _update_station_row(self, station: Station, data_source_key: str):
         error_occurred = False
         self.session.add(station)
 
@@ -36,16 +190,144 @@ class StationTableUpdater:
             error_occurred = True
             self.logger.error(f"{data_source_key}-Entry -- Unexpected Error: {e}")
             self.session.rollback()
+            self.failed_count += 1
 
         if error_occurred:
             self.counts["error"] += 1
         else:
             self.counts["new"] += 1
 
+    @staticmethod
+    def to_rows(batch: list[tuple[Station, str]], station_ids: list[int]) -> dict[Table, list[dict[str, Any]]]:
+        """Converts stations to rows per table, using the given ids for the stations.
+
+        Only the first station of a source id is kept, like when committing the stations one by one.
+        """
+        rows: dict[Table, list[dict[str, Any]]] = {
+            Station.__table__: [],
+            Address.__table__: [],
+            Charging.__table__: [],
+        }
+        source_ids = set()
+        for (station, _), station_id in zip(batch, station_ids):
+            if station.source_id is not None:
+                if station.source_id in source_ids:
+                    continue
+                source_ids.add(station.source_id)
+            rows[Station.__table__].append(model_to_row(station, Station.__table__, id=station_id))
+            address: Optional[Address] = station.address
+            if address:
+                rows[Address.__table__].append(model_to_row(address, Address.__table__, station_id=station_id))
+            charging: Optional[Charging] = station.charging
+            if charging:
+                rows[Charging.__table__].append(model_to_row(charging, Charging.__table__, station_id=station_id))
+        return rows
+
+    def _write_batch(self, batch: list[tuple[Station, str]]) -> dict[str, int]:
+        station_ids = allocate_station_ids(self.session, len(batch))
+        rows = self.to_rows(batch, station_ids)
+
+        stations = Station.__table__
+        insert_stations = (
+            insert(stations)
+            .values(rows[stations])
+            .on_conflict_do_nothing(index_elements=[stations.c.source_id])
+            .returning(stations.c.id)
+        )
+        inserted_ids = {row[0] for row in self.session.execute(insert_stations)}
+        for table in [Address.__table__, Charging.__table__]:
+            table_rows = [row for row in rows[table] if row["station_id"] in inserted_ids]
+            if table_rows:
+                self.session.execute(table.insert().values(table_rows))
+        self.session.commit()
+
+        if len(inserted_ids) < len(batch):
+            skipped_source_ids = [row["source_id"] for row in rows[stations] if row["id"] not in inserted_ids]
+            self.logger.debug(
+                f"{len(batch) - len(inserted_ids)} entries exist already, e.g. source ids {skipped_source_ids[:10]}"
+            )
+        return {"new": len(inserted_ids)}
+
+    def _upsert_batch(self, batch: list[tuple[Station, str]]) -> dict[str, int]:
+        stations = Station.__table__
+        source_ids = [station.source_id for station, _ in batch if station.source_id is not None]
+        existing_ids: dict[str, int] = dict(
+            self.session.execute(
+                select([stations.c.source_id, stations.c.id]).where(stations.c.source_id.in_(source_ids))
+            ).fetchall()
+        )
+        new_count = sum(1 for station, _ in batch if station.source_id not in existing_ids)
+        new_ids = iter(allocate_station_ids(self.session, new_count) if new_count else [])
+        station_ids = [
+            existing_ids[station.source_id] if station.source_id in existing_ids else next(new_ids)
+            for station, _ in batch
+        ]
+        rows = self.to_rows(batch, station_ids)
+        existing_station_ids = {row["id"] for row in rows[stations] if row["source_id"] in existing_ids}
+
+        written_ids = self._upsert_rows(stations, rows[stations], stations.c.source_id, stations.c.id)
+        inserted_ids = written_ids - existing_station_ids
+        changed_ids = written_ids & existing_station_ids
+        changed_child_ids: set[int] = set()
+        for table in [Address.__table__, Charging.__table__]:
+            changed_child_ids |= self._upsert_rows(table, rows[table], table.c.station_id, table.c.station_id)
+            ids_without_child = existing_station_ids - {row["station_id"] for row in rows[table]}
+            if ids_without_child:
+                deleted_children = self.session.execute(
+                    delete(table).where(table.c.station_id.in_(ids_without_child)).returning(table.c.station_id)
+                )
+                changed_child_ids |= {row[0] for row in deleted_children}
+
+        changed_child_ids = (changed_child_ids & existing_station_ids) - changed_ids
+        if changed_child_ids:
+            self.session.execute(update(stations).where(stations.c.id.in_(changed_child_ids)).values(merge_status=None))
+        self.session.commit()
+
+        updated_count = len(changed_ids) + len(changed_child_ids)
+        return {
+            "new": len(inserted_ids),
+            "updated": updated_count,
+            "unchanged": len(existing_station_ids) - updated_count,
+        }
+
+    def _upsert_rows(
+        self, table: Table, rows: list[dict[str, Any]], key_column: Column, returned_column: Column
+    ) -> set[int]:
+        """Inserts the rows, or updates the existing row with the same key if any of its columns changed.
+
+        :return: values of ``returned_column`` of the inserted and updated rows.
+        """
+        if not rows:
+            return set()
+        upsert = insert(table).values(rows)
+        updated_columns = [
+            column for column in table.columns if column.key not in NOT_UPDATED_COLUMNS and column is not key_column
+        ]
+        values = {column.key: upsert.excluded[column.key] for column in updated_columns}
+        if "merge_status" in table.columns:
+            values["merge_status"] = None
+        upsert = upsert.on_conflict_do_update(
+            index_elements=[key_column],
+            set_=values,
+            where=or_(*[_is_changed(column, upsert.excluded[column.key]) for column in updated_columns]),
+        ).returning(returned_column)
+        return {row[0] for row in self.session.execute(upsert)}
+
     def log_update_station_counts(self):
         """Log the number of new and updated stations."""
         self.logger.info(
             f"new stations: {self.counts['new']}, "
             f"updated stations: {self.counts['updated']}, "
+            f"unchanged stations: {self.counts['unchanged']}, "
+            f"removed stations: {self.counts['removed']}, "
             f"errors: {self.counts['error']}"
         )
+
+
+def _is_changed(column: Column, new_value: ColumnElement) -> ColumnElement:
+    # json has no equality operator and geography compares bounding boxes only
+    if isinstance(column.type, JSON):
+        return cast(column, JSONB).is_distinct_from(cast(new_value, JSONB))
+    if isinstance(column.type, Geography):
+        return func.ST_AsBinary(column).is_distinct_from(func.ST_AsBinary(new_value))
+    return column.is_distinct_from(new_value)
@@ -25,4 +25,7 @@ db_user = os.getenv("DB_USER", "postgres")
 db_password = os.getenv("DB_PASSWORD", "postgres")
 db_schema = os.getenv("DB_SCHEMA", "public")
 db_table_prefix = os.getenv("DB_TABLE_PREFIX", "")
+import_batch_size = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+econtrol_at_fetch_workers = int(os.getenv("ECONTROL_AT_FETCH_WORKERS", "4"))
+econtrol_at_resume_download = os.getenv("ECONTROL_AT_RESUME_DOWNLOAD", "false") == "true"
 db_uri = "postgresql://" + db_user + ":" + db_password + "@" + db_host + ":" + db_port + "/" + db_name
@@ -1,16 +1,25 @@
 """Module containing shared utility functions for the charging stations pipelines."""
 import configparser
+import hashlib
 import json
 import logging
+import math
 import re
+import time
 from collections.abc import Iterable
 from datetime import datetime
+from itertools import islice
 from pathlib import Path
-from typing import Any, Dict, List, Optional, TypeVar, Union
+from typing import IO, Any, Dict, Iterator, List, Mapping, Optional, TypeVar, Union
 
+import numpy as np
+import openpyxl
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import requests
 from dateutil import parser
+from tqdm import tqdm
 
 from charging_stations_pipelines import PROJ_ROOT, PROJ_DATA_DIR
 
@@ -63,6 +72,22 @@ def check_coordinates(coords: Optional[Union[float, int, str]]) -> Optional[floa
     raise ValueError("Coordinates could not be read properly!")
 
 
+def check_coordinates_column(coords: pd.Series) -> pd.Series:
+    """Column-wise version of :func:`check_coordinates`, converting a column of coordinates to floats.
+
+    Coordinates which can't be read become NaN instead of raising a ValueError.
+    """
+    numbers = pd.to_numeric(coords, errors="coerce")
+    cleaned = (
+        coords.astype(object)
+        .where(coords.notna())
+        .astype(str)
+        .str.replace(",", ".", regex=False)
+        .str.replace(r"[^0-9.\-]", "", regex=True)
+    )
+    return numbers.fillna(pd.to_numeric(cleaned, errors="coerce")).astype(float)
+
+
 def parse_date(date_str: Optional[str]) -> Optional[datetime]:
     """Parses a string representation of a date into a datetime object.
 
@@ -196,6 +221,21 @@ def coalesce(*args):
     return None
 
 
+CONTENT_HASH_VERSION = 1
+"""Part of every content hash, to be incremented when a mapper changes, so that all records are mapped again."""
+
+
+def content_hash(record: Union[JSON, pd.Series]) -> str:
+    """Returns a compact hash of the content of a source record, e.g. a JSON entry or a row of a data frame.
+
+    The hash only depends on the keys and values of the record, not on their order.
+    """
+    if isinstance(record, pd.Series):
+        record = {str(key): value for key, value in record.items()}
+    content = json.dumps([CONTENT_HASH_VERSION, record], sort_keys=True, default=str)
+    return hashlib.blake2b(content.encode("utf-8"), digest_size=16).hexdigest()
+
+
 def reject_if(test: bool, error_message: str = ""):
     """Raises a RuntimeError if the given test is True."""
     if test:
@@ -209,27 +249,479 @@ def load_json_file(file_path):
     return data
 
 
+_JSON_NUMBER_CHARS = "0123456789+-.eE"
+_JSON_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+class _JsonStreamReader:
+    """Decodes the values of a JSON document one by one from a text file, keeping only a few chunks in memory."""
+
+    def __init__(self, file: IO[str], chunk_size: int):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.is_eof = False
+
+    def _read_chunk(self) -> bool:
+        chunk = self.file.read(self.chunk_size)
+        if not chunk:
+            self.is_eof = True
+            return False
+        self.buffer = self.buffer[self.pos :] + chunk
+        self.pos = 0
+        return True
+
+    def next_char(self) -> str:
+        """Consumes whitespace and returns the next structural character, or an empty string at the end of file."""
+        while True:
+            self.pos = _JSON_WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                self.pos += 1
+                return self.buffer[self.pos - 1]
+            if not self._read_chunk():
+                return ""
+
+    def expect(self, expected: str) -> str:
+        """Consumes the next structural character, which has to be one of the characters of ``expected``."""
+        char = self.next_char()
+        if not char or char not in expected:
+            raise json.JSONDecodeError(f"Expecting one of '{expected}'", self.buffer, self.pos)
+        return char
+
+    def peek_char(self) -> str:
+        """Returns the next structural character without consuming it."""
+        char = self.next_char()
+        if char:
+            self.pos -= 1
+        return char
+
+    def decode_value(self) -> JSON:
+        """Decodes the next value, reading further chunks until it is complete."""
+        self.peek_char()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self._read_chunk():
+                    raise
+                continue
+            # a number cut off at the end of the buffer continues in the next chunk
+            is_number = isinstance(value, (int, float)) and not isinstance(value, bool)
+            is_cut_off = end == len(self.buffer) or self.buffer[end] in _JSON_NUMBER_CHARS
+            if is_number and is_cut_off and not self.is_eof and self._read_chunk():
+                continue
+            self.pos = end
+            return value
+
+
+def iter_json_array(file_path, key: str, chunk_size: int = 1 << 16) -> Iterator[JSON]:
+    """Iterates over the items of the array ``key`` of the JSON object in a file, without loading the whole file.
+
+    Only the current item and the chunk it was read from are kept in memory, the other values of the object are
+    decoded and dropped.
+
+    :param file_path: path of a file containing a JSON object, e.g. an Overpass API response.
+    :param key: name of the array in the top level object.
+    :param chunk_size: number of characters read from the file at once.
+    :return: iterator over the items of the array, empty if the object has no such array.
+    """
+    with open(file_path, encoding="utf-8") as file:
+        reader = _JsonStreamReader(file, chunk_size)
+        reader.expect("{")
+        if reader.peek_char() == "}":
+            return
+        while True:
+            name = reader.decode_value()
+            reader.expect(":")
+            if name == key and reader.peek_char() == "[":
+                reader.expect("[")
+                if reader.peek_char() == "]":
+                    reader.expect("]")
+                else:
+                    while True:
+                        yield reader.decode_value()
+                        if reader.expect(",]") == "]":
+                            break
+            else:
+                reader.decode_value()
+            if reader.expect(",}") == "}":
+                return
+
+
+EXCEL_HEADER_ROW = 10
+"""Zero based number of the row with the column names in the loaded Excel files, the rows above are comments."""
+
+EXCEL_CACHE_SUFFIX = ".parquet"
+"""Suffix of the columnar cache written next to a loaded Excel file."""
+
+EXCEL_CACHE_VERSION = 1
+"""Version of the layout of the Excel cache, to be incremented when it changes, so that all caches are written again."""
+
+EXCEL_CACHE_CHUNK_SIZE = 10_000
+"""Number of rows of an Excel file converted and written to its cache at once."""
+
+_EXCEL_CACHE_METADATA_KEY = b"echarm_excel_cache"
+_EXCEL_ERROR_VALUES = {"#DIV/0!", "#NAME?", "#NULL!", "#NUM!", "#REF!", "#VALUE!"}
+# the strings pd.read_excel reads as NaN by default
+_EXCEL_NA_STRINGS = {
+    "",
+    "#N/A",
+    "#N/A N/A",
+    "#NA",
+    "-1.#IND",
+    "-1.#QNAN",
+    "-NaN",
+    "-nan",
+    "1.#IND",
+    "1.#QNAN",
+    "<NA>",
+    "N/A",
+    "NA",
+    "NULL",
+    "NaN",
+    "n/a",
+    "nan",
+    "null",
+}
+_EXCEL_NA_VALUES = _EXCEL_NA_STRINGS | _EXCEL_ERROR_VALUES
+
+# Cells of a column can have different types, every type is kept in a sub column of its own in the cache
+_EXCEL_CELL_TYPES = {
+    "bool": pa.bool_(),
+    "int": pa.int64(),
+    "float": pa.float64(),
+    "datetime": pa.timestamp("us"),
+    "str": pa.string(),
+}
+
+
+def _excel_cell_type(value) -> Optional[str]:
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, int):
+        return "int"
+    if isinstance(value, float):
+        return "float"
+    if isinstance(value, datetime):
+        return "datetime"
+    return "str"
+
+
+def _convert_excel_cell(value):
+    # the same conversion pd.read_excel does, empty cells, errors and NA strings become NaN
+    if value is None or (isinstance(value, str) and value in _EXCEL_NA_VALUES):
+        return np.nan
+    return value
+
+
+def _excel_sub_column(position: int, cell_type: str) -> str:
+    return f"{position}:{cell_type}"
+
+
+def _iter_excel_rows(path) -> Iterator[tuple]:
+    """Streams the rows of the first sheet of an Excel file with openpyxl in read-only mode, without trailing empty
+    rows."""
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True, keep_links=False)
+    try:
+        empty_rows = []
+        for row in workbook.worksheets[0].iter_rows(values_only=True):
+            if all(value is None or value == "" for value in row):
+                empty_rows.append(row)
+                continue
+            yield from empty_rows
+            empty_rows.clear()
+            yield row
+    finally:
+        workbook.close()
+
+
+def _excel_rows_to_batch(rows: list[tuple], width: int) -> pa.RecordBatch:
+    arrays, names = [], []
+    for position in range(width):
+        sub_columns = {cell_type: [None] * len(rows) for cell_type in _EXCEL_CELL_TYPES}
+        for i, row in enumerate(rows):
+            value = _convert_excel_cell(row[position]) if position < len(row) else None
+            cell_type = _excel_cell_type(value)
+            if cell_type:
+                sub_columns[cell_type][i] = str(value) if cell_type == "str" else value
+        for cell_type, arrow_type in _EXCEL_CELL_TYPES.items():
+            arrays.append(pa.array(sub_columns[cell_type], type=arrow_type))
+            names.append(_excel_sub_column(position, cell_type))
+    return pa.RecordBatch.from_arrays(arrays, names=names)
+
+
+def _write_excel_cache(path, cache_path: Path, checksum: str):
+    """Converts an Excel file chunk by chunk to a Parquet file, with a sub column per column and type of cell."""
+    rows = _iter_excel_rows(path)
+    for _ in range(EXCEL_HEADER_ROW):
+        next(rows, None)
+    header = [_convert_excel_cell(value) for value in next(rows, ())]
+    while header and _excel_cell_type(header[-1]) is None:
+        header.pop()
+    metadata = {"version": EXCEL_CACHE_VERSION, "source_sha256": checksum, "columns": header}
+    schema = pa.schema(
+        [
+            pa.field(_excel_sub_column(position, cell_type), arrow_type)
+            for position in range(len(header))
+            for cell_type, arrow_type in _EXCEL_CELL_TYPES.items()
+        ],
+        metadata={_EXCEL_CACHE_METADATA_KEY: json.dumps(metadata, default=str)},
+    )
+
+    tmp_path = cache_path.with_name(f"{cache_path.name}.tmp")
+    with pq.ParquetWriter(tmp_path, schema) as writer:
+        while chunk := list(islice(rows, EXCEL_CACHE_CHUNK_SIZE)):
+            if any(len(row) > len(header) and any(v is not None for v in row[len(header) :]) for row in chunk):
+                logger.warning(f"Ignoring cells without column name in {path}")
+            writer.write_batch(_excel_rows_to_batch(chunk, len(header)))
+    tmp_path.replace(cache_path)
+
+
+def _read_excel_cache(cache_path: Path, checksum: Optional[str] = None) -> Optional[pd.DataFrame]:
+    """Reads the cache of an Excel file memory-mapped, or returns None if it is missing or outdated."""
+    try:
+        table = pq.read_table(cache_path, memory_map=True)
+        metadata = json.loads(table.schema.metadata[_EXCEL_CACHE_METADATA_KEY])
+    except (OSError, KeyError, TypeError, ValueError, pa.ArrowException):
+        return None
+    if metadata["version"] != EXCEL_CACHE_VERSION or (checksum and metadata["source_sha256"] != checksum):
+        return None
+
+    columns = {}
+    for position in range(len(metadata["columns"])):
+        values = np.full(table.num_rows, np.nan, dtype=object)
+        for cell_type in _EXCEL_CELL_TYPES:
+            sub_column = table.column(_excel_sub_column(position, cell_type))
+            if sub_column.null_count < len(sub_column):
+                is_valid = sub_column.is_valid().to_numpy(zero_copy_only=False)
+                values[is_valid] = sub_column.drop_null().to_numpy(zero_copy_only=False).astype(object)
+        columns[position] = values
+    index = pd.RangeIndex(EXCEL_HEADER_ROW, EXCEL_HEADER_ROW + table.num_rows)
+    df = pd.DataFrame(columns, index=index, dtype=object)
+    df.columns = pd.Index(metadata["columns"], dtype=object)
+    return df
+
+
 def load_excel_file(path: str) -> pd.DataFrame:
-    """Loads an excel file into a pandas dataframe."""
-    # noinspection PyArgumentList
-    df = pd.read_excel(path, engine="openpyxl")
-    # Set the column names to the values in the 10th row
-    df.columns = df.iloc[9]
-    # Drop the comments in the Excel
-    df_dropped = df[10:]
-    return df_dropped
-
-
-def download_file(url: str, target_file: str) -> None:
-    """Downloads a file from the specified url and saves it to the target file path."""
+    """Loads an excel file into a pandas dataframe.
+
+    The first sheet is parsed once with openpyxl in read-only mode and written chunk by chunk to a Parquet file next
+    to the Excel file, keyed by the checksum of the Excel file. Later loads of the same file read that cache
+    memory-mapped instead. Like ``pd.read_excel``, all columns are of type object with the values of the cells.
+    """
+    cache_path = Path(f"{path}{EXCEL_CACHE_SUFFIX}")
+    checksum = file_checksum(path)
+    df = _read_excel_cache(cache_path, checksum)
+    if df is None:
+        logger.info(f"Parsing {path}, which is cached in {cache_path} for later loads")
+        _write_excel_cache(path, cache_path, checksum)
+        df = _read_excel_cache(cache_path)
+    return df
+
+
+DOWNLOAD_CACHE_SUFFIX = ".cache.json"
+"""Suffix of the file next to a downloaded file which keeps the validators and the checksum of its download."""
+
+
+def file_checksum(file_path) -> str:
+    """Returns the SHA-256 checksum of a file, which is read in chunks."""
+    checksum = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while chunk := f.read(1 << 20):
+            checksum.update(chunk)
+    return checksum.hexdigest()
+
+
+def _download_cache_path(target_file) -> Path:
+    return Path(f"{target_file}{DOWNLOAD_CACHE_SUFFIX}")
+
+
+def _url_key(url: str) -> str:
+    # urls can contain api keys, which shouldn't end up on disk
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+
+def load_download_cache(target_file) -> dict[str, Any]:
+    """Returns the download cache entry of a file, or an empty dict if there is none or it can't be read."""
+    try:
+        with open(_download_cache_path(target_file), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_download_cache(target_file, entry: dict[str, Any]):
+    cache_path = _download_cache_path(target_file)
+    tmp_path = cache_path.with_name(f"{cache_path.name}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(entry, f, indent=2, sort_keys=True)
+    tmp_path.replace(cache_path)
+
+
+def conditional_request_headers(url: str, target_file) -> dict[str, str]:
+    """Returns the headers to request ``url`` only if it changed since it was downloaded to ``target_file``.
+
+    No headers are returned if the file doesn't exist, was downloaded from another url or was modified since.
+    """
+    entry = load_download_cache(target_file)
+    if entry.get("url") != _url_key(url) or not Path(target_file).is_file():
+        return {}
+    if entry.get("sha256") != file_checksum(target_file):
+        return {}
+
+    headers = {}
+    if entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+
+def record_download(target_file, url: str, response_headers: Optional[Mapping[str, str]] = None) -> bool:
+    """Keeps the validators of a response and the checksum of the file it was written to in the download cache.
+
+    Sources without validators, e.g. generated by an API on every request, are still recognized as unchanged by the
+    checksum of their content.
+
+    :param target_file: path of the downloaded file.
+    :param url: url the file was downloaded from.
+    :param response_headers: headers of the response, for the ETag and Last-Modified validators.
+    :return: whether the content of the file changed since its previous download.
+    """
+    entry = load_download_cache(target_file)
+    checksum = file_checksum(target_file)
+    changed = checksum != entry.get("sha256")
+    response_headers = response_headers or {}
+    entry.update(
+        url=_url_key(url),
+        etag=response_headers.get("ETag"),
+        last_modified=response_headers.get("Last-Modified"),
+        sha256=checksum,
+    )
+    _save_download_cache(target_file, entry)
+    return changed
+
+
+def is_file_imported(target_file) -> bool:
+    """Returns whether a file is unchanged since its last complete import with the current mappers."""
+    entry = load_download_cache(target_file)
+    if "imported" not in entry or not Path(target_file).is_file():
+        return False
+    return entry["imported"] == [CONTENT_HASH_VERSION, file_checksum(target_file)]
+
+
+def mark_file_imported(target_file):
+    """Records in the download cache that a file has been imported completely."""
+    entry = load_download_cache(target_file)
+    entry["imported"] = [CONTENT_HASH_VERSION, file_checksum(target_file)]
+    _save_download_cache(target_file, entry)
+
+
+DOWNLOAD_CHUNK_SIZE = 1 << 16
+"""Number of bytes of a download written to disk at once."""
+
+DOWNLOAD_TIMEOUT_SECONDS = 60
+"""Timeout for connecting to the server and for every read of a download."""
+
+DOWNLOAD_RETRIES = 3
+"""Number of times a download is resumed or retried after a connection or server error."""
+
+DOWNLOAD_RETRY_BACKOFF_SECONDS = 2.0
+"""Delay before the first retry of a download, doubled with every further retry."""
+
+PARTIAL_DOWNLOAD_SUFFIX = ".part"
+"""Suffix of the temporary file a download is written to, before it replaces the target file."""
+
+
+def _is_retryable(error: requests.RequestException) -> bool:
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return error.response.status_code >= 500 or error.response.status_code == 429
+    return True
+
+
+def _stream_to_file(url: str, part_file: Path, headers: dict[str, str]) -> Optional[requests.Response]:
+    """Streams a response to ``part_file`` in chunks, appending to it with a Range request if it isn't empty.
+
+    The validator of a complete response is added to ``headers`` as If-Range, so that a download is only resumed if
+    the file didn't change upstream in between. Responses with a Content-Encoding are decoded while they are written,
+    so the size of the file doesn't match the offsets of the encoded content: they are downloaded again from the start,
+    and the remaining bytes of a download are requested without any encoding.
+
+    :return: the response, or None if the server answered that the file is not modified.
+    """
+    offset = part_file.stat().st_size if part_file.is_file() else 0
+    if offset and "If-Range" in headers:
+        request_headers = {**headers, "Range": f"bytes={offset}-", "Accept-Encoding": "identity"}
+    else:
+        request_headers = headers
+    with requests.get(url, headers=request_headers, stream=True, timeout=DOWNLOAD_TIMEOUT_SECONDS) as response:
+        if response.status_code == 304:
+            return None
+        response.raise_for_status()
+        if response.status_code != 206:
+            # the server sends the whole file, e.g. because it doesn't support ranges or the file changed meanwhile
+            offset = 0
+            validator = response.headers.get("ETag") or response.headers.get("Last-Modified")
+            if response.headers.get("Content-Encoding"):
+                headers.pop("If-Range", None)
+            elif validator:
+                headers["If-Range"] = validator
+        content_length = response.headers.get("Content-Length")
+        total = offset + int(content_length) if content_length else None
+        with open(part_file, "ab" if offset else "wb") as f, tqdm(
+            total=total, initial=offset, unit="B", unit_scale=True, desc=part_file.stem
+        ) as progress:
+            for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                f.write(chunk)
+                progress.update(len(chunk))
+        return response
+
+
+def download_file(url: str, target_file: str) -> bool:
+    """Downloads a file from the specified url and saves it to the target file path.
+
+    The request is conditional if the file has been downloaded from the same url before, so an unchanged file isn't
+    downloaded again. The response is streamed in chunks to a temporary file, which replaces the target file once it
+    is complete. Interrupted downloads are resumed with a Range request and retried with exponential backoff.
+
+    :return: whether the content of the file changed since its previous download.
+    """
     headers = {
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-        "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/102.0.0.0 Safari/537.36"
+        "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/102.0.0.0 Safari/537.36",
+        **conditional_request_headers(url, target_file),
     }
-    resp = requests.get(url, headers=headers)
-    output = open(target_file, "wb")
-    output.write(resp.content)
-    output.close()
+    part_file = Path(f"{target_file}{PARTIAL_DOWNLOAD_SUFFIX}")
+    part_file.unlink(missing_ok=True)
+
+    start = time.perf_counter()
+    for attempt in range(DOWNLOAD_RETRIES + 1):
+        try:
+            response = _stream_to_file(url, part_file, headers)
+            break
+        except requests.RequestException as e:
+            if attempt == DOWNLOAD_RETRIES or not _is_retryable(e):
+                part_file.unlink(missing_ok=True)
+                raise
+            delay = DOWNLOAD_RETRY_BACKOFF_SECONDS * 2**attempt
+            logger.warning(f"Download of {target_file} failed: {e}, retrying in {delay} seconds")
+            time.sleep(delay)
+
+    if response is None:
+        logger.info(f"File {target_file} is not modified upstream, skipping download")
+        return False
+    part_file.replace(target_file)
+
+    seconds = time.perf_counter() - start
+    size = Path(target_file).stat().st_size
+    logger.info(
+        f"Downloaded {size} bytes to {target_file} in {seconds:.1f}s ({size / max(seconds, 1e-3) / 1e6:.2f} MB/s)"
+    )
+    return record_download(target_file, url, response.headers)
 
 
 def country_import_data_path(country_code: str) -> Path:
@@ -3,9 +3,11 @@
 import argparse
 import logging
 import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Optional
 
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 
 from charging_stations_pipelines import (
     db_utils,
@@ -15,7 +17,8 @@ from charging_stations_pipelines import (
     OSM_COUNTRY_CODES,
     GOV_COUNTRY_CODES,
 )
-from charging_stations_pipelines.deduplication.merger import StationMerger
+from charging_stations_pipelines.deduplication.merger import MERGE_MODES, StationMerger
+from charging_stations_pipelines.pipelines import Pipeline
 from charging_stations_pipelines.pipelines.ocm.ocm import OcmPipeline
 from charging_stations_pipelines.pipelines.osm.osm import OsmPipeline
 from charging_stations_pipelines.pipelines.pipeline_factory import pipeline_factory
@@ -35,6 +38,7 @@ def parse_args(args):
     valid_task_options = ["import", "merge", "export", "testdata"]
     valid_country_options = COUNTRY_CODES
     valid_export_format_options = ["csv", "GeoJSON"]
+    valid_merge_mode_options = MERGE_MODES
 
     parser = argparse.ArgumentParser(
         description="eCharm can best be described as an electronic vehicle charging stations data integrator. "
@@ -93,6 +97,53 @@ def parse_args(args):
         "For the merge task, delete only merged station data and "
         "reset merge status of original stations.",
     )
+    group_import_merge.add_argument(
+        "--merge_mode",
+        choices=valid_merge_mode_options,
+        default="sql",
+        help="specifies how the merge task searches for duplicate candidates. "
+        "sql runs one PostGIS radius query per station, "
+        "index loads the stations of a country once into an in-memory spatial index "
+        "and answers all radius queries from it, "
+        "pairs streams all candidate pairs of a country from a single PostGIS self-join. Default is sql.",
+    )
+    group_import_merge.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        metavar="<number of workers>",
+        help="number of worker processes. For the import task, the records of the data sources are mapped "
+        "in parallel and written by a single process. For the merge task, more than one worker splits "
+        "each country into tiles whose duplicates are searched in parallel, "
+        "using the in-memory spatial index regardless of the merge mode. The merged stations "
+        "are the same as with one worker. Default is 1.",
+    )
+    group_import_merge.add_argument(
+        "--concurrent_imports",
+        type=int,
+        default=1,
+        metavar="<number of imports>",
+        help="for the import task: number of data sources imported at the same time, across all countries. "
+        "Each import downloads, maps and writes its data independently, a failing import does not stop "
+        "the other ones. Default is 1.",
+    )
+    group_import_merge.add_argument(
+        "--incremental",
+        action="store_true",
+        help="for the import task: update the stations which exist already if they changed "
+        "and delete the stations which are not part of their data source anymore. "
+        "For the merge task: only merge the stations added or changed since the last merge again, "
+        "together with the merged stations near them or referencing removed stations. "
+        "All other merged stations are kept. Default is to import only new stations "
+        "and to merge all stations not merged yet.",
+    )
+    group_import_merge.add_argument(
+        "--merge_statistics_file",
+        action="store",
+        metavar="<file path>",
+        help="for the merge task: append the timers and counters of the merge of each country "
+        "as one line of JSON to this file. They are always logged at the end of each country.",
+    )
     group_export = parser.add_argument_group("export options")
     group_export.add_argument(
         "--export_file_descriptor",
@@ -142,39 +193,90 @@ def get_db_engine(**kwargs):
     return create_engine(name_or_url=db_uri, connect_args=connect_args, **kwargs)
 
 
-def run_import(countries: list[str], online: bool, delete_data: bool):
-    """This method runs the import process for the specified countries. It has three parameters."""
+def run_import(
+    countries: list[str],
+    online: bool,
+    delete_data: bool,
+    incremental: bool = False,
+    workers: int = 1,
+    concurrent_imports: int = 1,
+):
+    """This method runs the import process for the specified countries.
+
+    Every data source of every country is imported by its own pipeline with its own session of a shared engine. Up to
+    ``concurrent_imports`` pipelines run at the same time. A failing pipeline does not stop the other ones, the
+    failures are raised together after all pipelines finished.
+    """
+    engine = get_db_engine(pool_pre_ping=True, pool_size=max(5, concurrent_imports))
+
     if delete_data:
         logger.info("Deleting all data...")
-        db_utils.delete_all_data(sessionmaker(bind=get_db_engine())())
+        db_utils.delete_all_data(sessionmaker(bind=engine)())
         logger.info("Finished deleting all data.")
 
-    logger.info("Starting to import data...")
+    import_tasks: list[tuple[str, Callable[[Session], Pipeline]]] = []
     for country in countries:
-        logger.info(f"Importing data for country: {country}...")
-        db_session = sessionmaker(bind=get_db_engine())()
-
         if country not in GOV_COUNTRY_CODES:
             logger.info(f"no governmental data available for country code '{country}'... skipping GOV pipeline")
         else:
-            gov_pipeline = pipeline_factory(db_session, country, online)
-            gov_pipeline.run()
+            import_tasks.append(
+                (
+                    f"{country} GOV",
+                    lambda session, c=country: pipeline_factory(session, c, online, incremental, workers),
+                )
+            )
 
         if country not in OSM_COUNTRY_CODES:
             logger.info(f"country code '{country}' unknown for OSM... skipping OSM pipeline")
         else:
-            osm = OsmPipeline(country, config, db_session, online)
-            osm.run()
+            import_tasks.append(
+                (
+                    f"{country} OSM",
+                    lambda session, c=country: OsmPipeline(c, config, session, online, incremental, workers),
+                )
+            )
 
         if country not in OCM_COUNTRY_CODES:
             logger.info(f"country code '{country}' unknown for OCM... skipping OCM pipeline")
         else:
-            ocm = OcmPipeline(country, config, db_session, online)
-            ocm.run()
+            import_tasks.append(
+                (
+                    f"{country} OCM",
+                    lambda session, c=country: OcmPipeline(c, config, session, online, incremental, workers),
+                )
+            )
+
+    def run_pipeline(task_name: str, create_pipeline: Callable[[Session], Pipeline]):
+        logger.info(f"Importing data for: {task_name}...")
+        db_session = sessionmaker(bind=engine)()
+        try:
+            create_pipeline(db_session).run()
+        finally:
+            db_session.close()
+
+    logger.info(f"Starting to import data with {len(import_tasks)} pipelines, {concurrent_imports} at a time...")
+    failed_tasks = []
+    with ThreadPoolExecutor(max_workers=max(1, concurrent_imports)) as executor:
+        futures = {executor.submit(run_pipeline, *import_task): import_task[0] for import_task in import_tasks}
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                logger.exception(f"Import of {futures[future]} failed: {e}")
+                failed_tasks.append(futures[future])
+    if failed_tasks:
+        raise RuntimeError(f"Import failed for: {', '.join(sorted(failed_tasks))}")
     logger.info("Finished importing data.")
 
 
-def run_merge(countries: list[str], delete_data: bool):
+def run_merge(
+    countries: list[str],
+    delete_data: bool,
+    merge_mode: str = "sql",
+    workers: int = 1,
+    incremental: bool = False,
+    statistics_file: Optional[str] = None,
+):
     """Run the merge process for the specified countries."""
     engine = get_db_engine(pool_pre_ping=True)
 
@@ -186,7 +288,15 @@ def run_merge(countries: list[str], delete_data: bool):
     logger.info("Starting to merge data...")
     for country in countries:
         logger.info(f"Merging data for country: {country}...")
-        merger = StationMerger(country_code=country, config=config, db_engine=engine)
+        merger = StationMerger(
+            country_code=country,
+            config=config,
+            db_engine=engine,
+            merge_mode=merge_mode,
+            workers=workers,
+            incremental=incremental,
+            statistics_file=statistics_file,
+        )
         merger.run()
     logger.info("Finished merging data.")
 
@@ -245,8 +355,22 @@ def main():
     setup_logging(command_line_args.verbose)
 
     tasks = {
-        "import": lambda args: run_import(args.countries, not args.offline, args.delete_data),
-        "merge": lambda args: run_merge(args.countries, args.delete_data),
+        "import": lambda args: run_import(
+            args.countries,
+            not args.offline,
+            args.delete_data,
+            args.incremental,
+            args.workers,
+            args.concurrent_imports,
+        ),
+        "merge": lambda args: run_merge(
+            args.countries,
+            args.delete_data,
+            args.merge_mode,
+            args.workers,
+            args.incremental,
+            args.merge_statistics_file,
+        ),
         "testdata": lambda args: testdata.run(),
         "export": run_export,
     }
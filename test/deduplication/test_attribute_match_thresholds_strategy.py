@@ -0,0 +1,131 @@
+"""Unit tests for the attribute match thresholds strategy of the merger."""
+
+import random
+from difflib import SequenceMatcher
+
+import pandas as pd
+
+from charging_stations_pipelines.deduplication.attribute_match_thresholds_strategy import (
+    attribute_match_thresholds_duplicates,
+    score_duplicate_candidates,
+    similarity_reaches_threshold,
+)
+
+
+def _random_strings(count: int, seed: int = 42) -> list[str]:
+    rnd = random.Random(seed)
+    base_words = ["EnBW", "Stadtwerke München", "Allego", "Ionity", "Tesla", "Hauptstr. 1,Berlin", ""]
+    strings = []
+    for _ in range(count):
+        word = list(rnd.choice(base_words))
+        for _ in range(rnd.randint(0, 4)):
+            if word and rnd.random() < 0.5:
+                del word[rnd.randrange(len(word))]
+            else:
+                word.insert(rnd.randrange(len(word) + 1), rnd.choice("abcdefgh ,."))
+        strings.append("".join(word))
+    return strings
+
+
+def test_similarity_reaches_threshold_matches_sequence_matcher():
+    values = _random_strings(500)
+    for reference in ["EnBW", "Stadtwerke München", "Hauptstr. 1,Berlin", "", "x"]:
+        expected = [SequenceMatcher(None, reference, value).ratio() >= 0.7 for value in values]
+        assert similarity_reaches_threshold(reference, values, 0.7).tolist() == expected
+
+
+def test_similarity_reaches_threshold_empty_values():
+    assert similarity_reaches_threshold("EnBW", [], 0.7).tolist() == []
+
+
+def test_score_duplicate_candidates():
+    current_station = pd.Series({"operator": "EnBW", "address": "Hauptstr. 1,Berlin"})
+    duplicate_candidates = pd.DataFrame(
+        {
+            "operator": ["EnBW AG", None, "Allego", "Ionity", None],
+            "address": ["None,None", "Hauptstr 1,Berlin", "Nebenweg 5,Berlin", "None,None", "None,None"],
+            "distance": [90.0, 90.0, 90.0, 10.0, 95.0],
+        }
+    )
+
+    assert score_duplicate_candidates(current_station, duplicate_candidates).tolist() == [
+        True,  # operator
+        True,  # address
+        False,
+        True,  # distance
+        False,
+    ]
+
+
+def test_score_duplicate_candidates_without_operator_and_address():
+    current_station = pd.Series({"operator": None, "address": "None,None"})
+    duplicate_candidates = pd.DataFrame(
+        {
+            "operator": [None, "EnBW"],
+            "address": ["None,None", "None,None"],
+            "distance": [70.0, 70.1],
+        }
+    )
+
+    assert score_duplicate_candidates(current_station, duplicate_candidates).tolist() == [True, False]
+
+
+def test_attribute_match_thresholds_duplicates_matches_transitively():
+    # OSM duplicate without address is found via the operator, and links to the OCM station via the address
+    current_station = pd.Series({"source_id": "BNA_1", "operator": "EnBW", "address": "None,None"})
+    duplicate_candidates = pd.DataFrame(
+        {
+            "source_id": ["OSM_1", "OCM_1", "OCM_2"],
+            "data_source": ["OSM", "OCM", "OCM"],
+            "operator": ["EnBW", None, None],
+            "address": ["Hauptstr. 1,Berlin", "Hauptstr 1,Berlin", "Nebenweg 5,Hamburg"],
+            "distance": [90.0, 90.0, 90.0],
+            "is_duplicate": [False, False, False],
+        },
+        index=[11, 12, 13],
+    )
+
+    result = attribute_match_thresholds_duplicates(current_station, duplicate_candidates, "station_id_col")
+
+    assert result["is_duplicate"].tolist() == [True, True, False]
+
+
+def test_attribute_match_thresholds_duplicates_compares_from_the_duplicate_found():
+    # the similarity isn't symmetric, it's 0.72 from the duplicate found via the distance, but 0.64 the other way round
+    current_station = pd.Series({"source_id": "BNA_1", "operator": None, "address": "None,None"})
+    duplicate_candidates = pd.DataFrame(
+        {
+            "source_id": ["OCM_1", "OSM_1"],
+            "data_source": ["OCM", "OSM"],
+            "operator": ["lleg,o mbH", "Ajllejgoa ,GmbH"],
+            "address": ["None,None", "None,None"],
+            "distance": [99.0, 10.0],
+            "is_duplicate": [False, False],
+        }
+    )
+
+    result = attribute_match_thresholds_duplicates(current_station, duplicate_candidates, "station_id_col")
+
+    assert result["is_duplicate"].tolist() == [True, True]
+
+
+def test_attribute_match_thresholds_duplicates_long_chain():
+    # consecutive windows of a random string share most characters, windows far apart don't match
+    num_candidates = 300
+    rnd = random.Random(7)
+    chain = "".join(rnd.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(num_candidates + 20))
+    current_station = pd.Series({"source_id": "BNA_1", "operator": None, "address": chain[0:10]})
+    duplicate_candidates = pd.DataFrame(
+        {
+            "source_id": [f"OSM_{i}" for i in range(num_candidates)],
+            "data_source": ["OSM"] * num_candidates,
+            "operator": [None] * num_candidates,
+            "address": [chain[i + 1 : i + 11] for i in reversed(range(num_candidates))],
+            "distance": [99.0] * num_candidates,
+            "is_duplicate": [False] * num_candidates,
+        }
+    )
+
+    result = attribute_match_thresholds_duplicates(current_station, duplicate_candidates, "station_id_col")
+
+    assert result["is_duplicate"].all()
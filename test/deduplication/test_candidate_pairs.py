@@ -0,0 +1,44 @@
+"""Unit tests for the candidate pairs of the merger streamed from a self-join."""
+
+from unittest import mock
+
+from shapely.geometry import Point
+
+from charging_stations_pipelines.deduplication.candidate_pairs import CandidatePairStream, group_by_center
+
+
+def _pair_row(center_id: int, station_id: int, distance: float) -> tuple:
+    point = Point(11.5 + station_id / 1e5, 48.1).wkb_hex
+    return center_id, station_id, f"OSM_{station_id}", "OSM", point, "EnBW", 2, "Hauptstr. 1", "Berlin", distance
+
+
+def test_group_by_center():
+    rows = [_pair_row(1, 1, 0.0), _pair_row(1, 2, 7.4), _pair_row(2, 1, 7.4), _pair_row(2, 2, 0.0), _pair_row(5, 5, 0)]
+
+    groups = list(group_by_center(rows))
+
+    assert [center_id for center_id, _ in groups] == [1, 2, 5]
+    nearby_stations = groups[0][1]
+    assert nearby_stations["station_id"].tolist() == [1, 2]
+    assert nearby_stations["distance"].tolist() == [0.0, 7.4]
+    assert nearby_stations["source_id"].tolist() == ["OSM_1", "OSM_2"]
+    assert nearby_stations.geometry.name == "point"
+    assert nearby_stations["point"].iloc[1].equals(Point(11.5 + 2 / 1e5, 48.1))
+
+
+def test_nearby_stations_walks_the_cursor_in_station_id_order():
+    rows = [_pair_row(1, 1, 0.0), _pair_row(1, 3, 7.4), _pair_row(3, 3, 0.0), _pair_row(4, 4, 0.0)]
+    db_engine = mock.MagicMock()
+    result = db_engine.connect.return_value.execution_options.return_value.execute.return_value
+    result.fetchmany.side_effect = [rows[:3], rows[3:], []]
+
+    candidate_pairs = CandidatePairStream(db_engine, "DE", 100, fetch_size=3)
+
+    assert candidate_pairs.nearby_stations(1)["station_id"].tolist() == [1, 3]
+    assert candidate_pairs.nearby_stations(2).empty
+    assert candidate_pairs.nearby_stations(4)["station_id"].tolist() == [4]
+    assert candidate_pairs.nearby_stations(5).empty
+
+    candidate_pairs.close()
+    result.close.assert_called_once()
+    db_engine.connect.return_value.close.assert_called_once()
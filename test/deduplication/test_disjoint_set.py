@@ -0,0 +1,35 @@
+"""Unit tests for the disjoint-set structure of the merger."""
+
+from charging_stations_pipelines.deduplication.disjoint_set import DisjointSet
+
+
+def test_every_element_starts_in_own_set():
+    clusters = DisjointSet(3)
+
+    assert len(clusters) == 3
+    assert clusters.groups() == [[0], [1], [2]]
+    assert not clusters.connected(0, 1)
+
+
+def test_union_is_transitive():
+    clusters = DisjointSet(6)
+
+    clusters.union(0, 3)
+    clusters.union(3, 5)
+    clusters.union(1, 4)
+
+    assert clusters.connected(0, 5)
+    assert clusters.connected(4, 1)
+    assert not clusters.connected(0, 1)
+    assert clusters.groups() == [[0, 3, 5], [1, 4], [2]]
+
+
+def test_long_chain_does_not_recurse():
+    size = 100_000
+    clusters = DisjointSet(size)
+
+    for element in range(size - 1):
+        clusters.union(element + 1, element)
+
+    assert clusters.connected(0, size - 1)
+    assert len(clusters.groups()) == 1
@@ -0,0 +1,53 @@
+"""Unit tests for the timers and counters of the merger."""
+
+import json
+import logging
+
+from charging_stations_pipelines.deduplication import merge_statistics
+from charging_stations_pipelines.deduplication.merge_statistics import MergeStatistics
+
+# NOTE: "local_caplog" is a pytest fixture from test.shared.local_caplog
+from test.shared import local_caplog, LogLocalCaptureFixture  # noqa: F401
+
+
+def test_timers_and_counters_are_cumulative():
+    statistics = MergeStatistics()
+
+    for _ in range(3):
+        with statistics.timer("query"):
+            pass
+        statistics.count("queries")
+    statistics.count("candidates_scored", 7)
+
+    assert statistics.counters == {"queries": 3, "candidates_scored": 7}
+    assert statistics.timers["query"] >= 0
+
+
+def test_summary_contains_average_cluster_size():
+    statistics = MergeStatistics()
+    statistics.count("clusters", 4)
+    statistics.count("clustered_stations", 10)
+
+    summary = statistics.summary("DE")
+
+    assert summary["country_code"] == "DE"
+    assert summary["counters"] == {"clustered_stations": 10, "clusters": 4}
+    assert summary["average_cluster_size"] == 2.5
+
+
+def test_summary_without_clusters():
+    assert MergeStatistics().summary("AT")["average_cluster_size"] == 0
+
+
+def test_log_summary_appends_json_lines(tmp_path, local_caplog: LogLocalCaptureFixture):  # noqa: F811
+    statistics_file = tmp_path / "merge_statistics.jsonl"
+    statistics = MergeStatistics()
+    statistics.count("clusters")
+
+    with local_caplog(level=logging.INFO, logger=logging.getLogger(merge_statistics.__name__)):
+        statistics.log_summary("DE", str(statistics_file))
+        statistics.log_summary("AT", str(statistics_file))
+
+    lines = statistics_file.read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["country_code"] for line in lines] == ["DE", "AT"]
+    assert [log.startswith("Merge statistics: {") for log in local_caplog.logs] == [True, True]
@@ -0,0 +1,97 @@
+"""Unit tests for the batched writer of merged stations."""
+
+from unittest import mock
+
+from charging_stations_pipelines.db_utils import model_to_row
+from charging_stations_pipelines.deduplication.merged_station_writer import MergedStationWriter
+from charging_stations_pipelines.models.address import Address
+from charging_stations_pipelines.models.charging import Charging
+from charging_stations_pipelines.models.station import MergedStationSource, Station
+from test.shared import create_station
+
+
+def _create_merged_station(*source_ids: str) -> Station:
+    merged_station = create_station()
+    merged_station.source_id = None
+    merged_station.is_merged = True
+    for source_id in source_ids:
+        merged_station.source_stations.append(MergedStationSource(duplicate_source_id=source_id))
+    return merged_station
+
+
+def test_model_to_row_leaves_out_primary_key_and_applies_defaults():
+    address = Address()
+    address.street = "Teststr."
+
+    row = model_to_row(address, Address.__table__, station_id=42)
+
+    assert "id" not in row
+    assert row["station_id"] == 42
+    assert row["street"] == "Teststr."
+    assert row["town"] is None
+    assert row["is_merged"] is False
+
+
+def test_to_rows_links_children_to_allocated_station_ids():
+    batch = [
+        (_create_merged_station("OSM_1", "BNA_1"), [1, 2]),
+        (_create_merged_station("OCM_1"), [3]),
+    ]
+
+    rows = MergedStationWriter.to_rows(batch, [100, 101])
+
+    assert [row["id"] for row in rows[Station.__table__]] == [100, 101]
+    assert all(row["is_merged"] for row in rows[Station.__table__])
+    assert [row["station_id"] for row in rows[Address.__table__]] == [100, 101]
+    assert [row["station_id"] for row in rows[Charging.__table__]] == [100, 101]
+    assert [(row["merged_station_id"], row["duplicate_source_id"]) for row in rows[MergedStationSource.__table__]] == [
+        (100, "OSM_1"),
+        (100, "BNA_1"),
+        (101, "OCM_1"),
+    ]
+
+
+def test_add_flushes_full_batches():
+    writer = MergedStationWriter(mock.MagicMock(), batch_size=2)
+
+    with mock.patch.object(writer, "_write_batch", return_value=5) as write_batch:
+        writer.add(_create_merged_station("OSM_1"), [1])
+        assert write_batch.call_count == 0
+
+        writer.add(_create_merged_station("OSM_2"), [2])
+        assert write_batch.call_count == 1
+        assert len(write_batch.call_args[0][1]) == 2
+
+        writer.add(_create_merged_station("OSM_3"), [3])
+        writer.flush()
+        assert write_batch.call_count == 2
+
+    assert writer.counts == {"written": 3, "error": 0, "rows": 10}
+    assert writer.pending == []
+
+
+def test_flush_retries_failed_batch_one_by_one():
+    writer = MergedStationWriter(mock.MagicMock(), batch_size=10)
+    writer.add(_create_merged_station("OSM_1"), [1])
+    writer.add(_create_merged_station("OSM_2"), [2])
+    writer.add(_create_merged_station("OSM_3"), [3])
+
+    results = [RuntimeError("invalid input syntax"), 4, RuntimeError("invalid input syntax"), 4]
+    with mock.patch.object(writer, "_write_batch", side_effect=results) as write_batch:
+        writer.flush()
+
+    assert [len(c.args[1]) for c in write_batch.call_args_list] == [3, 1, 1, 1]
+    assert writer.counts == {"written": 2, "error": 1, "rows": 8}
+
+
+def test_flush_counts_failed_stations():
+    db_engine = mock.MagicMock()
+    db_engine.begin.side_effect = RuntimeError("connection lost")
+    writer = MergedStationWriter(db_engine, batch_size=10)
+
+    writer.add(_create_merged_station("OSM_1"), [1])
+    writer.add(_create_merged_station("OSM_2"), [2])
+    writer.flush()
+
+    assert writer.counts == {"written": 0, "error": 2, "rows": 0}
+    assert writer.pending == []
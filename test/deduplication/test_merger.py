@@ -0,0 +1,53 @@
+"""Unit tests for the duplicate search of the merger, without database."""
+
+import numpy as np
+from geopandas import GeoDataFrame
+from shapely.geometry import Point
+
+from charging_stations_pipelines.deduplication.merger import StationMerger
+from charging_stations_pipelines.deduplication.station_index import StationIndex
+
+
+def _create_candidates(count: int, seed: int = 42) -> GeoDataFrame:
+    # stations around a few hundred sites, with similar operators and addresses per site
+    rng = np.random.default_rng(seed)
+    site_lons = 11.5 + rng.uniform(0, 0.02, count // 3)
+    site_lats = 48.1 + rng.uniform(0, 0.02, count // 3)
+    sites = rng.integers(0, count // 3, count)
+    lons = site_lons[sites] + rng.normal(0, 0.0004, count)
+    lats = site_lats[sites] + rng.normal(0, 0.0004, count)
+    operators = np.array(["EnBW", "EnBW AG", "Allego", "Ionity", None], dtype=object)
+    return GeoDataFrame(
+        {
+            "station_id": np.arange(1, count + 1),
+            "source_id": [f"SRC_{i}" for i in range(1, count + 1)],
+            "data_source": rng.choice(["OSM", "OCM", "BNA"], count),
+            "point": [Point(lon, lat) for lon, lat in zip(lons, lats)],
+            "operator": operators[rng.integers(0, len(operators), count)],
+            "capacity": [1] * count,
+            "street": [f"Hauptstr. {site}" for site in sites],
+            "town": ["München"] * count,
+        },
+        geometry="point",
+    )
+
+
+def _clusters(candidates: GeoDataFrame, workers: int) -> list[tuple[list[int], list[str]]]:
+    merger = StationMerger("DE", config=None, db_engine=None, merge_mode="index", workers=workers, tile_size_m=300)
+    merger.station_index = StationIndex(candidates)
+    stations = candidates[["station_id", "point"]]
+    return [
+        (station_ids, stations_to_merge["source_id"].tolist() if station_ids[1:] else [stations_to_merge["source_id"]])
+        for stations_to_merge, station_ids in merger._iter_clusters(stations, 100)
+    ]
+
+
+def test_parallel_duplicate_search_gives_same_clusters_as_serial():
+    candidates = _create_candidates(300)
+
+    serial_clusters = _clusters(candidates, workers=1)
+    parallel_clusters = _clusters(candidates, workers=2)
+
+    assert any(len(station_ids) > 1 for station_ids, _ in serial_clusters)
+    assert parallel_clusters == serial_clusters
+    assert sorted(station_id for station_ids, _ in serial_clusters for station_id in station_ids) == list(range(1, 301))
@@ -0,0 +1,65 @@
+"""Unit tests for the source station cache of the merger."""
+
+from charging_stations_pipelines.deduplication.source_station_cache import SourceStationCache
+from charging_stations_pipelines.models.address import Address
+from charging_stations_pipelines.models.charging import Charging
+from charging_stations_pipelines.models.station import Station
+
+
+def _create_cache() -> SourceStationCache:
+    stations = {
+        1: {"id": 1, "source_id": "BNA_1", "data_source": "BNA", "operator": "EnBW", "is_merged": False},
+        2: {"id": 2, "source_id": "OSM_1", "data_source": "OSM", "operator": None, "is_merged": False},
+    }
+    addresses = {1: {"id": 10, "station_id": 1, "street": "Teststr. 1", "town": "Testhausen", "is_merged": False}}
+    chargings = {1: {"id": 20, "station_id": 1, "capacity": 2, "kw_list": [11.0, 22.0], "is_merged": False}}
+    return SourceStationCache(stations, addresses, chargings)
+
+
+def test_get_station_with_address_and_charging_creates_transient_copies():
+    cache = _create_cache()
+
+    station, address, charging = cache.get_station_with_address_and_charging(1)
+
+    assert isinstance(station, Station)
+    assert station.id is None
+    assert station.source_id is None
+    assert station.data_source == "BNA"
+    assert station.operator == "EnBW"
+
+    assert isinstance(address, Address)
+    assert address.id is None
+    assert address.station_id is None
+    assert address.street == "Teststr. 1"
+    assert address.is_merged
+
+    assert isinstance(charging, Charging)
+    assert charging.id is None
+    assert charging.station_id is None
+    assert charging.kw_list == [11.0, 22.0]
+    assert charging.is_merged
+
+
+def test_get_station_with_address_and_charging_returns_new_objects_every_time():
+    cache = _create_cache()
+
+    first_station, _, _ = cache.get_station_with_address_and_charging(1)
+    first_station.operator = "changed"
+    second_station, _, _ = cache.get_station_with_address_and_charging(1)
+
+    assert second_station is not first_station
+    assert second_station.operator == "EnBW"
+    assert cache.stations[1]["source_id"] == "BNA_1"
+
+
+def test_get_station_without_address_and_charging():
+    cache = _create_cache()
+
+    station, address, charging = cache.get_station_with_address_and_charging(2)
+
+    assert station.data_source == "OSM"
+    assert address is None
+    assert charging is None
+    assert 2 in cache
+    assert 3 not in cache
+    assert len(cache) == 2
@@ -0,0 +1,110 @@
+"""Unit tests for the in-memory station index of the merger."""
+
+import numpy as np
+from geopandas import GeoDataFrame
+from shapely.geometry import Point
+
+from charging_stations_pipelines.deduplication.station_index import (
+    WGS84_GEOD,
+    StationIndex,
+    partition_into_tiles,
+)
+
+
+def _create_candidates(center: Point, count: int, spread_deg: float, seed: int = 42) -> GeoDataFrame:
+    rng = np.random.default_rng(seed)
+    lons = center.x + rng.uniform(-spread_deg, spread_deg, count)
+    lats = center.y + rng.uniform(-spread_deg, spread_deg, count)
+    return GeoDataFrame(
+        {
+            "station_id": np.arange(1, count + 1),
+            "source_id": [f"SRC_{i}" for i in range(1, count + 1)],
+            "data_source": ["OSM"] * count,
+            "point": [Point(lon, lat) for lon, lat in zip(lons, lats)],
+            "operator": [None] * count,
+            "capacity": [1] * count,
+            "street": [None] * count,
+            "town": [None] * count,
+        },
+        geometry="point",
+    )
+
+
+def _brute_force_ids(candidates: GeoDataFrame, center: Point, radius_m: float) -> list[int]:
+    lons, lats = candidates["lon"].to_numpy(), candidates["lat"].to_numpy()
+    _, _, distances = WGS84_GEOD.inv(np.full(len(lons), center.x), np.full(len(lats), center.y), lons, lats)
+    return sorted(candidates["station_id"][distances <= radius_m].tolist())
+
+
+def test_query_matches_brute_force_search():
+    for center in [Point(11.5739817, 48.1589335), Point(10.7522, 59.9139), Point(-1.602638, 48.0449426)]:
+        candidates = _create_candidates(center, count=2000, spread_deg=0.01)
+        station_index = StationIndex(candidates)
+        candidates["lon"], candidates["lat"] = station_index.lons, station_index.lats
+
+        for query_point in candidates["point"][:50]:
+            nearby_stations = station_index.query(query_point, 100)
+            expected_ids = _brute_force_ids(candidates, query_point, 100)
+
+            assert nearby_stations["station_id"].tolist() == expected_ids
+            assert (nearby_stations["distance"] <= 100).all()
+
+
+def test_query_returns_distance_and_candidate_columns():
+    center = Point(11.5739817, 48.1589335)
+    candidates = _create_candidates(center, count=3, spread_deg=0.0001)
+    station_index = StationIndex(candidates)
+
+    nearby_stations = station_index.query(center, 100)
+
+    assert list(nearby_stations.columns) == [
+        "station_id",
+        "source_id",
+        "data_source",
+        "point",
+        "operator",
+        "capacity",
+        "street",
+        "town",
+        "distance",
+    ]
+    assert nearby_stations["station_id"].tolist() == [1, 2, 3]
+
+
+def test_query_excludes_removed_stations():
+    center = Point(11.5739817, 48.1589335)
+    candidates = _create_candidates(center, count=10, spread_deg=0.0001)
+    station_index = StationIndex(candidates)
+
+    station_index.remove([2, 5, 999])
+
+    assert station_index.query(center, 100)["station_id"].tolist() == [1, 3, 4, 6, 7, 8, 9, 10]
+
+
+def test_query_without_stations_in_radius_is_empty():
+    center = Point(11.5739817, 48.1589335)
+    candidates = _create_candidates(center, count=10, spread_deg=0.0001)
+    station_index = StationIndex(candidates)
+
+    assert station_index.query(Point(12.5, 48.1), 100).empty
+
+
+def test_partition_into_tiles_keeps_radius_search_results():
+    center = Point(11.5739817, 48.1589335)
+    candidates = _create_candidates(center, count=1000, spread_deg=0.01)
+    station_index = StationIndex(candidates)
+
+    tiles = partition_into_tiles(candidates, radius_m=100, tile_size_m=300)
+
+    assert len(tiles) > 1
+    assert sorted(station_id for tile_station_ids, _ in tiles for station_id in tile_station_ids) == list(
+        range(1, 1001)
+    )
+    for tile_station_ids, tile_candidates in tiles[:10]:
+        tile_index = StationIndex(tile_candidates)
+        for station_id in tile_station_ids:
+            point = station_index.point(station_id)
+            assert (
+                tile_index.query(point, 100)["station_id"].tolist()
+                == station_index.query(point, 100)["station_id"].tolist()
+            )
@@ -6,6 +6,7 @@ from typing import Final
 from unittest import mock
 
 import pytest
+import requests
 
 from charging_stations_pipelines.pipelines.at import econtrol_crawler
 from charging_stations_pipelines.pipelines.at.econtrol_crawler import (
@@ -66,6 +67,7 @@ def test_get_paginated_stations_key_error():
             list(econtrol_crawler._get_paginated_stations(test_url, test_headers))
 
 
+@mock.patch("charging_stations_pipelines.pipelines.at.econtrol_crawler.record_download")
 @mock.patch("builtins.open", new_callable=mock.mock_open)
 @mock.patch("charging_stations_pipelines.pipelines.at.econtrol_crawler._get_paginated_stations")
 @mock.patch("os.getenv")
@@ -75,6 +77,7 @@ def test_get_data(
     mock_getenv,
     mock_get_paginated_stations,
     mock_open,
+    mock_record_download,
     local_caplog: LogLocalCaptureFixture,  # noqa: F811
 ):
     # Prepare test data and mocks
@@ -110,6 +113,7 @@ def test_get_data(
     # Check calls
     mock_getenv.assert_called_with("ECONTROL_AT_AUTH")
     mock_get_paginated_stations.assert_called()
+    mock_record_download.assert_called_once_with(tmp_data_path, "https://api.e-control.at/charge/1.0/search/stations")
 
     # Get file contents
     file_contents = mock_file.__enter__().getvalue()
@@ -126,6 +130,7 @@ def test_get_data(
     assert actual_file_content_objs == expected_objs
 
 
+@mock.patch("charging_stations_pipelines.pipelines.at.econtrol_crawler.record_download")
 @mock.patch("builtins.open", new_callable=mock.mock_open)
 @mock.patch("charging_stations_pipelines.pipelines.at.econtrol_crawler._get_paginated_stations")
 @mock.patch("os.path.getsize")
@@ -133,6 +138,7 @@ def test_get_data_empty_response(
     mock_getsize,
     mock_get_paginated_stations,
     mock_open,
+    mock_record_download,
     local_caplog: LogLocalCaptureFixture,  # noqa: F811
 ):
     # Prepare test data and mocks
@@ -175,3 +181,74 @@ def test_get_data_empty_response(
 
     # Check file size
     assert len(file_contents) == expected_file_size
+
+
+def _station_pages_response(total_count: int, page_size: int):
+    """Returns a fake ``requests.Session.get`` answering the stations search from the given number of stations."""
+
+    def get(url, params=None):
+        from_index = params["fromIndex"] if params else 0
+        end_index = params["endIndex"] if params else min(page_size, total_count) - 1
+        response = mock.MagicMock()
+        response.json.return_value = {
+            "totalResults": total_count,
+            "fromIndex": from_index,
+            "endIndex": end_index,
+            "stations": [{"id": i} for i in range(from_index, end_index + 1)],
+        }
+        return response
+
+    return get
+
+
+@mock.patch("requests.Session.get")
+def test_paginated_stations_concurrently_in_index_order(mock_get):
+    mock_get.side_effect = _station_pages_response(total_count=95, page_size=10)
+
+    pages = list(econtrol_crawler._get_paginated_stations("https://api.test-charge.com/stations", {}, workers=4))
+
+    assert [page["fromIndex"] for page in pages] == list(range(0, 95, 10))
+    assert [station["id"] for page in pages for station in page["stations"]] == list(range(95))
+
+
+@mock.patch("charging_stations_pipelines.pipelines.at.econtrol_crawler.time.sleep")
+@mock.patch("requests.Session.get")
+def test_get_page_retries_server_errors(mock_get, mock_sleep):
+    failing_response = mock.MagicMock()
+    failing_response.raise_for_status.side_effect = requests.HTTPError(response=mock.MagicMock(status_code=503))
+    ok_response = mock.MagicMock()
+    ok_response.json.return_value = {"stations": []}
+    mock_get.side_effect = [requests.ConnectionError(), failing_response, ok_response]
+
+    assert econtrol_crawler._get_page(requests.Session(), "https://api.test-charge.com/stations") == {"stations": []}
+    assert mock_get.call_count == 3
+    assert [c.args[0] for c in mock_sleep.call_args_list] == [
+        econtrol_crawler.RETRY_BACKOFF_SECONDS,
+        econtrol_crawler.RETRY_BACKOFF_SECONDS * 2,
+    ]
+
+
+@mock.patch("requests.Session.get")
+def test_get_page_does_not_retry_client_errors(mock_get):
+    failing_response = mock.MagicMock()
+    failing_response.raise_for_status.side_effect = requests.HTTPError(response=mock.MagicMock(status_code=401))
+    mock_get.return_value = failing_response
+
+    with pytest.raises(requests.HTTPError):
+        econtrol_crawler._get_page(requests.Session(), "https://api.test-charge.com/stations")
+    assert mock_get.call_count == 1
+
+
+@mock.patch("charging_stations_pipelines.pipelines.at.econtrol_crawler.record_download")
+@mock.patch("requests.Session.get")
+def test_get_data_resumes_after_complete_pages(mock_get, mock_record_download, tmp_path):
+    tmp_data_path = tmp_path / "econtrol.ndjson"
+    # two complete pages and an incomplete line of the third one are on disk already
+    tmp_data_path.write_text("".join(json.dumps({"id": i}) + "\n" for i in range(25)) + '{"id": 2')
+    mock_get.side_effect = _station_pages_response(total_count=45, page_size=10)
+
+    econtrol_crawler.get_data(tmp_data_path, workers=2, resume=True)
+
+    requested_pages = [c.kwargs["params"]["fromIndex"] for c in mock_get.call_args_list if c.kwargs.get("params")]
+    assert sorted(requested_pages) == [20, 30, 40]
+    assert [json.loads(line)["id"] for line in tmp_data_path.read_text().splitlines()] == list(range(45))
@@ -102,3 +102,38 @@ def test_map_charging_bna():
     assert charging.capacity == 2
     assert charging.kw_list == []  # no "P" in keys
     assert charging.max_kw is None  # as kw_list is []
+
+
+def test_map_charging_columns_bna():
+    data = pd.DataFrame(
+        {
+            "Nennleistung Ladeeinrichtung [kW]": ["22,0", 50.0, "unknown"],
+            "Anzahl Ladepunkte": [2, 1, 1],
+            "Steckertypen1": ["AC Steckdose Typ 2", None, "DC Kupplung Combo"],
+            "P1 [kW]": [11, None, "7,4"],
+            "Public Key1": [None, "key", None],
+            "Steckertypen2": ["DC Kupplung Combo, AC Kupplung Typ 2", 3, None],
+            "P2 [kW]": ["11,5", "n/a", None],
+        },
+        index=[10, 11, 12],
+        dtype=object,
+    )
+
+    charging_data = de_mapper.map_charging_columns_bna(data)
+
+    assert list(charging_data.index) == [10, 11, 12]
+    assert charging_data["total_kw"].tolist() == [22.0, 50.0, None]
+    assert charging_data["kw_list"].tolist() == [[11.0, 11.5], [], [7.4]]
+    assert charging_data["max_kw"].tolist() == [11.5, None, 7.4]
+    assert charging_data["socket_type_list"].tolist() == [
+        ["AC Steckdose Typ 2", "DC Kupplung Combo", " AC Kupplung Typ 2"],
+        [],
+        ["DC Kupplung Combo"],
+    ]
+    assert charging_data["dc_support"].tolist() == [True, False, True]
+
+    charging = de_mapper.charging_from_columns_bna(charging_data.loc[11], 1)
+    assert charging.station_id == 1
+    assert charging.capacity == 1
+    assert charging.max_kw is None
+    assert charging.dc_support is False
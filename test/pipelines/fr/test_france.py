@@ -0,0 +1,66 @@
+"""Tests for the chunked import of the French government data."""
+
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+import pandas as pd
+
+from charging_stations_pipelines.pipelines.fr import france
+from charging_stations_pipelines.pipelines.fr.france import FraPipeline
+from charging_stations_pipelines.pipelines.fr.france_mapper import map_columns_fra
+
+CSV_HEADER = (
+    "id_station_itinerance,nom_operateur,consolidated_longitude,consolidated_latitude,date_mise_en_service,date_maj,"
+    "nbre_pdc,adresse_station,consolidated_commune,consolidated_code_postal\n"
+)
+
+
+def test_map_columns_fra():
+    data = pd.DataFrame(
+        {
+            "consolidated_longitude": ["2.3522", "2,35", None],
+            "consolidated_latitude": ["48.8566", "48.85 ", "unknown"],
+            "date_mise_en_service": ["2021-05-03", None, "03/05/2021"],
+            "date_maj": ["2023-01-02", "2023-01-02", None],
+            "nbre_pdc": ["2", None, "1"],
+        },
+        index=[5, 6, 7],
+    )
+
+    converted = map_columns_fra(data)
+
+    assert list(converted.index) == [5, 6, 7]
+    assert converted["longitude"].tolist()[:2] == [2.3522, 2.35]
+    assert converted["latitude"].tolist()[:2] == [48.8566, 48.85]
+    assert converted[["longitude", "latitude"]].iloc[2].isna().all()
+    assert converted["date_created"].tolist() == [datetime(2021, 5, 3), None, None]
+    assert converted["date_updated"].tolist() == [datetime(2023, 1, 2), datetime(2023, 1, 2), None]
+    assert converted["capacity"].tolist() == [2, None, 1]
+
+
+@patch.object(france, "CSV_CHUNK_SIZE", 2)
+@patch("charging_stations_pipelines.pipelines.fr.france.StationTableUpdater")
+@patch("charging_stations_pipelines.pipelines.fr.france.country_import_data_path")
+def test_run_drops_duplicate_stations_across_chunks(mock_data_path, mock_updater_class, tmp_path):
+    mock_data_path.return_value = tmp_path
+    (tmp_path / "fr.csv").write_text(
+        CSV_HEADER
+        + "FR1,Op,2.1,48.1,2021-01-01,2023-01-01,2,Rue A,Paris,01000\n"
+        + "FR2,Op,2.2,48.2,2021-01-01,2023-01-01,1,Rue B,Paris,75001\n"
+        + "FR1,Op,2.1,48.1,2021-01-01,2023-01-01,2,Rue A,Paris,01000\n"
+        + "FR3,Op,,48.3,2021-01-01,2023-01-01,1,Rue C,Paris,75002\n"
+        + "FR2,Op,2.2,48.2,2021-01-01,2023-01-01,1,Rue B,Paris,75001\n"
+    )
+    station_updater = mock_updater_class.return_value
+    station_updater.skip_unchanged.return_value = False
+
+    FraPipeline({"FRGOV": {"filename": "fr.csv"}}, MagicMock()).run()
+
+    stations = [c.args[0] for c in station_updater.update_station.call_args_list]
+    assert [station.source_id for station in stations] == ["FR1", "FR2"]
+    assert stations[0].address.postcode == "01000"
+    assert stations[0].charging.capacity == 2
+    # the station without coordinates can't be mapped and isn't staged
+    assert station_updater.skip_unchanged.call_count == 2
+    assert (tmp_path / "fr.csv.staged.parquet").is_file()
+    station_updater.flush.assert_called_once()
@@ -1,10 +1,20 @@
 """Tests for the NobilPipeline."""
 
+import functools
+import json
 from _decimal import Decimal
+from unittest.mock import MagicMock, patch
 
+from sqlalchemy.sql.dml import Insert
+
+from charging_stations_pipelines.models.address import Address
+from charging_stations_pipelines.models.charging import Charging
+from charging_stations_pipelines.models.station import Station
 from charging_stations_pipelines.pipelines.nobil.nobil_pipeline import (
+    NobilPipeline,
     parse_nobil_connectors,
 )
+from charging_stations_pipelines.pipelines.station_table_updater import StationTableUpdater
 
 
 def test_parse_nobil_connectors():
@@ -48,3 +58,55 @@ def test_parse_nobil_connectors():
     assert len(actual_connectors) == 2
     assert actual_connectors[0].power_in_kw == Decimal("7.4")
     assert actual_connectors[1].power_in_kw == Decimal("75")
+
+
+def _nobil_station(station_id: int) -> dict:
+    return {
+        "csmd": {
+            "id": station_id,
+            "Operator": "Operator",
+            "Position": "(59.91,10.75)",
+            "Created": "2020-01-01 10:00:00",
+            "Updated": "2023-01-01 10:00:00",
+            "Street": "Karl Johans gate",
+            "House_number": str(station_id),
+            "Zipcode": "0154",
+            "City": "Oslo",
+            "Number_charging_points": 1,
+        },
+        "attr": {"conn": {"1": {"5": {"trans": "22 kW - 400V 3-phase max 32A"}}}},
+    }
+
+
+@patch("charging_stations_pipelines.pipelines.station_table_updater.allocate_station_ids")
+@patch("charging_stations_pipelines.pipelines.nobil.nobil_pipeline.country_import_data_path")
+def test_run_writes_stations_in_batches(mock_data_path, mock_allocate_station_ids, tmp_path):
+    mock_data_path.return_value = tmp_path
+    nobil_stations = [_nobil_station(station_id) for station_id in range(1, 4)]
+    (tmp_path / "nobil.json").write_text(json.dumps({"chargerstations": nobil_stations}))
+    allocated_ids = iter(range(100, 200))
+    mock_allocate_station_ids.side_effect = lambda _, count: [next(allocated_ids) for _ in range(count)]
+    session = MagicMock()
+    # the multi-row insert of the stations returns the ids of all inserted stations
+    session.execute.side_effect = lambda statement: [
+        (row["id"],) for row in (statement.parameters if statement.table is Station.__table__ else [])
+    ]
+    station_updater_class = functools.partial(StationTableUpdater, batch_size=2)
+
+    with patch("charging_stations_pipelines.pipelines.nobil.nobil_pipeline.StationTableUpdater", station_updater_class):
+        NobilPipeline({}, session, "NO").run()
+
+    inserts = [c.args[0] for c in session.execute.call_args_list if isinstance(c.args[0], Insert)]
+    assert [(insert.table, len(insert.parameters)) for insert in inserts] == [
+        (Station.__table__, 2),
+        (Address.__table__, 2),
+        (Charging.__table__, 2),
+        (Station.__table__, 1),
+        (Address.__table__, 1),
+        (Charging.__table__, 1),
+    ]
+    assert [row["source_id"] for insert in inserts[::3] for row in insert.parameters] == ["1", "2", "3"]
+    assert inserts[2].parameters[0]["kw_list"] == [Decimal("22")]
+    assert session.commit.call_count == 2
+    session.add.assert_not_called()
+    session.query.assert_not_called()
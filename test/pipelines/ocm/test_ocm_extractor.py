@@ -0,0 +1,101 @@
+"""Tests for the OCM extractor."""
+
+import json
+
+import pytest
+
+from charging_stations_pipelines.pipelines.ocm import ocm_extractor
+from charging_stations_pipelines.pipelines.ocm.ocm_extractor import iter_ocm_records, join_reference_data
+from charging_stations_pipelines.pipelines.ocm.ocm_mapper import map_address_ocm, map_station_ocm
+
+REFERENCE_DATA = {
+    "ConnectionTypes": [{"ID": 25, "Title": "Type 2 (Socket Only)", "FormalName": "IEC 62196-2 Type 2"}],
+    "Countries": [{"ID": 87, "ISOCode": "DE", "ContinentCode": "EU", "Title": "Germany"}],
+    "Operators": [{"ID": 3534, "Title": "EnBW", "WebsiteURL": "https://www.enbw.com", "AddressInfo": None}],
+}
+
+STATION = {
+    "ID": 12345,
+    "UUID": "0F4A3B1C",
+    "OperatorID": 3534,
+    "NumberOfPoints": 2,
+    "DateCreated": "2021-04-01T10:00:00Z",
+    "AddressInfo": {
+        "Title": "Marienplatz",
+        "AddressLine1": "Marienplatz 1",
+        "Town": "München",
+        "Postcode": "80331",
+        "CountryID": 87,
+        "Latitude": 48.137,
+        "Longitude": 11.575,
+    },
+    "Connections": [{"ID": 1, "ConnectionTypeID": 25, "PowerKW": 22.0}],
+}
+
+
+def _reference_data():
+    return {key: {entry["ID"]: entry for entry in entries} for key, entries in REFERENCE_DATA.items()}
+
+
+def test_join_reference_data():
+    record = join_reference_data(STATION, _reference_data())
+
+    assert record["AddressInfo.Town"] == "München"
+    assert record["AddressInfo.Title"] == "Marienplatz"
+    assert record["CountryID"] == 87
+    assert record["ISOCode"] == "DE"
+    assert record["Title_x"] == "Germany"
+    assert record["OperatorIDREF"] == 3534
+    assert record["Title_y"] == "EnBW"
+    assert record["Connections"] == STATION["Connections"]
+    assert record["ConnectionsEnriched"] == [
+        {
+            "ID": 1,
+            "ConnectionTypeID": 25,
+            "PowerKW": 22.0,
+            "Title": "Type 2 (Socket Only)",
+            "FormalName": "IEC 62196-2 Type 2",
+        }
+    ]
+
+    station = map_station_ocm(record, "DE")
+    assert station.source_id == 12345
+    assert station.operator == "EnBW"
+    address = map_address_ocm(record, None)
+    assert address.country == "Germany"
+    assert address.street == "Marienplatz 1"
+
+
+def test_join_reference_data_without_matches():
+    station = {"ID": 1, "OperatorID": None, "AddressInfo": {"CountryID": 999, "Latitude": 1.0, "Longitude": 2.0}}
+
+    record = join_reference_data(station, _reference_data())
+
+    assert record["Title_x"] is None
+    assert record["Title_y"] is None
+    assert record["ConnectionsEnriched"] == []
+    address = map_address_ocm(record, None)
+    assert address.town is None and address.postcode is None and address.street is None
+
+
+def test_iter_ocm_records(tmp_path, monkeypatch):
+    monkeypatch.setattr(ocm_extractor, "PROJ_DATA_DIR", tmp_path)
+    data_dir = tmp_path / "ocm-export-DE" / "data" / "DE"
+    (data_dir / "123").mkdir(parents=True)
+    (data_dir.parent / "referencedata.json").write_text(json.dumps(REFERENCE_DATA))
+    for station_id in [12346, 12345]:
+        (data_dir / "123" / f"{station_id}.json").write_text(json.dumps({**STATION, "ID": station_id}))
+
+    records = iter_ocm_records("DE")
+
+    assert [record["ID"] for record in records] == [12345, 12346]
+
+
+def test_iter_ocm_records_fails_without_station_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(ocm_extractor, "PROJ_DATA_DIR", tmp_path)
+    (tmp_path / "ocm-export-FR" / "data" / "FR").mkdir(parents=True)
+
+    with pytest.raises(FileNotFoundError, match="No OCM data for FR"):
+        iter_ocm_records("FR")
+    with pytest.raises(FileNotFoundError, match="No OCM data for DE"):
+        iter_ocm_records("DE")
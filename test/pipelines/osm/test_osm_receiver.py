@@ -0,0 +1,42 @@
+"""Unit tests for the download of the Overpass response."""
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+import requests
+
+from charging_stations_pipelines.pipelines.osm.osm_receiver import get_osm_data
+
+
+def _response(content: bytes, fail_after=None):
+    response = MagicMock(status_code=200, url="https://overpass-api.de/api/interpreter", headers={})
+    response.__enter__.return_value = response
+
+    def iter_content(chunk_size):
+        for i in range(0, len(content), chunk_size):
+            if fail_after is not None and i >= fail_after:
+                raise requests.ConnectionError("connection reset")
+            yield content[i : i + chunk_size]
+
+    response.iter_content.side_effect = iter_content
+    return response
+
+
+@patch("charging_stations_pipelines.pipelines.osm.osm_receiver.DOWNLOAD_CHUNK_SIZE", 4)
+@patch("charging_stations_pipelines.pipelines.osm.osm_receiver.requests.get")
+def test_get_osm_data_keeps_previous_file_on_failure(mock_get, tmp_path):
+    data_path = tmp_path / "osm.json"
+    data_path.write_text('{"elements": []}')
+    mock_get.return_value = _response(b'{"elements": [{"id": 1}]}', fail_after=8)
+
+    with pytest.raises(requests.ConnectionError):
+        get_osm_data("DE", data_path)
+
+    assert data_path.read_text() == '{"elements": []}'
+    assert not (tmp_path / "osm.json.part").exists()
+
+    mock_get.return_value = _response(b'{"elements": [{"id": 1}]}')
+    get_osm_data("DE", data_path)
+
+    assert data_path.read_text() == '{"elements": [{"id": 1}]}'
+    assert not (tmp_path / "osm.json.part").exists()
@@ -0,0 +1,74 @@
+"""Unit tests for the parallel mapping stage of the import pipelines."""
+
+import functools
+import pickle
+
+from geoalchemy2.shape import to_shape
+
+from charging_stations_pipelines.pipelines.osm.osm import map_osm_entry
+from charging_stations_pipelines.pipelines.parallel_mapper import map_records, rows_to_station, station_to_rows
+
+
+def _osm_entry(osm_id: int) -> dict:
+    return {
+        "id": osm_id,
+        "lat": 48.0449426,
+        "lon": -1.602638 + osm_id / 1000,
+        "timestamp": "2022-05-01T10:00:00Z",
+        "tags": {
+            "amenity": "charging_station",
+            "capacity": "2",
+            "operator": "Sodetrel",
+            "socket:type2": "2",
+            "socket:type2:output": "22 kW",
+            "addr:street": "Rue de Paris",
+            "addr:housenumber": "1",
+            "addr:postcode": "35000",
+            "addr:city": "Rennes",
+            "addr:country": "FR",
+        },
+        "type": "node",
+    }
+
+
+def _records():
+    entries = [_osm_entry(osm_id) for osm_id in range(1, 8)]
+    entries[3]["lat"] = "unknown"
+    return [(f"hash_{entry['id']}", entry) for entry in entries]
+
+
+def _summary(results):
+    return [
+        (
+            key,
+            station.source_id if station else None,
+            to_shape(station.point).x if station else None,
+            station.address.town if station else None,
+            station.charging.capacity if station else None,
+            bool(error),
+        )
+        for key, station, error in results
+    ]
+
+
+def test_station_to_rows_can_be_pickled_and_restored():
+    station = map_osm_entry(_osm_entry(1), "FR")
+
+    restored = rows_to_station(pickle.loads(pickle.dumps(station_to_rows(station))))
+
+    assert restored.source_id == station.source_id
+    assert restored.country_code == "FR"
+    assert to_shape(restored.point).equals(to_shape(station.point))
+    assert restored.address.town == "Rennes"
+    assert restored.charging.capacity == station.charging.capacity
+
+
+def test_map_records_in_parallel_gives_the_same_results_in_order():
+    map_entry = functools.partial(map_osm_entry, country_code="FR")
+
+    serial_results = _summary(map_records(_records(), map_entry))
+    parallel_results = _summary(map_records(_records(), map_entry, workers=2, chunk_size=2))
+
+    assert parallel_results == serial_results
+    assert [key for key, *_ in serial_results] == [f"hash_{osm_id}" for osm_id in range(1, 8)]
+    assert [is_error for *_, is_error in serial_results] == [False, False, False, True, False, False, False]
@@ -0,0 +1,42 @@
+"""Unit tests for the base class of the import pipelines."""
+
+import logging
+from unittest import mock
+
+from charging_stations_pipelines import pipelines
+from charging_stations_pipelines.pipelines import Pipeline
+from charging_stations_pipelines.pipelines.station_table_updater import StationTableUpdater
+
+logger = logging.getLogger(__name__)
+
+
+@mock.patch.object(pipelines, "mark_file_imported")
+def test_mark_imported_only_marks_files_without_failed_stations(mock_mark_file_imported):
+    pipeline = Pipeline({}, mock.MagicMock())
+    station_updater = StationTableUpdater(mock.MagicMock(), logger)
+    station_updater.counts["error"] = 3
+
+    pipeline.mark_imported("bna.xlsx", station_updater)
+    mock_mark_file_imported.assert_called_once_with("bna.xlsx")
+
+    mock_mark_file_imported.reset_mock()
+    station_updater.failed_count = 1
+    pipeline.mark_imported("bna.xlsx", station_updater)
+    mock_mark_file_imported.assert_not_called()
+
+
+@mock.patch.object(pipelines, "stage_stations", return_value=("osm.json.staged.parquet", 2))
+@mock.patch.object(pipelines, "is_staged", side_effect=[False, True])
+def test_stage_keeps_the_count_of_not_parseable_records(_mock_is_staged, mock_stage_stations):
+    pipeline = Pipeline({}, mock.MagicMock())
+    parse_records = mock.MagicMock(return_value=[])
+
+    pipeline.stage("osm.json", parse_records, mock.MagicMock())
+    assert pipeline.not_parseable_count == 2
+    assert pipeline.not_parseable_summary() == "2"
+
+    pipeline = Pipeline({}, mock.MagicMock())
+    pipeline.stage("osm.json", parse_records, mock.MagicMock())
+    assert pipeline.not_parseable_count is None
+    assert str(pipeline.staged_file) == "osm.json.staged.parquet"
+    mock_stage_stations.assert_called_once()
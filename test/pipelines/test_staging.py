@@ -0,0 +1,150 @@
+"""Unit tests for the staging of mapped stations as Parquet datasets."""
+
+import functools
+from datetime import date
+from unittest.mock import MagicMock
+
+from geoalchemy2.shape import from_shape, to_shape
+from shapely.geometry import Point
+
+from charging_stations_pipelines.models.charging import Charging
+from charging_stations_pipelines.models.station import Station
+from charging_stations_pipelines.pipelines.osm.osm import map_osm_entry
+from charging_stations_pipelines.pipelines.parallel_mapper import station_to_rows
+from charging_stations_pipelines.pipelines.staging import (
+    is_staged,
+    iter_staged_stations,
+    load_staged_stations,
+    stage_stations,
+    staged_row_to_station,
+    station_to_staged_row,
+)
+
+
+def _osm_entry(osm_id: int, capacity: str = "2") -> dict:
+    return {
+        "id": osm_id,
+        "lat": 48.0449426,
+        "lon": -1.602638 + osm_id / 1000,
+        "timestamp": "2022-05-01T10:00:00Z",
+        "tags": {
+            "amenity": "charging_station",
+            "capacity": capacity,
+            "operator": "Sodetrel",
+            "socket:type2": "2",
+            "socket:type2:output": "22 kW",
+            "addr:street": "Rue de Paris",
+            "addr:housenumber": "1",
+            "addr:postcode": "35000",
+            "addr:city": "Rennes",
+            "addr:country": "FR",
+        },
+        "type": "node",
+    }
+
+
+def _records(entries: list[dict]) -> list[tuple[str, dict]]:
+    return [(f"hash_{entry['id']}_{entry['tags']['capacity']}", entry) for entry in entries]
+
+
+def test_staged_row_gives_the_same_station_rows():
+    station = map_osm_entry(_osm_entry(1), "FR")
+    station.content_hash = "hash"
+
+    restored = staged_row_to_station(station_to_staged_row(station))
+
+    expected_rows = station_to_rows(station)
+    # like in the database, the osm id is stored as string
+    expected_rows[0]["source_id"] = "1"
+    restored_rows = station_to_rows(restored)
+    assert to_shape(restored.point).equals(to_shape(station.point))
+    assert restored.address.town == "Rennes"
+    assert restored_rows[0]["date_created"] == date(2022, 5, 1)
+    assert restored_rows[0]["raw_data"] == expected_rows[0]["raw_data"]
+    assert restored_rows[1:] == expected_rows[1:]
+    for row in [expected_rows[0], restored_rows[0]]:
+        del row["point"], row["date_created"]
+    assert restored_rows[0] == expected_rows[0]
+
+
+def test_staged_row_converts_values_to_the_column_types():
+    station = Station()
+    station.source_id = 123
+    station.point = from_shape(Point(8.5, 49.1))
+    station.date_created = "2021-03-04"
+    station.charging = Charging()
+    station.charging.capacity = 2.0
+    station.charging.total_kw = float("nan")
+    station.charging.kw_list = [22, 11.5]
+
+    restored = staged_row_to_station(station_to_staged_row(station))
+
+    assert restored.source_id == "123"
+    assert restored.date_created == date(2021, 3, 4)
+    assert restored.address is None
+    assert restored.charging.capacity == 2
+    assert restored.charging.kw_list == [22.0, 11.5]
+    assert restored.charging.is_merged is False
+
+
+def test_stage_stations_maps_only_records_missing_in_the_previous_staged_dataset(tmp_path):
+    source_file = tmp_path / "osm.json"
+    source_file.write_text("first version")
+    entries = [_osm_entry(osm_id) for osm_id in range(1, 6)]
+    entries[1]["lat"] = "unknown"
+    map_entry = MagicMock(side_effect=functools.partial(map_osm_entry, country_code="FR"))
+
+    staged_file, mapping_errors = stage_stations(source_file, _records(entries), map_entry)
+
+    assert is_staged(source_file)
+    assert map_entry.call_count == 5
+    assert mapping_errors == 1
+    assert [s.source_id for s in iter_staged_stations(staged_file)] == ["1", "3", "4", "5"]
+
+    source_file.write_text("second version")
+    assert not is_staged(source_file)
+    entries[1]["lat"] = 48.0
+    entries[3] = _osm_entry(4, capacity="4")
+    map_entry.reset_mock()
+
+    _, mapping_errors = stage_stations(source_file, _records(entries + [_osm_entry(6)]), map_entry, batch_size=2)
+
+    assert is_staged(source_file)
+    assert mapping_errors == 0
+    assert [call.args[0]["id"] for call in map_entry.call_args_list] == [2, 4, 6]
+    stations = list(iter_staged_stations(staged_file, batch_size=2))
+    assert [s.source_id for s in stations] == ["1", "2", "3", "4", "5", "6"]
+    assert [s.charging.capacity for s in stations] == [2, 2, 2, 4, 2, 2]
+    assert stations[3].content_hash == "hash_4_4"
+
+
+def test_stage_stations_keeps_the_order_with_several_workers(tmp_path):
+    source_file = tmp_path / "osm.json"
+    source_file.write_text("first version")
+    entries = [_osm_entry(osm_id) for osm_id in range(1, 6)]
+    map_entry = functools.partial(map_osm_entry, country_code="FR")
+    staged_file, _ = stage_stations(source_file, _records(entries), map_entry)
+
+    source_file.write_text("second version")
+    entries[1] = _osm_entry(2, capacity="4")
+    stage_stations(source_file, _records(entries), map_entry, workers=2)
+
+    stations = list(iter_staged_stations(staged_file))
+    assert [s.source_id for s in stations] == ["1", "2", "3", "4", "5"]
+    assert stations[1].charging.capacity == 4
+
+
+def test_load_staged_stations_skips_unchanged_stations(tmp_path):
+    source_file = tmp_path / "osm.json"
+    source_file.write_text("content")
+    map_entry = functools.partial(map_osm_entry, country_code="FR")
+    staged_file, _ = stage_stations(source_file, _records([_osm_entry(osm_id) for osm_id in range(1, 4)]), map_entry)
+    station_updater = MagicMock()
+    station_updater.skip_unchanged.side_effect = lambda record_hash, *_: record_hash == "hash_2_2"
+
+    count = load_staged_stations(staged_file, station_updater, "OSM", "FR")
+
+    assert count == 2
+    station_updater.skip_unchanged.assert_any_call("hash_1_2", "OSM", "FR")
+    assert [c.args[0].source_id for c in station_updater.update_station.call_args_list] == ["1", "3"]
+    assert {c.args[1] for c in station_updater.update_station.call_args_list} == {"OSM"}
@@ -0,0 +1,170 @@
+"""Unit tests for the station table updater."""
+
+import logging
+from unittest import mock
+
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import IntegrityError
+
+from charging_stations_pipelines.models.address import Address
+from charging_stations_pipelines.models.charging import Charging
+from charging_stations_pipelines.models.station import Station
+from charging_stations_pipelines.pipelines import station_table_updater
+from charging_stations_pipelines.pipelines.station_table_updater import StationTableUpdater
+from test.shared import create_station
+
+logger = logging.getLogger(__name__)
+
+
+def _create_station(source_id: str) -> Station:
+    station = create_station()
+    station.source_id = source_id
+    return station
+
+
+def test_to_rows_links_children_and_skips_duplicate_source_ids():
+    batch = [(_create_station("OSM_1"), "OSM"), (_create_station("OSM_2"), "OSM"), (_create_station("OSM_1"), "OSM")]
+
+    rows = StationTableUpdater.to_rows(batch, [10, 11, 12])
+
+    assert [(row["id"], row["source_id"]) for row in rows[Station.__table__]] == [(10, "OSM_1"), (11, "OSM_2")]
+    assert all(row["is_merged"] is False for row in rows[Station.__table__])
+    assert [row["station_id"] for row in rows[Address.__table__]] == [10, 11]
+    assert [row["station_id"] for row in rows[Charging.__table__]] == [10, 11]
+
+
+def test_update_station_with_batch_size_one_commits_every_station():
+    session = mock.MagicMock()
+    session.commit.side_effect = [None, IntegrityError("INSERT", {}, Exception("duplicate key"))]
+    updater = StationTableUpdater(session, logger, batch_size=1)
+
+    updater.update_station(_create_station("OSM_1"), "OSM")
+    updater.update_station(_create_station("OSM_1"), "OSM")
+
+    assert session.add.call_count == 2
+    assert session.rollback.call_count == 1
+    assert updater.counts == {"new": 1, "updated": 0, "unchanged": 0, "removed": 0, "error": 1}
+    assert updater.failed_count == 0
+
+
+def test_update_station_writes_full_batches_and_counts_skipped_stations():
+    updater = StationTableUpdater(mock.MagicMock(), logger, batch_size=2)
+
+    with mock.patch.object(updater, "_write_batch", side_effect=[{"new": 1}, {"new": 1}]) as write_batch:
+        updater.update_station(_create_station("OSM_1"), "OSM")
+        assert write_batch.call_count == 0
+
+        updater.update_station(_create_station("OSM_2"), "OSM")
+        assert write_batch.call_count == 1
+
+        updater.update_station(_create_station("OSM_3"), "OSM")
+        updater.flush()
+        assert write_batch.call_count == 2
+
+    assert updater.counts == {"new": 2, "updated": 0, "unchanged": 0, "removed": 0, "error": 1}
+    assert updater.pending == []
+
+
+def test_flush_retries_failed_batch_row_by_row():
+    session = mock.MagicMock()
+    updater = StationTableUpdater(session, logger, batch_size=10)
+    updater.update_station(_create_station("OSM_1"), "OSM")
+    updater.update_station(_create_station("OSM_2"), "OSM")
+
+    with mock.patch.object(updater, "_write_batch", side_effect=RuntimeError("invalid input syntax")):
+        updater.flush()
+
+    assert session.add.call_count == 2
+    assert updater.counts == {"new": 2, "updated": 0, "unchanged": 0, "removed": 0, "error": 0}
+
+
+def test_incremental_update_station_upserts_batches_and_retries_row_by_row():
+    session = mock.MagicMock()
+    updater = StationTableUpdater(session, logger, batch_size=10, incremental=True)
+    updater.update_station(_create_station("OSM_1"), "OSM")
+    updater.update_station(_create_station("OSM_2"), "OSM")
+    updater.update_station(_create_station("OSM_3"), "OSM")
+
+    batch_results = [
+        RuntimeError("invalid input syntax"),
+        {"new": 0, "updated": 1, "unchanged": 0},
+        RuntimeError("invalid input syntax"),
+        {"new": 0, "updated": 0, "unchanged": 1},
+    ]
+    with mock.patch.object(updater, "_upsert_batch", side_effect=batch_results) as upsert_batch:
+        updater.flush()
+
+    assert upsert_batch.call_count == 4
+    assert session.add.call_count == 0
+    assert updater.counts == {"new": 0, "updated": 1, "unchanged": 1, "removed": 0, "error": 1}
+    assert updater.failed_count == 1
+
+
+def test_incremental_update_station_keeps_first_station_of_source_id_across_batches():
+    updater = StationTableUpdater(mock.MagicMock(), logger, batch_size=2, incremental=True)
+    first_station = _create_station("BNA_1")
+    duplicate_station = _create_station("BNA_1")
+    duplicate_station.operator = "Other operator"
+
+    batch_results = [{"new": 2, "updated": 0, "unchanged": 0}, {"new": 1, "updated": 0, "unchanged": 0}]
+    with mock.patch.object(updater, "_upsert_batch", side_effect=batch_results) as upsert:
+        updater.update_station(first_station, "BNA")
+        updater.update_station(_create_station("BNA_2"), "BNA")
+        updater.update_station(duplicate_station, "BNA")
+        updater.update_station(_create_station("BNA_3"), "BNA")
+        updater.flush()
+
+    batches = [[station for station, _ in c.args[0]] for c in upsert.call_args_list]
+    assert [[station.source_id for station in batch] for batch in batches] == [["BNA_1", "BNA_2"], ["BNA_3"]]
+    assert batches[0][0] is first_station
+    assert updater.counts["error"] == 1
+
+
+def test_remove_missing_stations_deletes_stations_not_imported_again():
+    session = mock.MagicMock()
+    session.execute.return_value = [(1, "OSM_1"), (2, "OSM_2"), (3, "OSM_3")]
+    updater = StationTableUpdater(session, logger, batch_size=10, incremental=True)
+    updater.update_station(_create_station("OSM_2"), "OSM")
+
+    with mock.patch.object(updater, "_upsert_batch", return_value={"new": 0, "updated": 0, "unchanged": 1}):
+        with mock.patch.object(station_table_updater, "delete_stations") as delete_stations:
+            updater.remove_missing_stations()
+
+    delete_stations.assert_called_once_with(session, [1, 3])
+    assert updater.counts["removed"] == 2
+
+
+def test_remove_missing_stations_does_nothing_if_not_incremental():
+    session = mock.MagicMock()
+    updater = StationTableUpdater(session, logger, batch_size=10)
+
+    updater.remove_missing_stations()
+
+    session.execute.assert_not_called()
+
+
+def test_is_changed_compares_json_and_geography_by_value():
+    stations = Station.__table__
+
+    def compile_is_changed(column):
+        condition = station_table_updater._is_changed(column, column)
+        return str(condition.compile(dialect=postgresql.dialect()))
+
+    assert "CAST" in compile_is_changed(stations.c.raw_data) and "JSONB" in compile_is_changed(stations.c.raw_data)
+    assert "ST_AsBinary" in compile_is_changed(stations.c.point)
+    operator_column = f"{stations.fullname}.operator"
+    assert compile_is_changed(stations.c.operator) == f"{operator_column} IS DISTINCT FROM {operator_column}"
+
+
+def test_skip_unchanged_skips_records_with_stored_content_hash():
+    session = mock.MagicMock()
+    session.execute.return_value.fetchall.return_value = [("hash_1", "OSM_1")]
+    updater = StationTableUpdater(session, logger, batch_size=10, incremental=True)
+
+    assert updater.skip_unchanged("hash_1", "OSM", "DE")
+    assert not updater.skip_unchanged("hash_2", "OSM", "DE")
+
+    assert session.execute.call_count == 1
+    assert updater.counts["unchanged"] == 1
+    assert updater.imported_source_ids == {"OSM_1"}
+    assert updater.imported_sources == {("OSM", "DE")}
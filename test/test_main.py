@@ -1,7 +1,10 @@
 """Unit tests for main.py"""
 
+from unittest import mock
+
 import pytest
 
+import main
 from main import parse_args
 
 
@@ -11,6 +14,11 @@ def test_parse_valid_args():
     assert arguments.countries == ["DE", "GB"]
     assert not arguments.offline
     assert not arguments.delete_data
+    assert arguments.merge_mode == "sql"
+    assert arguments.workers == 1
+    assert not arguments.incremental
+    assert arguments.merge_statistics_file is None
+    assert arguments.concurrent_imports == 1
 
 
 def test_parse_offline_arg():
@@ -23,6 +31,35 @@ def test_parse_delete_data_arg():
     assert arguments.delete_data
 
 
+def test_parse_merge_mode_arg():
+    arguments = parse_args("merge --merge_mode index".split())
+    assert arguments.merge_mode == "index"
+
+    arguments = parse_args("merge --merge_mode pairs".split())
+    assert arguments.merge_mode == "pairs"
+
+    with pytest.raises(SystemExit):
+        parse_args("merge --merge_mode invalid".split())
+
+
+def test_parse_workers_arg():
+    arguments = parse_args("merge --workers 4".split())
+    assert arguments.workers == 4
+
+    with pytest.raises(SystemExit):
+        parse_args("merge --workers many".split())
+
+
+def test_parse_incremental_arg():
+    arguments = parse_args("merge --incremental".split())
+    assert arguments.incremental
+
+
+def test_parse_merge_statistics_file_arg():
+    arguments = parse_args("merge --merge_statistics_file stats.jsonl".split())
+    assert arguments.merge_statistics_file == "stats.jsonl"
+
+
 def test_parse_no_task_arg():
     with pytest.raises(SystemExit):
         parse_args([])
@@ -41,3 +78,28 @@ def test_parse_invalid_task_arg():
     # ... is an expected side-effect of using `pytest.raises(SystemExit)`
     with pytest.raises(SystemExit):
         parse_args("invalid_task --countries de".split())
+
+
+def test_parse_concurrent_imports_arg():
+    arguments = parse_args("import --concurrent_imports 4".split())
+    assert arguments.concurrent_imports == 4
+
+
+@pytest.mark.parametrize("concurrent_imports", [1, 3])
+def test_run_import_continues_after_failing_pipeline(concurrent_imports):
+    imported = []
+
+    def create_pipeline(name, fails=False):
+        pipeline = mock.MagicMock()
+        pipeline.run.side_effect = RuntimeError("download failed") if fails else lambda: imported.append(name)
+        return pipeline
+
+    with mock.patch.object(main, "get_db_engine"), mock.patch.object(main, "sessionmaker"), mock.patch.object(
+        main, "pipeline_factory", side_effect=lambda session, country, *args: create_pipeline(f"{country} GOV")
+    ), mock.patch.object(
+        main, "OsmPipeline", side_effect=lambda country, *args: create_pipeline(f"{country} OSM", country == "DE")
+    ), mock.patch.object(main, "OcmPipeline", side_effect=lambda country, *args: create_pipeline(f"{country} OCM")):
+        with pytest.raises(RuntimeError, match="Import failed for: DE OSM"):
+            main.run_import(["DE", "AT"], online=False, delete_data=False, concurrent_imports=concurrent_imports)
+
+    assert sorted(imported) == ["AT GOV", "AT OCM", "AT OSM", "DE GOV", "DE OCM"]
@@ -1,16 +1,28 @@
 """Unit tests for the shared pipeline functions."""
+import json
 from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+import openpyxl
 
 import pandas as pd
 import pytest
+import requests
 
 from charging_stations_pipelines.shared import (
     check_coordinates,
+    check_coordinates_column,
     coalesce,
+    content_hash,
+    download_file,
     float_cmp_eq,
+    is_file_imported,
+    iter_json_array,
     lst_expand,
+    load_excel_file,
     lst_filter_none,
     lst_flatten,
+    mark_file_imported,
     parse_date,
     str_clean_pattern,
     str_split_pattern,
@@ -40,6 +52,14 @@ def test_check_coordinates():
         check_coordinates("   ")
 
 
+def test_check_coordinates_column():
+    coords = pd.Series(["52.52", "-52,52", 3.14, 3, " 12.5°", None, "abc"], dtype=object)
+    expected = [52.52, -52.52, 3.14, 3.0, 12.5]
+    actual = check_coordinates_column(coords)
+    assert all(float_cmp_eq(a, e) for a, e in zip(actual[:5], expected))
+    assert actual[5:].isna().all()
+
+
 def test_str_parse_date():
     assert parse_date("2022-01-01") == datetime(2022, 1, 1)
     assert parse_date("2023-03-29T17:45:00Z").isoformat() == "2023-03-29T17:45:00+00:00"
@@ -161,3 +181,225 @@ def test_coalesce():
     assert coalesce(None, "Hello", "") == "Hello"
     assert coalesce("", None, 1) == 1
     assert coalesce("", 1, None, 2) == 1
+
+
+def test_content_hash():
+    assert content_hash({"id": 1, "tags": {"a": "b"}}) == content_hash({"tags": {"a": "b"}, "id": 1})
+    assert content_hash({"id": 1, "tags": {"a": "b"}}) != content_hash({"id": 1, "tags": {"a": "c"}})
+    assert len(content_hash({"id": 1})) == 32
+
+
+def test_content_hash_of_data_frame_row():
+    row = pd.Series({"Betreiber": "Comsysto", float("nan"): None, "Datum": datetime(2023, 1, 1)})
+    assert content_hash(row) == content_hash(row.copy())
+    assert content_hash(row) != content_hash(row.replace("Comsysto", "Other"))
+
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 1 << 16])
+def test_iter_json_array(tmp_path, chunk_size):
+    overpass_response = {
+        "version": 0.6,
+        "osm3s": {"copyright": "The data included in this document is from www.openstreetmap.org."},
+        "elements": [{"type": "node", "id": i, "lat": 52.5 + i / 10, "tags": {"name": "Ladesäule"}} for i in range(20)],
+        "remark": "runtime error: Query timed out",
+    }
+    file_path = tmp_path / "osm.json"
+    file_path.write_text(json.dumps(overpass_response, indent=4, ensure_ascii=False), encoding="utf-8")
+
+    assert list(iter_json_array(file_path, "elements", chunk_size)) == overpass_response["elements"]
+    assert list(iter_json_array(file_path, "missing", chunk_size)) == []
+
+
+def test_iter_json_array_with_numbers_and_empty_array(tmp_path):
+    file_path = tmp_path / "data.json"
+    file_path.write_text('{"a": [], "elements": [1, 23.5, -4e-3, true, null]}')
+    assert list(iter_json_array(file_path, "elements", chunk_size=2)) == [1, 23.5, -4e-3, True, None]
+    assert list(iter_json_array(file_path, "a", chunk_size=2)) == []
+
+
+def test_iter_json_array_raises_for_invalid_json(tmp_path):
+    file_path = tmp_path / "data.json"
+    file_path.write_text('{"elements": [1 2]}')
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_json_array(file_path, "elements", chunk_size=4))
+
+
+def _response(status_code=200, content=b"", headers=None, fail_after=None):
+    response = MagicMock(status_code=status_code, headers=headers or {})
+    response.__enter__.return_value = response
+    if status_code >= 400:
+        response.raise_for_status.side_effect = requests.HTTPError(response=response)
+
+    def iter_content(chunk_size):
+        for i in range(0, len(content), chunk_size):
+            if fail_after is not None and i >= fail_after:
+                raise requests.ConnectionError("connection reset")
+            yield content[i : i + chunk_size]
+
+    response.iter_content.side_effect = iter_content
+    return response
+
+
+@patch("charging_stations_pipelines.shared.requests.get")
+def test_download_file_sends_conditional_request(mock_get, tmp_path):
+    target_file = tmp_path / "data.csv"
+    mock_get.return_value = _response(content=b"a,b\n1,2\n", headers={"ETag": '"v1"', "Last-Modified": "yesterday"})
+
+    assert download_file("https://example.org/data.csv", target_file)
+    assert "If-None-Match" not in mock_get.call_args.kwargs["headers"]
+
+    mock_get.return_value = _response(status_code=304)
+    assert not download_file("https://example.org/data.csv", target_file)
+    headers = mock_get.call_args.kwargs["headers"]
+    assert headers["If-None-Match"] == '"v1"'
+    assert headers["If-Modified-Since"] == "yesterday"
+    assert target_file.read_bytes() == b"a,b\n1,2\n"
+
+
+@patch("charging_stations_pipelines.shared.requests.get")
+def test_download_file_detects_unchanged_content_without_validators(mock_get, tmp_path):
+    target_file = tmp_path / "data.csv"
+    mock_get.return_value = _response(content=b"a,b\n1,2\n")
+
+    assert download_file("https://example.org/data.csv", target_file)
+    assert not download_file("https://example.org/data.csv", target_file)
+    assert "If-None-Match" not in mock_get.call_args.kwargs["headers"]
+
+    mock_get.return_value = _response(content=b"a,b\n1,3\n")
+    assert download_file("https://example.org/data.csv", target_file)
+
+
+@patch("charging_stations_pipelines.shared.requests.get")
+def test_download_file_ignores_validators_of_modified_file(mock_get, tmp_path):
+    target_file = tmp_path / "data.csv"
+    mock_get.return_value = _response(content=b"a,b\n1,2\n", headers={"ETag": '"v1"'})
+    download_file("https://example.org/data.csv", target_file)
+
+    target_file.write_bytes(b"edited")
+    download_file("https://example.org/data.csv", target_file)
+    assert "If-None-Match" not in mock_get.call_args.kwargs["headers"]
+
+    download_file("https://example.org/other.csv", target_file)
+    assert "If-None-Match" not in mock_get.call_args.kwargs["headers"]
+
+
+def test_mark_file_imported(tmp_path):
+    target_file = tmp_path / "data.json"
+    target_file.write_text('{"elements": []}')
+    assert not is_file_imported(target_file)
+
+    mark_file_imported(target_file)
+    assert is_file_imported(target_file)
+
+    target_file.write_text('{"elements": [1]}')
+    assert not is_file_imported(target_file)
+
+
+@patch("charging_stations_pipelines.shared.DOWNLOAD_CHUNK_SIZE", 4)
+@patch("charging_stations_pipelines.shared.time.sleep")
+@patch("charging_stations_pipelines.shared.requests.get")
+def test_download_file_resumes_interrupted_download(mock_get, mock_sleep, tmp_path):
+    target_file = tmp_path / "data.csv"
+    content = b"0123456789abcdef"
+    mock_get.side_effect = [
+        _response(content=content, headers={"ETag": '"v1"', "Content-Length": "16"}, fail_after=8),
+        _response(status_code=206, content=content[8:], headers={"Content-Length": "8"}),
+    ]
+
+    assert download_file("https://example.org/data.csv", target_file)
+
+    assert target_file.read_bytes() == content
+    assert not (tmp_path / "data.csv.part").exists()
+    resume_headers = mock_get.call_args.kwargs["headers"]
+    assert resume_headers["Range"] == "bytes=8-"
+    assert resume_headers["If-Range"] == '"v1"'
+    assert resume_headers["Accept-Encoding"] == "identity"
+    mock_sleep.assert_called_once()
+
+
+@patch("charging_stations_pipelines.shared.DOWNLOAD_CHUNK_SIZE", 4)
+@patch("charging_stations_pipelines.shared.time.sleep")
+@patch("charging_stations_pipelines.shared.requests.get")
+def test_download_file_restarts_interrupted_encoded_download(mock_get, mock_sleep, tmp_path):
+    target_file = tmp_path / "data.csv"
+    content = b"0123456789abcdef"
+    headers = {"ETag": '"v1"', "Content-Encoding": "gzip", "Content-Length": "10"}
+    mock_get.side_effect = [
+        _response(content=content, headers=headers, fail_after=8),
+        _response(content=content, headers=headers),
+    ]
+
+    assert download_file("https://example.org/data.csv", target_file)
+
+    assert target_file.read_bytes() == content
+    retry_headers = mock_get.call_args.kwargs["headers"]
+    assert "Range" not in retry_headers
+    assert "If-Range" not in retry_headers
+
+
+@patch("charging_stations_pipelines.shared.time.sleep")
+@patch("charging_stations_pipelines.shared.requests.get")
+def test_download_file_keeps_target_file_on_failure(mock_get, mock_sleep, tmp_path):
+    target_file = tmp_path / "data.csv"
+    target_file.write_bytes(b"previous")
+    mock_get.return_value = _response(status_code=503)
+
+    with pytest.raises(requests.HTTPError):
+        download_file("https://example.org/data.csv", target_file)
+
+    assert target_file.read_bytes() == b"previous"
+    assert not (tmp_path / "data.csv.part").exists()
+    assert mock_get.call_count == 4
+
+    mock_get.reset_mock()
+    mock_get.return_value = _response(status_code=404)
+    with pytest.raises(requests.HTTPError):
+        download_file("https://example.org/data.csv", target_file)
+    assert mock_get.call_count == 1
+
+
+@pytest.fixture
+def excel_file(tmp_path):
+    file_path = tmp_path / "register.xlsx"
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    for i in range(10):
+        sheet.append([f"comment {i}"] if i % 3 == 0 else [])
+    sheet.append(["Betreiber", "Postleitzahl", "Breitengrad", "Inbetriebnahmedatum", "P1 [kW]", "Flag"])
+    sheet.append(["A GmbH", 80331, 48.1, datetime(2020, 1, 2), "11,0", True])
+    sheet.append([])
+    sheet.append(["B AG", "01234", "48,2", datetime(2021, 3, 4), 22.5, "NA"])
+    sheet.append([None, None, 48.3, None, 50, "#DIV/0!"])
+    sheet.append([None] * 3)
+    workbook.save(file_path)
+    return file_path
+
+
+def test_load_excel_file_like_pandas(excel_file):
+    expected = pd.read_excel(excel_file, engine="openpyxl")
+    expected.columns = expected.iloc[9]
+    expected = expected[10:]
+
+    actual = load_excel_file(excel_file)
+
+    assert list(actual.columns) == list(expected.columns)
+    assert list(actual.index) == list(expected.index)
+    assert (actual.dtypes == object).all()
+    for (_, actual_row), (_, expected_row) in zip(actual.iterrows(), expected.iterrows()):
+        assert [type(v) for v in actual_row] == [type(v) for v in expected_row]
+        assert content_hash(actual_row) == content_hash(expected_row)
+
+
+def test_load_excel_file_reads_cache(excel_file):
+    expected = load_excel_file(excel_file)
+    assert (excel_file.parent / "register.xlsx.parquet").is_file()
+
+    with patch("charging_stations_pipelines.shared._write_excel_cache") as mock_write_cache:
+        actual = load_excel_file(excel_file)
+    mock_write_cache.assert_not_called()
+    pd.testing.assert_frame_equal(actual, expected)
+
+    workbook = openpyxl.load_workbook(excel_file)
+    workbook.active["A12"] = "C KG"
+    workbook.save(excel_file)
+    assert load_excel_file(excel_file).iloc[0]["Betreiber"] == "C KG"
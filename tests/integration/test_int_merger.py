@@ -107,6 +107,119 @@ def test_int_deduplication_expect_a_merged_entry_if_two_duplicates_exists(engine
     _check_merger(engine, _create_stations, _run_merger, _check_results)
 
 
+def _run_index_merger(engine):
+    """Merge duplicate stations with the in-memory station index."""
+    pd.options.mode.chained_assignment = None  # default: 'warn'
+
+    station_merger = StationMerger(country_code="DE", config=(get_config()), db_engine=engine, merge_mode="index")
+    station_merger.run()
+
+    pd.options.mode.chained_assignment = "warn"
+
+
+def _run_parallel_merger(engine):
+    """Merge duplicate stations with two worker processes."""
+    pd.options.mode.chained_assignment = None  # default: 'warn'
+
+    station_merger = StationMerger(country_code="DE", config=(get_config()), db_engine=engine, workers=2)
+    station_merger.run()
+
+    pd.options.mode.chained_assignment = "warn"
+
+
+def _run_pairs_merger(engine):
+    """Merge duplicate stations with the candidate pairs of a single self-join."""
+    pd.options.mode.chained_assignment = None  # default: 'warn'
+
+    station_merger = StationMerger(country_code="DE", config=(get_config()), db_engine=engine, merge_mode="pairs")
+    station_merger.run()
+
+    pd.options.mode.chained_assignment = "warn"
+
+
+@pytest.mark.integration_test
+@pytest.mark.parametrize("run_merger", [_run_index_merger, _run_parallel_merger, _run_pairs_merger])
+def test_int_deduplication_index_mode_expect_same_result_as_sql_mode(engine, run_merger):
+    def _create_stations():
+        station_one = create_station()
+        station_one.data_source = "BNA"
+        station_one.source_id = "BNA_ID1"
+
+        station_duplicate = create_station()
+        station_duplicate.data_source = "OSM"
+        station_duplicate.source_id = "OSM_ID1"
+
+        station_far_away = create_station()
+        station_far_away.data_source = "OSM"
+        station_far_away.source_id = "OSM_ID2"
+        station_far_away.point = from_shape(Point(float(1.01), float(1.01)))
+
+        return station_one, station_duplicate, station_far_away
+
+    def _check_results(session):
+        all_stations: list[Station] = session.query(Station).all()
+        assert len(all_stations) == 5
+
+        merged_stations = sorted([s for s in all_stations if s.is_merged], key=lambda s: s.id)
+        assert len(merged_stations) == 2
+        assert [s.duplicate_source_id for s in merged_stations[0].source_stations] == ["OSM_ID1", "BNA_ID1"]
+        assert [s.duplicate_source_id for s in merged_stations[1].source_stations] == ["OSM_ID2"]
+
+        session.close()
+
+    _check_merger(engine, _create_stations, run_merger, _check_results)
+
+
+@pytest.mark.integration_test
+def test_int_incremental_deduplication_expect_only_changed_neighbourhood_merged_again(engine):
+    # Given: a merged pair of duplicates and a merged station far away
+    station_one = create_station()
+    station_one.data_source = "BNA"
+    station_one.source_id = "BNA_ID1"
+
+    station_duplicate = create_station()
+    station_duplicate.data_source = "OSM"
+    station_duplicate.source_id = "OSM_ID1"
+
+    station_far_away = create_station()
+    station_far_away.data_source = "OSM"
+    station_far_away.source_id = "OSM_ID2"
+    station_far_away.point = from_shape(Point(float(1.01), float(1.01)))
+
+    session = _set_up_db(engine, [station_one, station_duplicate, station_far_away])
+    _run_merger(engine)
+    merged_far_away_id = session.query(Station.id).filter(Station.is_merged, Station.data_source == "OSM").scalar()
+
+    # When: a new duplicate is imported and the merger runs incrementally
+    station_new = create_station()
+    station_new.data_source = "OCM"
+    station_new.source_id = "OCM_ID1"
+    session.add(station_new)
+    session.commit()
+
+    pd.options.mode.chained_assignment = None  # default: 'warn'
+    summary = StationMerger(country_code="DE", config=(get_config()), db_engine=engine, incremental=True).run()
+    pd.options.mode.chained_assignment = "warn"
+
+    # Then: the pair is merged again together with the new station, the station far away is kept
+    session.expire_all()
+    merged_stations = sorted(session.query(Station).filter(Station.is_merged).all(), key=lambda s: s.id)
+    assert len(merged_stations) == 2
+    assert merged_stations[0].id == merged_far_away_id
+    assert [s.duplicate_source_id for s in merged_stations[0].source_stations] == ["OSM_ID2"]
+    assert sorted(s.duplicate_source_id for s in merged_stations[1].source_stations) == [
+        "BNA_ID1",
+        "OCM_ID1",
+        "OSM_ID1",
+    ]
+    assert all(s.merge_status == "is_duplicate" for s in session.query(Station).filter(~Station.is_merged))
+    assert summary["counters"]["released_merged_stations"] == 1
+    assert summary["counters"]["clusters"] == 1
+    assert summary["average_cluster_size"] == 3
+
+    session.close()
+
+
 @pytest.mark.integration_test
 def test_int_deduplication_ocm_should_have_higher_prio_than_bna(engine):
     def _create_stations():
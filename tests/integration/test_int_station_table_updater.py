@@ -0,0 +1,63 @@
+"""Integration tests for the incremental mode of the station table updater."""
+
+import logging
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from charging_stations_pipelines.models.address import Address
+from charging_stations_pipelines.models.station import Station
+from charging_stations_pipelines.pipelines.station_table_updater import StationTableUpdater
+from test.shared import create_station
+from tests.integration.test_int_merger import engine, postgres_container  # noqa: F401
+
+logger = logging.getLogger(__name__)
+
+
+def _import_stations(session, stations) -> StationTableUpdater:
+    station_updater = StationTableUpdater(session, logger, batch_size=10, incremental=True)
+    for station in stations:
+        station_updater.update_station(station, "Test")
+    station_updater.flush()
+    station_updater.remove_missing_stations()
+    return station_updater
+
+
+def _create_station(source_id: str, operator: str = "Comsysto", town: str = "Testhausen") -> Station:
+    station = create_station()
+    station.source_id = source_id
+    station.operator = operator
+    station.raw_data = {"id": source_id}
+    station.address.town = town
+    return station
+
+
+@pytest.mark.integration_test
+def test_int_incremental_import_expect_only_changed_stations_updated(engine):  # noqa: F811
+    # Given: four imported and merged stations
+    session = sessionmaker(bind=engine)()
+    _import_stations(session, [_create_station(f"TEST_{i}") for i in range(1, 5)])
+    session.query(Station).update({Station.merge_status: "is_single"})
+    session.commit()
+
+    # When: the data source is imported again, with one station changed, one address changed, one new station and
+    # one station which is not part of the data source anymore
+    station_updater = _import_stations(
+        session,
+        [
+            _create_station("TEST_1"),
+            _create_station("TEST_2", operator="Other operator"),
+            _create_station("TEST_3", town="Otherhausen"),
+            _create_station("TEST_5"),
+        ],
+    )
+
+    # Then: only the changed stations are written and marked for merging again
+    assert station_updater.counts == {"new": 1, "updated": 2, "unchanged": 1, "removed": 1, "error": 0}
+    stations = {station.source_id: station for station in session.query(Station).all()}
+    assert sorted(stations) == ["TEST_1", "TEST_2", "TEST_3", "TEST_5"]
+    assert stations["TEST_1"].merge_status == "is_single"
+    assert stations["TEST_2"].merge_status is None and stations["TEST_2"].operator == "Other operator"
+    assert stations["TEST_3"].merge_status is None and stations["TEST_3"].address.town == "Otherhausen"
+    assert stations["TEST_5"].merge_status is None
+    assert session.query(Address).count() == 4